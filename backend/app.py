@@ -1,15 +1,35 @@
 # File: app.py
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, UploadFile, File
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from typing import List, Dict, Union, Optional
+from fastapi.responses import StreamingResponse, PlainTextResponse, Response
+from pydantic import BaseModel, ValidationError
+from typing import List, Dict, Union, Optional, Any
+import asyncio
+from contextlib import asynccontextmanager
+import os
 import uvicorn
-from prediction.predictor import predict_disease_scores
+from prediction.predictor import scoring_engine, predict_disease_scores, predict_disease_scores_batch, predict_disease_scores_batch_records
 from prediction.treatment_predictor import predict_treatments
 from prediction.medication_predictor import suggest_medications
-from prediction.gemini_predictor import gemini_predictor
-from prediction.gemini_compatibility import compatibility_checker, CompatibilityResult, MedicationWarning
-from prediction.gemini_analysis_suggester import analysis_suggester, AnalysisSuggestionsResponse
+from prediction.medication_catalog import medication_catalog
+from prediction.gemini_predictor import gemini_predictor, MEDICAL_PROMPT, DiagnosticResult, MedicationSuggestion
+from prediction.gemini_compatibility import compatibility_checker, CompatibilityResult, MedicationWarning, COMPATIBILITY_PROMPT
+from prediction.gemini_analysis_suggester import analysis_suggester, AnalysisSuggestionsResponse, ANALYSIS_PROMPT
+from prediction.consultation_cache import consultation_cache
+from prediction.response_cache import response_cache
+from prediction.compatibility_sessions import compatibility_sessions
+from prediction.gemini_client import get_client, close_client, breaker_states
+from prediction.resilience import failure_reason
+from prediction.image_pipeline import image_pipeline, source_digest, ProcessedImage, REF_PREFIX
+from prediction.prompts import prompt_accounting, context_cache
+from prediction.metrics import registry, MetricsMiddleware, FALLBACKS, HANDLER_ERRORS
+from prediction.executors import executors
+from prediction.plugins import plugins
+from prediction.responses import FastJSONResponse, dumps
+from prediction.single_flight import compatibility_flights, analysis_flights, SupersededError
+from prediction.prescription_pdf import prescription_renderer, prescription_filename, render_prescriptions, build_archive
+from prediction.consultation_store import consultation_store
+from prediction.audit_log import audit_log, AuditRejected
 
 class DetailOption(BaseModel):
     name: str
@@ -43,14 +63,29 @@ class RecentDisease(BaseModel):
     date: int  
 
 class DiagnosticInput(BaseModel):
-    medicalHistory: List[MedicalHistoryItem]
-    symptoms: List[Symptom]
-    analyses: List[Analysis]
-    recentDiseases: List[RecentDisease]
+    medicalHistory: List[MedicalHistoryItem] = []
+    symptoms: List[Symptom] = []
+    analyses: List[Analysis] = []
+    recentDiseases: List[RecentDisease] = []
     patientInfo: Optional[Dict[str, Union[int, str]]] = None
+    # Patient (numéro CMU) et consultation enregistrés : les champs vides sont chargés côté serveur
+    patientRef: Optional[str] = None
+    consultationId: Optional[int] = None
+
+class ScoredDiagnostic(BaseModel):
+    id: int
+    disease: str
+    probability: float
 
 class DiagnosticOutput(BaseModel):
-    diagnostics: List[Dict[str, Union[int, str, float]]]
+    # Diagnostics Gemini, avec explication
+    diagnostics: List[DiagnosticResult]
+    source: Optional[str] = None  # "gemini"
+
+class FallbackDiagnosticOutput(BaseModel):
+    # Scores du calcul manuel, sans explication
+    diagnostics: List[ScoredDiagnostic]
+    source: Optional[str] = None  # "fallback"
 
 class TreatmentOutput(BaseModel):
     diagnostic: str
@@ -67,7 +102,20 @@ class MedicationItem(BaseModel):
     selected: Optional[bool] = False
 
 class MedicationOutput(BaseModel):
-    medications: List[MedicationItem]
+    medications: List[MedicationSuggestion]
+
+class MedicationSearchItem(BaseModel):
+    id: int
+    name: str
+    brands: List[str]
+    indication: str
+    dosage: str
+    category: str
+    cost: float
+    score: float
+
+class MedicationSearchOutput(BaseModel):
+    results: List[MedicationSearchItem]
 
 class MedicationInput(BaseModel):
     symptoms: List[Symptom]
@@ -79,6 +127,14 @@ class PatientInfo(BaseModel):
     age: int
     cmuNumber: str
 
+class DoctorInfo(BaseModel):
+    name: Optional[str] = None
+    specialty: Optional[str] = None
+    registration: Optional[str] = None
+    facility: Optional[str] = None
+    address: Optional[str] = None
+    phone: Optional[str] = None
+
 class PrescriptionInput(BaseModel):
     patient: PatientInfo
     diagnostic: str
@@ -86,6 +142,8 @@ class PrescriptionInput(BaseModel):
     posology: str
     medications: List[MedicationItem]
     consultationDate: str
+    doctor: Optional[DoctorInfo] = None
+    consultationId: Optional[int] = None
 
 class PrescriptionOutput(BaseModel):
     patient: PatientInfo
@@ -95,8 +153,60 @@ class PrescriptionOutput(BaseModel):
     posology: str
     medications: List[MedicationItem]
     instructions: str
+    doctor: Optional[DoctorInfo] = None
+
+class ConsultationInput(BaseModel):
+    patient: PatientInfo
+    consultationDate: Optional[str] = None
+    medicalHistory: List[MedicalHistoryItem] = []
+    symptoms: List[Symptom] = []
+    analyses: List[Analysis] = []
+    patientInfo: Optional[Dict[str, Union[int, str]]] = None
+
+class ConsultationCreated(BaseModel):
+    consultationId: int
+    patientRef: str
+    photoRefs: List[Optional[str]]
+
+class ConsultationSummary(BaseModel):
+    id: int
+    patientRef: str
+    consultationDate: str
+    diagnostic: Optional[str] = None
 
-app = FastAPI()
+class ConsultationList(BaseModel):
+    consultations: List[ConsultationSummary]
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Le client Gemini est créé au premier appel ; GEMINI_EAGER_INIT=1 le crée dès le démarrage.
+    Avec GEMINI_CONTEXT_CACHE=1, les préfixes statiques des prompts sont mis en cache au démarrage
+    (puis renouvelés à l'usage avant expiration, voir ContextCache).
+    Les pools d'exécution (threads et processus) sont démarrés ici et arrêtés à l'extinction.
+    """
+    await executors.start()
+    audit_log.start()
+    if os.getenv('GEMINI_EAGER_INIT', '0') == '1' or context_cache.enabled:
+        try:
+            client = get_client()
+            if context_cache.enabled:
+                # Préfixes statiques des prompts mis en cache côté Gemini
+                for template, model in (
+                    (MEDICAL_PROMPT, gemini_predictor.model),
+                    (COMPATIBILITY_PROMPT, compatibility_checker.model),
+                    (ANALYSIS_PROMPT, analysis_suggester.model),
+                ):
+                    await executors.run_io(context_cache.ensure, client, template, model, task="context_cache")
+        except Exception as e:
+            print(f"Gemini client initialization failed, fallback engines only: {str(e)}")
+    yield
+    await close_client()
+    await audit_log.close()
+    executors.shutdown()
+    consultation_store.close()
+
+app = FastAPI(lifespan=lifespan, default_response_class=FastJSONResponse)
 
 app.add_middleware(
     CORSMiddleware,
@@ -106,34 +216,145 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-@app.post("/diagnostic", response_model=DiagnosticOutput)
-async def predict_diseases(input_data: DiagnosticInput):
+app.add_middleware(MetricsMiddleware)
+
+async def photo_sources(input_data: DiagnosticInput):
     """
-    Utilise l'IA Gemini pour prédire les diagnostics.
-    En cas d'échec, utilise le système de calcul manuel comme fallback.
+    Empreinte (source_digest) de la photo de chaque analyse, None sans photo. Calculée
+    une seule fois par requête, dans le pool de threads : elle sert à la fois à
+    diagnostic_cache_key et au pré-traitement des images.
     """
-    try:
-        gemini_response = gemini_predictor.predict_with_gemini(
+    photos = [analysis.photo for analysis in input_data.analyses]
+    if not any(photos):
+        return [None] * len(photos)
+    return await executors.run_io(
+        lambda: [source_digest(photo) if photo else None for photo in photos], task="image"
+    )
+
+def diagnostic_cache_key(input_data: DiagnosticInput, sources):
+    """
+    Hash canonique d'un DiagnosticInput. Les photos sont remplacées par leur empreinte
+    (`sources`, voir photo_sources) : le texte base64 (plusieurs Mo) n'est ni
+    re-sérialisé ni copié.
+    """
+    payload = input_data.model_dump(
+        mode="json", exclude={"analyses": {"__all__": {"photo"}}, "patientRef": True, "consultationId": True}
+    )
+    payload["photos"] = sources
+    return consultation_cache.make_key(payload)
+
+async def load_consultation(input_data: DiagnosticInput):
+    """
+    Complète un DiagnosticInput depuis le stockage des consultations : avec `patientRef`,
+    antécédents et maladies récentes du patient ; avec `consultationId`, symptômes,
+    analyses et patientInfo enregistrés. Les champs envoyés par le client restent
+    prioritaires. Les photos enregistrées (références) absentes du cache d'images y
+    sont rechargées sans nouveau décodage. Lève LookupError si le patient ou la
+    consultation est inconnu.
+    """
+    if not input_data.patientRef and input_data.consultationId is None:
+        return input_data
+
+    context = await executors.run_io(
+        consultation_store.patient_context, input_data.patientRef, input_data.consultationId, task="consultation_store"
+    )
+    if context is None:
+        raise LookupError("Patient ou consultation inconnu")
+    fields = {
+        field: context[field] for field in ("medicalHistory", "recentDiseases", "symptoms", "analyses", "patientInfo")
+        if context.get(field) and not getattr(input_data, field)
+    }
+    if fields:
+        loaded = DiagnosticInput.model_validate(fields)
+        input_data = input_data.model_copy(update={field: getattr(loaded, field) for field in fields})
+
+    missing = [
+        analysis.photo[len(REF_PREFIX):] for analysis in input_data.analyses
+        if analysis.photo and analysis.photo.startswith(REF_PREFIX)
+        and image_pipeline.get(analysis.photo[len(REF_PREFIX):]) is None
+    ]
+    if missing:
+        for row in await executors.run_io(consultation_store.images, missing, task="consultation_store"):
+            image_pipeline.put(ProcessedImage(*row))
+    return input_data
+
+async def get_gemini_diagnostic(input_data: DiagnosticInput):
+    """
+    Réponse Gemini (diagnostics + médicaments) pour un DiagnosticInput.
+    /diagnostic et /suggest-medications partagent un seul appel Gemini par consultation.
+    """
+    sources = await photo_sources(input_data)
+    return await consultation_cache.get_or_compute(
+        diagnostic_cache_key(input_data, sources),
+        lambda: gemini_predictor.predict_with_gemini_async(
             input_data.symptoms,
             input_data.analyses,
             input_data.medicalHistory,
             input_data.recentDiseases,
-            input_data.patientInfo
+            input_data.patientInfo,
+            sources
         )
+    )
+
+# Tâches Gemini poursuivies en arrière-plan après dépassement du budget de latence
+background_tasks = set()
 
-        diagnostics = []
-        for diag in gemini_response.diagnostics:
-            diagnostics.append({
-                "id": diag.id,
-                "disease": diag.disease,
-                "probability": diag.probability,
-                "explanation": diag.explanation
-            })
+def keep_in_background(task):
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+    # Récupère l'exception éventuelle pour éviter l'avertissement "never retrieved"
+    task.add_done_callback(lambda t: t.cancelled() or t.exception())
 
-        return DiagnosticOutput(diagnostics=diagnostics)
+async def audited(endpoint, inputs, output, source=None):
+    """
+    Journalise la prédiction (entrées, résultat, source) puis construit la réponse.
+    Journal d'audit saturé avec la politique "reject" : 503, aucun résultat n'est
+    rendu sans être journalisé.
+    """
+    try:
+        await audit_log.record(endpoint, inputs, output, source or getattr(output, "source", None))
+    except AuditRejected as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    return FastJSONResponse(output)
+
+async def audit_streamed(endpoint, inputs, output, source, error=None):
+    # Réponse déjà envoyée en partie : un refus du journal ne peut plus faire échouer la requête
+    try:
+        await audit_log.record(endpoint, inputs, output, source, error)
+    except AuditRejected as e:
+        print(f"Audit record rejected for {endpoint}: {str(e)}")
+
+@app.post("/diagnostic", response_model=Union[DiagnosticOutput, FallbackDiagnosticOutput])
+async def predict_diseases(input_data: DiagnosticInput, latency_budget: Optional[float] = None):
+    """
+    Utilise l'IA Gemini pour prédire les diagnostics.
+    En cas d'échec, utilise le système de calcul manuel comme fallback.
+
+    Avec un budget de latence (paramètre `latency_budget` ou DIAGNOSTIC_LATENCY_BUDGET,
+    en secondes), le calcul manuel est fait pendant l'appel Gemini : si Gemini n'a pas
+    répondu dans le budget, le résultat manuel est retourné (source="fallback") et la
+    réponse Gemini est tout de même collectée en arrière-plan pour alimenter les caches.
+
+    Avec `patientRef` / `consultationId`, l'historique et la consultation enregistrés
+    (POST /consultations) sont chargés côté serveur (voir load_consultation).
+    """
+    if latency_budget is None:
+        latency_budget = float(os.getenv('DIAGNOSTIC_LATENCY_BUDGET', 0))
+    try:
+        input_data = await load_consultation(input_data)
+    except LookupError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+    if latency_budget > 0:
+        return await predict_diseases_within_budget(input_data, latency_budget)
+
+    try:
+        gemini_response = await get_gemini_diagnostic(input_data)
+        output = DiagnosticOutput(diagnostics=gemini_response.diagnostics, source="gemini")
 
     except Exception as e:
         print(f"Gemini API failed, using manual calculation fallback: {str(e)}")
+        FALLBACKS.inc(endpoint="diagnostic", reason=failure_reason(e))
         try:
             disease_scores = predict_disease_scores(
                 input_data.symptoms,
@@ -141,16 +362,235 @@ async def predict_diseases(input_data: DiagnosticInput):
                 input_data.medicalHistory,
                 input_data.recentDiseases
             )
-            return DiagnosticOutput(diagnostics=disease_scores)
+            output = FallbackDiagnosticOutput(diagnostics=disease_scores, source="fallback")
         except Exception as fallback_error:
+            HANDLER_ERRORS.inc(endpoint="diagnostic")
             raise HTTPException(status_code=500, detail=f"Both Gemini and fallback failed: {str(fallback_error)}")
 
+    return await audited("diagnostic", input_data, output)
+
+async def predict_diseases_within_budget(input_data: DiagnosticInput, latency_budget: float):
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + latency_budget
+    gemini_task = asyncio.ensure_future(get_gemini_diagnostic(input_data))
+
+    # Le calcul manuel (quelques microsecondes) s'exécute pendant que l'appel Gemini est en vol
+    try:
+        disease_scores = predict_disease_scores(
+            input_data.symptoms,
+            input_data.analyses,
+            input_data.medicalHistory,
+            input_data.recentDiseases
+        )
+        fallback_error = None
+    except Exception as e:
+        disease_scores = None
+        fallback_error = e
+
+    await asyncio.wait({gemini_task}, timeout=max(0, deadline - loop.time()))
+
+    if gemini_task.done() and not gemini_task.cancelled() and gemini_task.exception() is None:
+        return await audited("diagnostic", input_data, DiagnosticOutput(diagnostics=gemini_task.result().diagnostics, source="gemini"))
+
+    if gemini_task.done():
+        print(f"Gemini API failed, using manual calculation fallback: {str(gemini_task.exception())}")
+        reason = failure_reason(gemini_task.exception())
+    else:
+        print(f"Gemini exceeded the {latency_budget}s latency budget, returning manual calculation")
+        keep_in_background(gemini_task)
+        reason = "latency_budget"
+
+    if disease_scores is None:
+        if not gemini_task.done():
+            # Sans résultat manuel, on attend finalement Gemini plutôt que d'échouer
+            try:
+                gemini_response = await asyncio.shield(gemini_task)
+            except Exception:
+                gemini_response = None
+            if gemini_response is not None:
+                return await audited("diagnostic", input_data, DiagnosticOutput(diagnostics=gemini_response.diagnostics, source="gemini"))
+        HANDLER_ERRORS.inc(endpoint="diagnostic")
+        raise HTTPException(status_code=500, detail=f"Both Gemini and fallback failed: {str(fallback_error)}")
+
+    FALLBACKS.inc(endpoint="diagnostic", reason=reason)
+    return await audited("diagnostic", input_data, FallbackDiagnosticOutput(diagnostics=disease_scores, source="fallback"))
+
+def sse_event(event, data):
+    return f"event: {event}\ndata: {dumps(data).decode('utf-8')}\n\n"
+
+@app.post("/diagnostic/stream")
+async def predict_diseases_stream(input_data: DiagnosticInput):
+    """
+    Diagnostic en streaming (Server-Sent Events) : chaque diagnostic est envoyé dès que
+    Gemini l'a généré (événement "diagnostic"), puis les médicaments ("medication"),
+    puis "done". Si Gemini échoue avant le premier diagnostic, le système de calcul
+    manuel prend le relais ; un échec en cours de flux produit un événement "error".
+    """
+    try:
+        input_data = await load_consultation(input_data)
+    except LookupError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+    async def stream():
+        emitted = False
+        output = {"diagnostics": [], "medications": []}
+        try:
+            sources = await photo_sources(input_data)
+            async for event, item in gemini_predictor.stream_with_gemini(
+                input_data.symptoms,
+                input_data.analyses,
+                input_data.medicalHistory,
+                input_data.recentDiseases,
+                input_data.patientInfo,
+                sources
+            ):
+                if event == "complete":
+                    # La réponse complète sert aussi au prochain /suggest-medications
+                    consultation_cache.set(diagnostic_cache_key(input_data, sources), item)
+                    continue
+                emitted = True
+                data = item.model_dump()
+                if event == "medication":
+                    data["selected"] = False
+                output[event + "s"].append(data)
+                yield sse_event(event, data)
+            yield sse_event("done", {"source": "gemini"})
+            await audit_streamed("diagnostic_stream", input_data, output, "gemini")
+
+        except Exception as e:
+            print(f"Gemini streaming failed: {str(e)}")
+            if emitted:
+                HANDLER_ERRORS.inc(endpoint="diagnostic_stream")
+                yield sse_event("error", {"detail": str(e)})
+                await audit_streamed("diagnostic_stream", input_data, output, "gemini", str(e))
+                return
+            FALLBACKS.inc(endpoint="diagnostic_stream", reason=failure_reason(e))
+            try:
+                for diagnostic in predict_disease_scores(
+                    input_data.symptoms,
+                    input_data.analyses,
+                    input_data.medicalHistory,
+                    input_data.recentDiseases
+                ):
+                    output["diagnostics"].append(diagnostic)
+                    yield sse_event("diagnostic", diagnostic)
+                for medication in suggest_medications(input_data.symptoms, input_data.analyses):
+                    output["medications"].append(medication)
+                    yield sse_event("medication", MedicationItem(**medication).model_dump())
+                yield sse_event("done", {"source": "fallback"})
+                await audit_streamed("diagnostic_stream", input_data, output, "fallback")
+            except Exception as fallback_error:
+                HANDLER_ERRORS.inc(endpoint="diagnostic_stream")
+                yield sse_event("error", {"detail": f"Both Gemini and fallback failed: {str(fallback_error)}"})
+                await audit_streamed("diagnostic_stream", input_data, output, "fallback", str(fallback_error))
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.post("/diagnostic/batch")
+async def predict_diseases_batch(items: List[Dict[str, Any]], use_gemini: bool = True):
+    """
+    Diagnostic en masse (ex. re-scoring d'un lot de consultations après réception d'analyses).
+
+    Le système de règles score tous les patients en une seule multiplication matricielle ;
+    les appels Gemini sont lancés en parallèle avec une concurrence bornée
+    (BATCH_GEMINI_CONCURRENCY). Les résultats sont renvoyés en NDJSON, une ligne par
+    patient, au fur et à mesure : {"index", "source", "diagnostics"} ou {"index", "error"}.
+    Une entrée invalide ou en échec n'interrompt pas le lot.
+    """
+    inputs = {}
+    invalid = {}
+    for index, item in enumerate(items):
+        try:
+            inputs[index] = DiagnosticInput.model_validate(item)
+        except ValidationError as e:
+            invalid[index] = f"Invalid input: {e.errors(include_url=False, include_input=False)}"
+
+    # Consultations référencées (patientRef / consultationId) chargées depuis le stockage
+    loaded = await asyncio.gather(*(load_consultation(data) for data in inputs.values()), return_exceptions=True)
+    for index, data in zip(list(inputs), loaded):
+        if isinstance(data, Exception):
+            del inputs[index]
+            invalid[index] = f"Invalid input: {str(data)}"
+        else:
+            inputs[index] = data
+
+    try:
+        if len(inputs) >= int(os.getenv('BATCH_PROCESS_THRESHOLD', 64)):
+            # Gros lot : scoring dans le pool de processus, la boucle reste disponible
+            scores = await executors.run_cpu(predict_disease_scores_batch_records, [
+                (
+                    [symptom.model_dump(include={'name'}) for symptom in data.symptoms],
+                    [analysis.model_dump(exclude={'photo'}) for analysis in data.analyses]
+                )
+                for data in inputs.values()
+            ], task="batch_scoring")
+        else:
+            scores = predict_disease_scores_batch([
+                (data.symptoms, data.analyses, data.medicalHistory, data.recentDiseases)
+                for data in inputs.values()
+            ])
+        fallback_scores = dict(zip(inputs, scores))
+        fallback_error = None
+    except Exception as e:
+        fallback_scores = {}
+        fallback_error = str(e)
+
+    def fallback_line(index, error=None):
+        if index in fallback_scores:
+            line = {"index": index, "source": "fallback", "diagnostics": fallback_scores[index]}
+            if error:
+                line["error"] = error
+            return line
+        return {"index": index, "error": error or f"Fallback failed: {fallback_error}"}
+
+    semaphore = asyncio.Semaphore(int(os.getenv('BATCH_GEMINI_CONCURRENCY', 4)))
+
+    async def run_gemini(index, data):
+        async with semaphore:
+            try:
+                gemini_response = await get_gemini_diagnostic(data)
+                return {"index": index, "source": "gemini", "diagnostics": gemini_response.diagnostics}
+            except Exception as e:
+                FALLBACKS.inc(endpoint="diagnostic_batch", reason=failure_reason(e))
+                return fallback_line(index, f"Gemini API failed: {str(e)}")
+
+    async def stream():
+        for index, error in invalid.items():
+            yield dumps({"index": index, "error": error}) + b"\n"
+
+        if not use_gemini:
+            for index in inputs:
+                line = fallback_line(index)
+                await audit_streamed("diagnostic_batch", inputs[index], line, line.get("source"), line.get("error"))
+                yield dumps(line) + b"\n"
+            return
+
+        tasks = [asyncio.ensure_future(run_gemini(index, data)) for index, data in inputs.items()]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                line = await next_done
+                await audit_streamed("diagnostic_batch", inputs[line["index"]], line, line.get("source"), line.get("error"))
+                yield dumps(line) + b"\n"
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
 @app.post("/predict-treatment", response_model=TreatmentOutput)
 async def predict_treatment(input_data: DiagnosticInput, diagnostic: str):
     """
     Une fois le diagnostic sélectionné (par exemple, "Malaria" ou "Dengue"),
     ce point d'entrée retourne la proposition de traitement et la posologie correspondante.
     """
+    try:
+        input_data = await load_consultation(input_data)
+    except LookupError as e:
+        raise HTTPException(status_code=404, detail=str(e))
     try:
         treatment = predict_treatments(
             diagnostic,
@@ -174,68 +614,166 @@ async def get_medication_suggestions(input_data: DiagnosticInput):
     En cas d'échec, utilise le système manuel comme fallback.
     """
     try:
-        gemini_response = gemini_predictor.predict_with_gemini(
-            input_data.symptoms,
-            input_data.analyses,
-            input_data.medicalHistory,
-            input_data.recentDiseases,
-            input_data.patientInfo
-        )
-
-        medications = []
-        for med in gemini_response.medications:
-            medications.append({
-                "id": med.id,
-                "name": med.name,
-                "indication": med.indication,
-                "dosage": med.dosage,
-                "category": med.category,
-                "cost": med.cost,
-                "selected": False
-            })
-
-        return MedicationOutput(medications=medications)
+        input_data = await load_consultation(input_data)
+    except LookupError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    try:
+        gemini_response = await get_gemini_diagnostic(input_data)
+        output, source = MedicationOutput(medications=gemini_response.medications), "gemini"
 
     except Exception as e:
         print(f"Gemini API failed for medications, using manual fallback: {str(e)}")
+        FALLBACKS.inc(endpoint="medications", reason=failure_reason(e))
         try:
             medications = suggest_medications(input_data.symptoms, input_data.analyses)
-            return MedicationOutput(medications=medications)
+            output, source = MedicationOutput(medications=medications), "fallback"
         except Exception as fallback_error:
+            HANDLER_ERRORS.inc(endpoint="medications")
             raise HTTPException(status_code=500, detail=f"Both Gemini and fallback failed: {str(fallback_error)}")
 
+    return await audited("medications", input_data, output, source)
+
+@app.get("/medications/search", response_model=MedicationSearchOutput)
+async def search_medications(q: str, limit: int = 10):
+    """
+    Saisie semi-automatique des médicaments du formulaire : nom générique, marque ou
+    catégorie, insensible aux accents, tolérante aux fautes de frappe.
+    """
+    return FastJSONResponse(MedicationSearchOutput(results=medication_catalog.search(q, max(1, min(limit, 50)))))
+
+PRESCRIPTION_INSTRUCTIONS = "Respecter strictement la posologie prescrite. En cas d'effets secondaires, consulter immédiatement un médecin."
+
+def build_prescription(input_data: PrescriptionInput) -> PrescriptionOutput:
+    return PrescriptionOutput(
+        patient=input_data.patient,
+        consultationDate=input_data.consultationDate,
+        diagnostic=input_data.diagnostic,
+        treatment=input_data.treatment,
+        posology=input_data.posology,
+        medications=input_data.medications,
+        instructions=PRESCRIPTION_INSTRUCTIONS,
+        doctor=input_data.doctor
+    )
+
 @app.post("/generate-prescription", response_model=PrescriptionOutput)
 async def generate_prescription(input_data: PrescriptionInput):
     """
-    Génère une ordonnance médicale complète pour le patient.
+    Génère une ordonnance médicale complète pour le patient. Avec `consultationId`, le
+    diagnostic retenu est enregistré dans l'historique du patient.
     """
     try:
-        instructions = "Respecter strictement la posologie prescrite. En cas d'effets secondaires, consulter immédiatement un médecin."
-
-        return PrescriptionOutput(
-            patient=input_data.patient,
-            consultationDate=input_data.consultationDate,
-            diagnostic=input_data.diagnostic,
-            treatment=input_data.treatment,
-            posology=input_data.posology,
-            medications=input_data.medications,
-            instructions=instructions
-        )
+        prescription = build_prescription(input_data)
+        if input_data.consultationId is not None:
+            await executors.run_io(
+                consultation_store.set_diagnostic, input_data.consultationId, input_data.diagnostic, task="consultation_store"
+            )
+        return prescription
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/generate-prescription/pdf")
+async def generate_prescription_pdf(input_data: PrescriptionInput):
+    """
+    Ordonnance au format PDF, prête à imprimer (gabarit compilé au démarrage, rendu
+    en quelques millisecondes).
+    """
+    try:
+        prescription = build_prescription(input_data).model_dump()
+        pdf = prescription_renderer.render(prescription)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    return Response(pdf, media_type="application/pdf", headers={
+        "Content-Disposition": f'inline; filename="{prescription_filename(prescription)}"'
+    })
+
+@app.post("/prescriptions/export")
+async def export_prescriptions(inputs: List[PrescriptionInput]):
+    """
+    Export en lot (ex. ordonnances de la journée) : les PDF sont rendus en parallèle
+    dans le pool de processus, par tranches, puis renvoyés dans une archive ZIP.
+    """
+    limit = int(os.getenv('PRESCRIPTION_EXPORT_MAX', 500))
+    if not inputs:
+        raise HTTPException(status_code=400, detail="Aucune ordonnance à exporter")
+    if len(inputs) > limit:
+        raise HTTPException(status_code=413, detail=f"Export limité à {limit} ordonnances")
+
+    prescriptions = [build_prescription(input_data).model_dump() for input_data in inputs]
+    size = -(-len(prescriptions) // executors.cpu_workers)
+    try:
+        parts = await asyncio.gather(*(
+            executors.run_cpu(render_prescriptions, prescriptions[i:i + size], task="prescription_pdf")
+            for i in range(0, len(prescriptions), size)
+        ))
+        archive = await executors.run_io(build_archive, [file for part in parts for file in part], task="prescription_zip")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    return Response(archive, media_type="application/zip", headers={
+        "Content-Disposition": 'attachment; filename="ordonnances.zip"'
+    })
+
 class CompatibilityInput(BaseModel):
     medications: List[MedicationItem]
     patientInfo: Optional[Dict[str, Union[int, str, List]]] = None
+    sessionId: Optional[str] = None
 
 @app.post("/check-medication-compatibility", response_model=CompatibilityResult)
 async def check_medication_compatibility(input_data: CompatibilityInput):
     """
     Vérifie les interactions médicamenteuses et contre-indications.
     Retourne des warnings si incompatibilités détectées.
+    Les paires que ni le moteur de règles ni Gemini n'ont pu vérifier sont listées
+    dans `unverified_pairs` et la sélection n'est alors pas déclarée compatible.
+
+    Les vérifications identiques en cours partagent un seul appel. Avec `sessionId`,
+    une nouvelle sélection remplace la vérification précédente de la session (409).
     """
+    medications = [
+        {
+            "id": med.id,
+            "name": med.name,
+            "category": med.category,
+            "indication": med.indication,
+            "dosage": med.dosage
+        }
+        for med in input_data.medications
+    ]
+
     try:
-        medications = [
+        result = await compatibility_flights.do(
+            compatibility_checker.cache_key(medications, input_data.patientInfo),
+            lambda: compatibility_checker.check_compatibility_async(medications, input_data.patientInfo),
+            session=input_data.sessionId
+        )
+
+    except SupersededError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except Exception as e:
+        print(f"Compatibility check error, using local rules only: {str(e)}")
+        HANDLER_ERRORS.inc(endpoint="compatibility")
+        try:
+            local_warnings, unknown_pairs = compatibility_checker.check_locally(medications, input_data.patientInfo)
+            result = compatibility_checker.merge_results(local_warnings, None, unknown_pairs)
+            result.source = "fallback"
+        except Exception as fallback_error:
+            raise HTTPException(status_code=500, detail=f"Compatibility check failed: {str(fallback_error)}")
+
+    return await audited("compatibility", input_data, result, result.source)
+
+class CompatibilityDeltaInput(BaseModel):
+    sessionId: str
+    added: List[MedicationItem] = []
+    removed: List[int] = []
+    patientInfo: Optional[Dict[str, Union[int, str, List]]] = None
+
+@app.post("/check-medication-compatibility/incremental", response_model=CompatibilityResult)
+async def check_medication_compatibility_incremental(input_data: CompatibilityDeltaInput):
+    """
+    Vérification incrémentale : le serveur conserve, pour la session, les paires déjà
+    analysées et n'évalue que celles introduites par les médicaments ajoutés.
+    """
+    try:
+        added = [
             {
                 "id": med.id,
                 "name": med.name,
@@ -243,41 +781,235 @@ async def check_medication_compatibility(input_data: CompatibilityInput):
                 "indication": med.indication,
                 "dosage": med.dosage
             }
-            for med in input_data.medications
+            for med in input_data.added
         ]
 
-        result = compatibility_checker.check_compatibility(
-            medications,
+        result = await compatibility_sessions.apply_delta(
+            input_data.sessionId,
+            added,
+            input_data.removed,
             input_data.patientInfo
         )
 
-        return result
-
     except Exception as e:
-        print(f"Compatibility check error: {str(e)}")
-        return CompatibilityResult(compatible=True, warnings=[])
+        print(f"Incremental compatibility check error: {str(e)}")
+        HANDLER_ERRORS.inc(endpoint="compatibility_incremental")
+        raise HTTPException(status_code=500, detail=str(e))
+
+    return await audited("compatibility_incremental", input_data, result, result.source)
 
 class AnalysisSuggestionInput(BaseModel):
     symptoms: List[Symptom]
     medicalHistory: List[MedicalHistoryItem]
     patientInfo: Optional[Dict[str, Union[int, str]]] = None
+    sessionId: Optional[str] = None
 
 @app.post("/suggest-analyses", response_model=AnalysisSuggestionsResponse)
 async def get_analysis_suggestions(input_data: AnalysisSuggestionInput):
     """
     Suggère des analyses médicales pertinentes basées sur les symptômes et antécédents.
+    Les demandes identiques en cours partagent un seul appel ; avec `sessionId`, une
+    saisie plus récente remplace la demande précédente de la session (409).
     """
     try:
-        result = analysis_suggester.suggest_analyses(
-            input_data.symptoms,
-            input_data.medicalHistory,
-            input_data.patientInfo
+        result = await analysis_flights.do(
+            analysis_suggester.cache_key(input_data.symptoms, input_data.medicalHistory, input_data.patientInfo),
+            lambda: analysis_suggester.suggest_analyses_async(
+                input_data.symptoms,
+                input_data.medicalHistory,
+                input_data.patientInfo
+            ),
+            session=input_data.sessionId
         )
-        return result
+        return FastJSONResponse(result)
 
+    except SupersededError as e:
+        raise HTTPException(status_code=409, detail=str(e))
     except Exception as e:
         print(f"Analysis suggestion error: {str(e)}")
-        return AnalysisSuggestionsResponse(suggestions=[])
+        HANDLER_ERRORS.inc(endpoint="analyses")
+        return FastJSONResponse(AnalysisSuggestionsResponse(suggestions=[]))
+
+class PhotoUploadOutput(BaseModel):
+    photoRef: str
+    mimeType: str
+    size: int
+    width: Optional[int] = None
+    height: Optional[int] = None
+
+@app.post("/analyses/photo", response_model=PhotoUploadOutput)
+async def upload_analysis_photo(photo: UploadFile = File(...)):
+    """
+    Téléversement multipart d'une photo d'analyse (alternative au base64 dans le JSON).
+    L'image est lue par blocs, pré-traitée une fois, et la référence retournée
+    ("sha256:<hex>") peut être utilisée comme valeur de Analysis.photo.
+    """
+    try:
+        buffer = bytearray()
+        while True:
+            chunk = await photo.read(64 * 1024)
+            if not chunk:
+                break
+            buffer += chunk
+        image = await image_pipeline.process_bytes_async(buffer)
+        return PhotoUploadOutput(
+            photoRef=image.ref,
+            mimeType=image.mime_type,
+            size=len(image.data),
+            width=image.width,
+            height=image.height
+        )
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Image invalide : {str(e)}")
+
+@app.post("/consultations", response_model=ConsultationCreated)
+async def create_consultation(input_data: ConsultationInput):
+    """
+    Enregistre une consultation (patient, antécédents, symptômes, analyses). Les photos
+    sont traitées une fois et conservées par empreinte ; les appels suivants n'envoient
+    que `patientRef` (numéro CMU) et `consultationId` au lieu de tout l'historique.
+    """
+    try:
+        images = await asyncio.gather(*(
+            image_pipeline.process_async(analysis.photo) for analysis in input_data.analyses if analysis.photo
+        ))
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Image invalide : {str(e)}")
+
+    refs = iter(images)
+    photo_refs = [next(refs).ref if analysis.photo else None for analysis in input_data.analyses]
+    analyses = [
+        {**analysis.model_dump(exclude={"photo"}), "photo": ref}
+        for analysis, ref in zip(input_data.analyses, photo_refs)
+    ]
+    try:
+        consultation_id = await executors.run_io(
+            consultation_store.save,
+            input_data.patient.model_dump(),
+            {
+                "consultationDate": input_data.consultationDate,
+                "medicalHistory": [item.model_dump() for item in input_data.medicalHistory],
+                "symptoms": [symptom.model_dump() for symptom in input_data.symptoms],
+                "analyses": analyses,
+                "patientInfo": input_data.patientInfo,
+            },
+            list({image.digest: (image.digest, image.mime_type, image.data, image.width, image.height) for image in images}.values()),
+            task="consultation_store"
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Date de consultation invalide : {str(e)}")
+    return ConsultationCreated(consultationId=consultation_id, patientRef=input_data.patient.cmuNumber, photoRefs=photo_refs)
+
+@app.get("/patients/{cmu_number}/consultations", response_model=ConsultationList)
+async def get_patient_consultations(cmu_number: str, limit: int = 20):
+    """
+    Historique des consultations d'un patient, de la plus récente à la plus ancienne.
+    """
+    consultations = await executors.run_io(
+        consultation_store.history, cmu_number, max(1, min(limit, 200)), task="consultation_store"
+    )
+    return ConsultationList(consultations=consultations)
+
+@app.get("/consultations", response_model=ConsultationList)
+async def get_consultations_on_date(date: str):
+    """
+    Consultations d'une journée (date "AAAA-MM-JJ", UTC).
+    """
+    try:
+        consultations = await executors.run_io(consultation_store.on_date, date, task="consultation_store")
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Date invalide : {date}")
+    return ConsultationList(consultations=consultations)
+
+@app.get("/health")
+async def health():
+    """
+    État du service, des disjoncteurs Gemini et des pools d'exécution. "degraded" : au
+    moins un modèle est court-circuité, les réponses viennent des moteurs locaux.
+    """
+    breakers = breaker_states()
+    degraded = any(state["state"] != "closed" for state in breakers.values())
+    return {"status": "degraded" if degraded else "ok", "gemini": breakers, "executors": executors.stats()}
+
+@app.get("/cache/stats")
+async def get_cache_stats():
+    """
+    Compteurs du cache de réponses Gemini : nombre d'appels LLM évités (hits) et effectués (misses).
+    """
+    return response_cache.stats()
+
+@app.get("/prompts/stats")
+async def get_prompt_stats():
+    """
+    Taille des prompts par endpoint : tokens du préfixe statique, de la section patient
+    (moyenne, max) et tokens d'entrée réellement facturés (usage_metadata).
+    """
+    return {
+        "templates": {
+            template.name: {"version": template.version, "static_tokens": template.static_tokens}
+            for template in (MEDICAL_PROMPT, COMPATIBILITY_PROMPT, ANALYSIS_PROMPT)
+        },
+        "usage": prompt_accounting.stats(),
+        "context_cache": context_cache.status(),
+    }
+
+def response_cache_counts():
+    stats = response_cache.stats()["by_kind"]
+    return {
+        (kind, result): counts[field]
+        for kind, counts in stats.items()
+        for result, field in (("hit", "hits"), ("miss", "misses"))
+    }
+
+def prompt_token_counts():
+    return {
+        (name, section): entry[field]
+        for name, entry in prompt_accounting.stats().items()
+        for section, field in (("dynamic", "dynamic_tokens_total"), ("prompt", "prompt_tokens_total"),
+                               ("cached", "cached_tokens_total"), ("output", "output_tokens_total"))
+    }
+
+registry.collector(
+    "esante_response_cache_lookups_total",
+    "Consultations du cache de réponses Gemini",
+    ("kind", "result"),
+    response_cache_counts,
+    kind="counter"
+)
+registry.collector(
+    "esante_prompt_tokens_total",
+    "Tokens des prompts Gemini par endpoint et par section",
+    ("endpoint", "section"),
+    prompt_token_counts,
+    kind="counter"
+)
+registry.collector(
+    "esante_prompt_static_tokens",
+    "Taille estimée du préfixe statique de chaque prompt",
+    ("endpoint",),
+    lambda: {(template.name,): template.static_tokens for template in (MEDICAL_PROMPT, COMPATIBILITY_PROMPT, ANALYSIS_PROMPT)}
+)
+registry.collector(
+    "esante_scoring_memo_lookups_total",
+    "Consultations du cache des scores du calcul manuel (variation déterministe)",
+    ("result",),
+    lambda: {("hit",): scoring_engine.memo_hits, ("miss",): scoring_engine.memo_misses},
+    kind="counter"
+)
+registry.collector(
+    "esante_plugins_loaded",
+    "Entrées du registre (catégories, maladies, traitements) dont le module est chargé",
+    ("kind",),
+    lambda: {(kind,): counts["loaded"] for kind, counts in plugins.stats().items()}
+)
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """
+    Métriques du processus au format texte Prometheus : latence par endpoint, durée et
+    erreurs des appels Gemini, fallbacks, échecs d'analyse des réponses, tailles des corps.
+    """
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
 
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8001)
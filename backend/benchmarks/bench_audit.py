@@ -0,0 +1,71 @@
+# File: benchmarks/bench_audit.py
+"""
+Benchmark du journal d'audit (prediction/audit_log.py).
+
+Coût vu par la requête d'un enregistrement (diagnostic typique) : écriture synchrone
+(compression, écriture et fsync dans le handler) contre dépôt dans la file du journal
+à écriture différée ; puis débit de la tâche d'écriture et taille moyenne sur disque.
+
+Usage (depuis backend/) :
+    python benchmarks/bench_audit.py [--records 5000]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+def make_record(i):
+    inputs = {
+        "symptoms": [{"name": name, "details": []} for name in ("fièvre", "frissons", "maux de tête")],
+        "analyses": [{"name": "TDR", "result": "positif", "resultType": "boolean", "photo": None}],
+        "medicalHistory": [], "recentDiseases": [{"name": "Malaria", "date": 30}], "patientRef": f"CMU-{i}",
+    }
+    output = {"diagnostics": [{"id": 1, "disease": "Malaria", "probability": 72.5,
+                               "explanation": "Fièvre, frissons et TDR positif évoquent un paludisme."}]}
+    return inputs, output
+
+async def run(records, directory):
+    from prediction.audit_log import AuditLog, encode_record, read_records
+
+    # Écriture synchrone dans le handler : un enregistrement = une écriture + fsync
+    path = os.path.join(directory, "sync.log")
+    with open(path, "ab") as f:
+        start = time.perf_counter()
+        for i in range(records // 10):
+            inputs, output = make_record(i)
+            f.write(encode_record({"id": i, "ts": time.time(), "endpoint": "diagnostic",
+                                   "source": "gemini", "inputs": inputs, "output": output}))
+            f.flush()
+            os.fsync(f.fileno())
+        synchronous = (time.perf_counter() - start) / (records // 10)
+
+    log = AuditLog(os.path.join(directory, "audit"), max_queue=records)
+    log.start()
+    start = time.perf_counter()
+    for i in range(records):
+        await log.record("diagnostic", *make_record(i), "gemini")
+    enqueue = (time.perf_counter() - start) / records
+    await log.close()
+    total = time.perf_counter() - start
+
+    size = sum(os.path.getsize(os.path.join(log.directory, name)) for name in os.listdir(log.directory))
+    count = sum(1 for _ in read_records(log.directory))
+    print(f"écriture synchrone (fsync)   {synchronous * 1e6:>9.1f} µs/requête")
+    print(f"écriture différée (file)     {enqueue * 1e6:>9.1f} µs/requête")
+    print(f"débit de la tâche d'écriture {records / total:>9.0f} enregistrements/s")
+    print(f"taille sur disque            {size / count:>9.0f} octets/enregistrement ({count} relus)")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--records", type=int, default=5000)
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as directory:
+        asyncio.run(run(args.records, directory))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,393 @@
+# File: benchmarks/bench_endpoints.py
+"""
+Benchmark des endpoints de l'application avec un faux client Gemini.
+
+Les requêtes passent par un client ASGI en mémoire (httpx.ASGITransport) : on mesure
+le coût de l'application seule (validation, moteurs locaux, caches, prompts,
+sérialisation), l'appel Gemini étant simulé avec une latence et un taux d'échec
+configurables. Les payloads DiagnosticInput sont générés aléatoirement (graine fixe) :
+nombre de symptômes variable, analyses avec ou sans photo, historique plus ou moins long.
+
+Pour chaque endpoint : débit (req/s), latences p50/p95/p99 et mémoire allouée par
+requête (pic tracemalloc, mesuré dans une passe séparée). Les résultats peuvent être
+enregistrés comme référence puis comparés : une régression au-delà de la tolérance
+fait échouer la commande (code de sortie 1).
+
+Usage (depuis backend/) :
+    python benchmarks/bench_endpoints.py [--requests 200] [--concurrency 16]
+        [--latency 0.05] [--failure-rate 0.0] [--only /diagnostic]
+        [--save-baseline benchmarks/baseline.json] [--baseline benchmarks/baseline.json]
+
+Requiert httpx. La référence dépend de la machine : la régénérer sur la machine de
+mesure avant de comparer.
+"""
+import argparse
+import asyncio
+import base64
+import json
+import os
+import random
+import struct
+import sys
+import time
+import tracemalloc
+import zlib
+from types import SimpleNamespace
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+# Le cache persistant fausserait les mesures : désactivé avant l'import de l'application
+os.environ.setdefault('GEMINI_CACHE_ENABLED', '0')
+os.environ.setdefault('GEMINI_API_KEY', 'benchmark')
+
+import httpx
+
+SYMPTOMS = ["fièvre", "maux de tête", "frissons", "anémie", "nausées", "vomissements",
+            "douleurs articulaires", "fatigue", "toux", "diarrhée", "éruption cutanée", "douleurs musculaires"]
+DETAILS = {"Intensité": ["Faible", "Modérée", "Forte"], "Durée": ["< 24h", "1-3 jours", "> 3 jours"]}
+HISTORY = ["Diabète", "Hypertension", "Asthme", "Ulcère gastrique", "Drépanocytose", "VIH", "Insuffisance rénale"]
+MEDICATIONS = [("Paracétamol", "Antipyrétique"), ("Ibuprofène", "Anti-inflammatoire"), ("Aspirine", "Anti-inflammatoire"),
+               ("Artéméther-Luméfantrine", "Antipaludique"), ("Amoxicilline", "Antibiotique"),
+               ("Warfarine", "Anticoagulant"), ("Métronidazole", "Antibiotique"), ("Oméprazole", "Antiulcéreux"),
+               ("Vitamine C", "Vitamine"), ("Zinc", "Complément")]
+
+def make_png(width, height, seed):
+    """
+    PNG RVB valide construit à la main (aucune dépendance à Pillow).
+    """
+    rng = random.Random(seed)
+    row = bytes(rng.getrandbits(8) for _ in range(width * 3))
+    raw = b"".join(b"\x00" + row for _ in range(height))
+
+    def chunk(kind, data):
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data) & 0xffffffff)
+
+    return (b"\x89PNG\r\n\x1a\n"
+            + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+            + chunk(b"IDAT", zlib.compress(raw, 1))
+            + chunk(b"IEND", b""))
+
+def make_diagnostic_input(rng, photo_rate=0.3):
+    symptoms = [
+        {
+            "name": name,
+            "details": [
+                {"id": i, "name": detail, "options": options, "selected": rng.choice(options)}
+                for i, (detail, options) in enumerate(DETAILS.items())
+            ]
+        }
+        for name in rng.sample(SYMPTOMS, rng.randint(1, 8))
+    ]
+    analyses = []
+    if rng.random() < 0.7:
+        analyses.append({"name": "Test de diagnostic rapide du paludisme", "result": rng.choice(["positif", "négatif"]),
+                         "resultType": "boolean"})
+    if rng.random() < 0.5:
+        analyses.append({"name": "Leucocytes", "result": rng.randint(2000, 12000), "resultType": "numeric",
+                         "unit": "/mm3", "threshold": 4000})
+    if rng.random() < photo_rate:
+        png = make_png(rng.choice([64, 256, 512]), 64, rng.random())
+        analyses.append({"name": "Frottis sanguin", "result": "voir photo", "resultType": "text",
+                         "photo": "data:image/png;base64," + base64.b64encode(png).decode("ascii")})
+    history = [
+        {"name": name, "details": [{"name": "Statut", "options": ["Traité", "Non traité"], "selected": "Traité"}]}
+        for name in rng.sample(HISTORY, rng.randint(0, len(HISTORY)))
+    ]
+    recent = [{"name": rng.choice(["Malaria", "Dengue", "Typhoïde"]), "date": rng.randint(1, 180)}
+              for _ in range(rng.randint(0, 3))]
+    return {
+        "medicalHistory": history,
+        "symptoms": symptoms,
+        "analyses": analyses,
+        "recentDiseases": recent,
+        "patientInfo": {"age": rng.randint(1, 90), "gender": rng.choice(["M", "F"])},
+    }
+
+def make_medications(rng, count=None):
+    chosen = rng.sample(MEDICATIONS, count or rng.randint(2, 6))
+    return [
+        {"id": i + 1, "name": name, "indication": "Indication", "dosage": "1 cp x 2/j", "category": category, "cost": 1500}
+        for i, (name, category) in enumerate(chosen)
+    ]
+
+class FakeModels:
+    """
+    Remplace client.models / client.aio.models : latence et taux d'échec configurables,
+    réponse conforme au schéma demandé dans la config.
+    """
+
+    def __init__(self, latency, failure_rate, seed):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.rng = random.Random(seed)
+        self.calls = 0
+
+    def _response(self, config):
+        from prediction.gemini_predictor import GeminiDiagnosticResponse
+        from prediction.gemini_compatibility import GeminiCompatibilityResponse
+        from prediction.gemini_analysis_suggester import AnalysisSuggestionsResponse
+
+        schema = config.response_schema
+        if schema is GeminiDiagnosticResponse:
+            parsed = GeminiDiagnosticResponse.model_validate({
+                "diagnostics": [
+                    {"id": i, "disease": disease, "probability": 80 - 20 * i, "explanation": "Tableau clinique compatible."}
+                    for i, disease in enumerate(["Paludisme", "Dengue", "Fièvre typhoïde"], start=1)
+                ],
+                "medications": [
+                    {"id": i, "name": name, "indication": "Indication", "dosage": "1 cp x 2/j", "category": category, "cost": 1500}
+                    for i, (name, category) in enumerate(MEDICATIONS[:6], start=1)
+                ],
+            })
+        elif schema is GeminiCompatibilityResponse:
+            parsed = GeminiCompatibilityResponse(compatible=True, warnings=[])
+        else:
+            parsed = AnalysisSuggestionsResponse.model_validate({"suggestions": [
+                {"id": i, "name": name, "reason": "Analyse utile.", "priority": "high", "category": "Hématologie"}
+                for i, name in enumerate(["NFS", "TDR Paludisme", "CRP"], start=1)
+            ]})
+        usage = SimpleNamespace(prompt_token_count=800, cached_content_token_count=0, candidates_token_count=300)
+        return SimpleNamespace(parsed=parsed, text=parsed.model_dump_json(), usage_metadata=usage)
+
+    def _should_fail(self):
+        self.calls += 1
+        return self.rng.random() < self.failure_rate
+
+    async def generate_content(self, model, contents, config):
+        await asyncio.sleep(self.latency)
+        if self._should_fail():
+            raise RuntimeError("Fake Gemini failure")
+        return self._response(config)
+
+    async def generate_content_stream(self, model, contents, config):
+        text = self._response(config).text
+        fail = self._should_fail()
+
+        async def stream():
+            pieces = 8
+            size = len(text) // pieces + 1
+            for i in range(pieces):
+                await asyncio.sleep(self.latency / pieces)
+                if fail and i == 0:
+                    raise RuntimeError("Fake Gemini failure")
+                last = i == pieces - 1
+                yield SimpleNamespace(
+                    text=text[i * size:(i + 1) * size],
+                    usage_metadata=SimpleNamespace(prompt_token_count=800, cached_content_token_count=0,
+                                                   candidates_token_count=300) if last else None
+                )
+        return stream()
+
+class SyncFakeModels:
+    def __init__(self, models):
+        self.models = models
+
+    def generate_content(self, model, contents, config):
+        time.sleep(self.models.latency)
+        if self.models._should_fail():
+            raise RuntimeError("Fake Gemini failure")
+        return self.models._response(config)
+
+class FakeGeminiClient:
+    def __init__(self, latency=0.05, failure_rate=0.0, seed=0):
+        models = FakeModels(latency, failure_rate, seed)
+        self.aio = SimpleNamespace(models=models)
+        self.models = SyncFakeModels(models)
+
+def build_scenarios(rng, count):
+    """
+    Une liste de requêtes (méthode, chemin, kwargs httpx) par endpoint.
+    """
+    diagnostics = [make_diagnostic_input(rng) for _ in range(count)]
+    png = make_png(512, 256, 42)
+
+    def prescription(i):
+        return {
+            "patient": {"firstName": "Awa", "lastName": f"Koné{i}", "age": 34, "cmuNumber": f"CMU{i:06d}"},
+            "diagnostic": "Paludisme",
+            "treatment": "Artéméther-Luméfantrine",
+            "posology": "4 cp x 2/j pendant 3 jours",
+            "medications": make_medications(rng),
+            "consultationDate": "2026-10-18",
+        }
+
+    def delta(i):
+        meds = make_medications(rng, 4)
+        return {"sessionId": f"bench-{i // 4}", "added": meds[i % 4:i % 4 + 1], "removed": [],
+                "patientInfo": {"age": 40, "medicalHistory": ["Ulcère gastrique"]}}
+
+    return {
+        "/diagnostic": [("POST", "/diagnostic", {"json": d}) for d in diagnostics],
+        "/diagnostic?latency_budget": [("POST", "/diagnostic", {"json": d, "params": {"latency_budget": 0.02}}) for d in diagnostics],
+        "/diagnostic/stream": [("POST", "/diagnostic/stream", {"json": d}) for d in diagnostics],
+        "/diagnostic/batch": [("POST", "/diagnostic/batch", {"json": diagnostics[i:i + 10]}) for i in range(0, count, 10)],
+        "/predict-treatment": [("POST", "/predict-treatment", {"json": d, "params": {"diagnostic": rng.choice(["Malaria", "Dengue"])}}) for d in diagnostics],
+        "/suggest-medications": [("POST", "/suggest-medications", {"json": d}) for d in diagnostics],
+        "/medications/search": [
+            ("GET", "/medications/search", {"params": {"q": rng.choice(["para", "amox", "coartem", "ibuprofen", "paracetmol", "vit"])}})
+            for _ in range(count)
+        ],
+        "/generate-prescription": [("POST", "/generate-prescription", {"json": prescription(i)}) for i in range(count)],
+        "/check-medication-compatibility": [
+            ("POST", "/check-medication-compatibility", {"json": {"medications": make_medications(rng), "patientInfo": d["patientInfo"]}})
+            for d in diagnostics
+        ],
+        "/check-medication-compatibility/incremental": [
+            ("POST", "/check-medication-compatibility/incremental", {"json": delta(i)}) for i in range(count)
+        ],
+        "/suggest-analyses": [
+            ("POST", "/suggest-analyses", {"json": {"symptoms": d["symptoms"], "medicalHistory": d["medicalHistory"], "patientInfo": d["patientInfo"]}})
+            for d in diagnostics
+        ],
+        "/analyses/photo": [("POST", "/analyses/photo", {"files": {"photo": ("analyse.png", png, "image/png")}}) for _ in range(count)],
+        "/cache/stats": [("GET", "/cache/stats", {}) for _ in range(count)],
+        "/metrics": [("GET", "/metrics", {}) for _ in range(count)],
+    }
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+async def run_scenario(client, requests, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    errors = 0
+
+    async def one(method, path, kwargs):
+        nonlocal errors
+        async with semaphore:
+            start = time.perf_counter()
+            response = await client.request(method, path, **kwargs)
+            await response.aread()
+            latencies.append(time.perf_counter() - start)
+            if response.status_code >= 400:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(*request) for request in requests))
+    wall = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "requests": len(requests),
+        "errors": errors,
+        "throughput": len(requests) / wall if wall else 0.0,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p95_ms": percentile(latencies, 0.95) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+    }
+
+async def measure_memory(client, requests, samples):
+    """
+    Pic d'allocation Python par requête (séquentiel, tracemalloc actif).
+    """
+    peaks = []
+    tracemalloc.start()
+    try:
+        for method, path, kwargs in requests[:samples]:
+            tracemalloc.reset_peak()
+            baseline, _ = tracemalloc.get_traced_memory()
+            response = await client.request(method, path, **kwargs)
+            await response.aread()
+            _, peak = tracemalloc.get_traced_memory()
+            peaks.append(max(0, peak - baseline))
+    finally:
+        tracemalloc.stop()
+    return sum(peaks) / len(peaks) / 1024 if peaks else 0.0
+
+def reset_state():
+    from prediction.consultation_cache import consultation_cache
+    from prediction.image_pipeline import image_pipeline
+    consultation_cache.clear()
+    with image_pipeline._lock:
+        image_pipeline._images.clear()
+        image_pipeline._sources.clear()
+        image_pipeline._cache_bytes = 0
+
+async def run(args):
+    from prediction.gemini_client import set_client
+    import app as application
+
+    set_client(FakeGeminiClient(args.latency, args.failure_rate, args.seed))
+    scenarios = build_scenarios(random.Random(args.seed), args.requests)
+    if args.only:
+        scenarios = {name: requests for name, requests in scenarios.items() if name in args.only}
+
+    results = {}
+    transport = httpx.ASGITransport(app=application.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+        for name, requests in scenarios.items():
+            # Échauffement : imports différés (SDK, Pillow), caches de classification
+            for method, path, kwargs in requests[:args.warmup]:
+                await client.request(method, path, **kwargs)
+            reset_state()
+            result = await run_scenario(client, requests, args.concurrency)
+            reset_state()
+            result["memory_kb"] = await measure_memory(client, requests, args.memory_samples)
+            results[name] = result
+    return results
+
+def print_results(results, baseline=None, tolerance=0.2):
+    regressions = []
+    header = f"{'endpoint':<46} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'KB/req':>9} {'err':>5}"
+    print(header)
+    print("-" * len(header))
+    for name, result in results.items():
+        print(f"{name:<46} {result['throughput']:>9.1f} {result['p50_ms']:>9.2f} {result['p95_ms']:>9.2f} "
+              f"{result['p99_ms']:>9.2f} {result['memory_kb']:>9.1f} {result['errors']:>5}")
+        reference = (baseline or {}).get(name)
+        if reference is None:
+            continue
+        deltas = []
+        for field, higher_is_worse in (("throughput", False), ("p95_ms", True), ("p99_ms", True), ("memory_kb", True)):
+            if not reference.get(field):
+                continue
+            change = (result[field] - reference[field]) / reference[field]
+            deltas.append(f"{field} {change:+.0%}")
+            if (change > tolerance) if higher_is_worse else (change < -tolerance):
+                regressions.append(f"{name}: {field} {reference[field]:.2f} -> {result[field]:.2f} ({change:+.0%})")
+        print(f"{'':<46} vs baseline: {', '.join(deltas)}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200, help="requêtes par endpoint")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--latency", type=float, default=0.05, help="latence du faux Gemini (s)")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="proportion d'appels Gemini en échec")
+    parser.add_argument("--warmup", type=int, default=5, help="requêtes d'échauffement par endpoint")
+    parser.add_argument("--memory-samples", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--only", nargs="*", help="endpoints à mesurer (ex. /diagnostic)")
+    parser.add_argument("--baseline", help="fichier JSON de référence à comparer")
+    parser.add_argument("--save-baseline", help="enregistre les résultats comme référence")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="écart toléré avant régression (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+
+    baseline = None
+    if args.baseline and os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+
+    regressions = print_results(results, baseline, args.tolerance)
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as f:
+            json.dump({
+                "settings": {key: getattr(args, key) for key in ("requests", "concurrency", "latency", "failure_rate", "seed")},
+                "results": results,
+            }, f, indent=2, ensure_ascii=False)
+            f.write("\n")
+
+    if regressions:
+        print("\nRégressions :")
+        for regression in regressions:
+            print(f"  {regression}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
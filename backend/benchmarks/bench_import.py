@@ -0,0 +1,59 @@
+# File: benchmarks/bench_import.py
+"""
+Benchmark du temps d'import de l'application.
+
+Chaque mesure est faite dans un processus Python neuf (import à froid des modules,
+cache du système de fichiers chaud). On compare l'import de `app` seul (moteur de
+règles, SDK Gemini différé) à l'import de `app` précédé de `google.genai`, ce qui
+reproduit le coût de l'ancienne initialisation eager.
+
+Usage (depuis backend/) :
+    python benchmarks/bench_import.py [--runs 7]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SNIPPET = """
+import sys, time
+start = time.perf_counter()
+{imports}
+elapsed = time.perf_counter() - start
+print(elapsed, int('google.genai' in sys.modules))
+"""
+
+SCENARIOS = {
+    "app (lazy Gemini)": "import app",
+    "app + google.genai (eager)": "import google.genai\nimport app",
+}
+
+def measure(imports, runs):
+    timings = []
+    loaded = False
+    env = dict(os.environ)
+    env.pop('GEMINI_EAGER_INIT', None)
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, "-c", SNIPPET.format(imports=imports)],
+            cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True
+        ).stdout.split()
+        timings.append(float(output[0]))
+        loaded = output[1] == "1"
+    return timings, loaded
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=7)
+    args = parser.parse_args()
+
+    print(f"{'scénario':<30} {'médiane':>10} {'min':>10} {'genai chargé':>14}")
+    for name, imports in SCENARIOS.items():
+        timings, loaded = measure(imports, args.runs)
+        print(f"{name:<30} {statistics.median(timings) * 1000:>8.1f}ms {min(timings) * 1000:>8.1f}ms {str(loaded):>14}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+# File: benchmarks/bench_prescription.py
+"""
+Benchmark du rendu PDF des ordonnances (prediction/prescription_pdf.py).
+
+- rendu : coût moyen d'une ordonnance selon le nombre de médicaments (gabarit déjà
+  compilé, comme après le démarrage du serveur) ;
+- export : temps total d'un lot rendu en séquentiel puis réparti dans le pool de
+  processus (prediction/executors.py), archive ZIP comprise.
+
+Usage (depuis backend/) :
+    python benchmarks/bench_prescription.py [--renders 200] [--batch 200] [--processes 4]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+def make_prescription(medications):
+    return {
+        "patient": {"firstName": "Aïcha", "lastName": "Koné", "age": 34, "cmuNumber": "CMU-0001"},
+        "consultationDate": "2025-01-15T10:30:00Z",
+        "diagnostic": "Paludisme simple",
+        "treatment": "Artéméther-Luméfantrine",
+        "posology": "4 comprimés matin et soir pendant 3 jours",
+        "medications": [
+            {"id": i, "name": f"Médicament {i}", "dosage": "1 comprimé 3 fois par jour pendant 5 jours, après les repas",
+             "indication": "Traitement symptomatique", "category": "Antalgique", "cost": 1500}
+            for i in range(medications)
+        ],
+        "instructions": "Respecter strictement la posologie prescrite.",
+    }
+
+async def export(executors, prescriptions, render_prescriptions, build_archive):
+    size = -(-len(prescriptions) // executors.cpu_workers)
+    parts = await asyncio.gather(*(
+        executors.run_cpu(render_prescriptions, prescriptions[i:i + size])
+        for i in range(0, len(prescriptions), size)
+    ))
+    return await executors.run_io(build_archive, [file for part in parts for file in part])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--renders", type=int, default=200)
+    parser.add_argument("--batch", type=int, default=200)
+    parser.add_argument("--processes", type=int, default=4)
+    args = parser.parse_args()
+
+    from prediction.prescription_pdf import prescription_renderer, render_prescriptions, build_archive
+    from prediction.executors import Executors
+
+    print(f"{'médicaments':<12} {'rendu ms':>9} {'taille':>8} {'pages':>6}")
+    for medications in (1, 5, 20):
+        prescription = make_prescription(medications)
+        pdf = prescription_renderer.render(prescription)
+        start = time.perf_counter()
+        for _ in range(args.renders):
+            prescription_renderer.render(prescription)
+        elapsed = (time.perf_counter() - start) / args.renders
+        print(f"{medications:<12} {elapsed * 1000:>9.2f} {len(pdf):>8} {pdf.count(b'/Type /Page '):>6}")
+
+    prescriptions = [make_prescription(5) for _ in range(args.batch)]
+    start = time.perf_counter()
+    build_archive(render_prescriptions(prescriptions))
+    sequential = time.perf_counter() - start
+
+    executors = Executors(threads=4, processes=args.processes)
+    asyncio.run(executors.start())
+    start = time.perf_counter()
+    asyncio.run(export(executors, prescriptions, render_prescriptions, build_archive))
+    pooled = time.perf_counter() - start
+    executors.shutdown()
+
+    print(f"\nexport de {args.batch} ordonnances : séquentiel {sequential * 1000:.0f}ms, "
+          f"pool de {args.processes} processus {pooled * 1000:.0f}ms")
+
+if __name__ == "__main__":
+    main()
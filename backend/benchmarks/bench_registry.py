@@ -0,0 +1,149 @@
+# File: benchmarks/bench_registry.py
+"""
+Benchmark du registre des catégories, maladies et traitements (prediction/plugins.py).
+
+Un catalogue synthétique (par défaut 40 maladies réparties en 4 catégories, au format
+des paquets prediction/categories et prediction/diseases) est généré dans un dossier
+temporaire :
+- import : temps de démarrage dans un processus Python neuf, catégories seules
+  (chargement paresseux) contre toutes les maladies chargées (équivalent des imports
+  en tête de module) ;
+- recherche : coût d'une résolution de nom de diagnostic, accès dictionnaire du
+  registre contre une chaîne if/elif sur les mêmes noms (moyenne et pire cas).
+
+Usage (depuis backend/) :
+    python benchmarks/bench_registry.py [--diseases 40] [--categories 4] [--runs 7]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+SYMPTOMS = ["fièvre", "maux de tête", "frissons", "sueurs", "nausées", "vomissements", "toux",
+            "diarrhée", "fatigue", "éruption cutanée", "douleurs articulaires", "douleurs abdominales"]
+
+SNIPPET = """
+import sys, time
+sys.path.insert(0, {backend!r})
+sys.path.insert(0, {catalogue!r})
+start = time.perf_counter()
+from prediction.plugins import plugins
+plugins.packages = ["bench_catalogue"]
+categories = [entry.load() for entry in plugins.entries("category")]
+{extra}
+print(time.perf_counter() - start)
+"""
+
+SCENARIOS = {
+    "catégories seules (paresseux)": "",
+    "toutes les maladies (eager)": "diseases = [entry.load() for entry in plugins.entries('disease')]",
+}
+
+def write(path, content):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(content)
+
+def disease_names(diseases):
+    return [f"Maladie {i}" for i in range(diseases)]
+
+def build_catalogue(directory, diseases, categories):
+    """
+    Paquet bench_catalogue : déclarations dans les __init__.py, une règle par module.
+    """
+    root = os.path.join(directory, "bench_catalogue")
+    write(os.path.join(root, "__init__.py"), "")
+    for c in range(categories):
+        write(os.path.join(root, "categories", f"category_{c}.py"),
+              f"RULE = {{'name': 'Categorie {c}', 'symptoms': {{{SYMPTOMS[c]!r}: 5, {SYMPTOMS[c + 1]!r}: 3}}, "
+              f"'analyses': [], 'symptom_weight': 1.0, 'analysis_weight': 0.0}}\n")
+    for i, name in enumerate(disease_names(diseases)):
+        c = i % categories
+        symptoms = {SYMPTOMS[(i + k) % len(SYMPTOMS)]: 1 + k for k in range(4)}
+        write(os.path.join(root, "diseases", f"category_{c}", f"disease_{i}.py"),
+              f"RULE = {{'id': {i + 1}, 'name': {name!r}, 'symptoms': {symptoms!r}, 'analyses': [], "
+              f"'symptom_weight': 1.0, 'analysis_weight': 0.0}}\n")
+
+    write(os.path.join(root, "categories", "__init__.py"),
+          "from prediction.plugins import plugins\n" + "".join(
+              f"plugins.declare('category', 'Categorie {c}', 'bench_catalogue.categories.category_{c}:RULE')\n"
+              for c in range(categories)))
+    write(os.path.join(root, "diseases", "__init__.py"), "")
+    for c in range(categories):
+        write(os.path.join(root, "diseases", f"category_{c}", "__init__.py"),
+              "from prediction.plugins import plugins\n" + "".join(
+                  f"plugins.declare('disease', {name!r}, 'bench_catalogue.diseases.category_{c}.disease_{i}:RULE', "
+                  f"category='Categorie {c}')\n"
+                  for i, name in enumerate(disease_names(diseases)) if i % categories == c))
+    return root
+
+def measure_import(catalogue, extra, runs):
+    timings = []
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, "-c", SNIPPET.format(backend=BACKEND_DIR, catalogue=catalogue, extra=extra)],
+            cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+        ).stdout.split()
+        timings.append(float(output[-1]))
+    return timings
+
+def if_chain(names):
+    """
+    Fonction de dispatch if/elif équivalente à l'ancienne predict_treatments, étendue à `names`.
+    """
+    lines = ["def dispatch(diagnostic):", "    name = diagnostic.lower()"]
+    for i, name in enumerate(names):
+        lines.append(f"    {'if' if i == 0 else 'elif'} name == {name.lower()!r}:")
+        lines.append(f"        return {i}")
+    lines.append("    return None")
+    namespace = {}
+    exec("\n".join(lines), namespace)
+    return namespace["dispatch"]
+
+def per_call_ns(fn, names, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        for name in names:
+            fn(name)
+    return (time.perf_counter() - start) / (iterations * len(names)) * 1e9
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--diseases", type=int, default=40)
+    parser.add_argument("--categories", type=int, default=4)
+    parser.add_argument("--runs", type=int, default=7)
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+
+    from prediction.plugins import PluginRegistry
+
+    names = disease_names(args.diseases)
+    with tempfile.TemporaryDirectory() as directory:
+        build_catalogue(directory, args.diseases, args.categories)
+
+        print(f"{'import':<34} {'médiane':>10} {'min':>10}")
+        for name, extra in SCENARIOS.items():
+            timings = measure_import(directory, extra, args.runs)
+            print(f"{name:<34} {statistics.median(timings) * 1000:>8.2f}ms {min(timings) * 1000:>8.2f}ms")
+
+    registry = PluginRegistry([])
+    for i, name in enumerate(names):
+        registry.declare("treatment", name, f"bench_catalogue.treatments.t{i}:calculate")
+    registry.discover()
+    dispatch = if_chain(names)
+
+    print(f"\n{'recherche (' + str(len(names)) + ' noms)':<34} {'moyenne':>10} {'pire cas':>10}")
+    for label, fn in (("registre (dict)", lambda name: registry.entry("treatment", name)),
+                      ("chaîne if/elif", dispatch)):
+        average = per_call_ns(fn, names, args.iterations)
+        worst = per_call_ns(fn, names[-1:], args.iterations * len(names))
+        print(f"{label:<34} {average:>8.0f}ns {worst:>8.0f}ns")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+# File: benchmarks/bench_scoring.py
+"""
+Benchmark du calcul manuel (prediction/scoring_engine.py) selon le mode de variation.
+
+Pour chaque mode (off, hashed, random) : coût moyen d'un predict sans mémoïsation,
+d'un predict_batch par patient, et reproductibilité (deux passes sur les mêmes
+patients donnent-elles les mêmes scores ?). Pour les modes déterministes, coût d'un
+predict servi par la mémoïsation.
+
+Usage (depuis backend/) :
+    python benchmarks/bench_scoring.py [--patients 500] [--seed 1]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from types import SimpleNamespace
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+SYMPTOMS = ["fièvre", "maux de tête", "frissons", "anémie", "sueurs", "rash", "fatigue", "soif",
+            "douleurs articulaires", "toux", "Fever", "céphalées"]
+ANALYSES = [("TDR", ["positif", "négatif"], "boolean"), ("Leucocytes", ["3000", "6000"], "numeric"),
+            ("CRP", ["4", "25"], "numeric"), ("Glycémie", ["90", "160"], "numeric")]
+
+def make_patients(count, seed):
+    rng = random.Random(seed)
+    patients = []
+    for _ in range(count):
+        symptoms = [SimpleNamespace(name=name) for name in rng.sample(SYMPTOMS, rng.randint(1, 5))]
+        analyses = [
+            SimpleNamespace(name=name, result=rng.choice(results), resultType=result_type)
+            for name, results, result_type in rng.sample(ANALYSES, rng.randint(0, 3))
+        ]
+        patients.append((symptoms, analyses, [], []))
+    return patients
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--patients", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    from prediction.plugins import plugins
+    from prediction.predictor import load_category_diseases
+    from prediction.scoring_engine import TieredScoringEngine, ScoringJitter
+
+    patients = make_patients(args.patients, args.seed)
+    categories = [entry.load() for entry in plugins.entries("category")]
+
+    header = f"{'mode':<8} {'predict µs':>11} {'mémo µs':>9} {'batch µs/pat.':>14} {'reproductible':>14}"
+    print(header)
+    print("-" * len(header))
+    for mode in ScoringJitter.MODES:
+        def engine(memo_size):
+            return TieredScoringEngine(categories, load_category_diseases, 30,
+                                       ScoringJitter(mode, seed=args.seed), memo_size)
+
+        cold = engine(0)
+        cold.predict(*patients[0])  # compilation des catégories retenues
+        first, elapsed = timed(lambda: [cold.predict(*patient) for patient in patients])
+        second = [engine(0).predict(*patient) for patient in patients]
+        _, batch_elapsed = timed(lambda: cold.predict_batch(patients))
+
+        memo = ""
+        if ScoringJitter(mode).deterministic:
+            memoized = engine(len(patients))
+            for patient in patients:
+                memoized.predict(*patient)
+            _, memo_elapsed = timed(lambda: [memoized.predict(*patient) for patient in patients])
+            memo = f"{memo_elapsed / len(patients) * 1e6:.1f}"
+
+        print(f"{mode:<8} {elapsed / len(patients) * 1e6:>11.1f} {memo:>9} "
+              f"{batch_elapsed / len(patients) * 1e6:>14.1f} {str(first == second):>14}")
+
+if __name__ == "__main__":
+    main()
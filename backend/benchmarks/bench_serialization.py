@@ -0,0 +1,150 @@
+# File: benchmarks/bench_serialization.py
+"""
+Micro-benchmark de la sérialisation des réponses /diagnostic et /suggest-medications.
+
+Compare, pour une même réponse Gemini :
+- avant : copie en dictionnaires dans le handler, modèle de réponse à champs
+  Dict[str, Union[...]], re-validation et encodage par FastAPI (response_model), puis
+  json.dumps (JSONResponse) ;
+- après : modèles typés réutilisant DiagnosticResult / MedicationSuggestion, écrits en
+  une passe par FastJSONResponse.
+
+Les deux chemins produisent le même JSON (vérifié avant la mesure). Affiche le coût
+moyen par réponse (µs) et la taille du corps.
+
+Usage (depuis backend/) :
+    python benchmarks/bench_serialization.py [--iterations 5000] [--diagnostics 5] [--medications 30]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from typing import Dict, List, Optional, Union
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+os.environ.setdefault('GEMINI_CACHE_ENABLED', '0')
+os.environ.setdefault('GEMINI_API_KEY', 'benchmark')
+
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel, TypeAdapter
+
+class LegacyDiagnosticOutput(BaseModel):
+    diagnostics: List[Dict[str, Union[int, str, float]]]
+    source: Optional[str] = None
+
+class LegacyMedicationItem(BaseModel):
+    id: int
+    name: str
+    indication: str
+    dosage: str
+    category: str
+    cost: Optional[float] = 0
+    selected: Optional[bool] = False
+
+class LegacyMedicationOutput(BaseModel):
+    medications: List[LegacyMedicationItem]
+
+def legacy_response(adapter, output):
+    """
+    Chemin FastAPI avec response_model : modèle -> dict, re-validation, encodage JSON-compatible,
+    puis json.dumps.
+    """
+    validated = adapter.validate_python(output.model_dump())
+    return JSONResponse(adapter.dump_python(validated, mode="json")).body
+
+def make_response(diagnostics, medications):
+    from prediction.gemini_predictor import GeminiDiagnosticResponse, DiagnosticResult, MedicationSuggestion
+    return GeminiDiagnosticResponse(
+        diagnostics=[
+            DiagnosticResult(
+                id=i + 1,
+                disease=f"Maladie {i + 1}",
+                probability=round(80 - 12.5 * i, 2),
+                explanation="Fièvre élevée depuis 3 jours, TDR positif et saison des pluies à Abidjan : "
+                            "tableau clinique compatible, à confirmer par une goutte épaisse."
+            )
+            for i in range(diagnostics)
+        ],
+        medications=[
+            MedicationSuggestion(
+                id=i + 1,
+                name=f"Médicament {i + 1}",
+                indication="Fièvre, douleurs",
+                dosage="500 mg toutes les 6 heures (max 4 g/jour)",
+                category="Antipyrétique",
+                cost=500.0 + 250 * i
+            )
+            for i in range(medications)
+        ]
+    )
+
+def scenarios(response):
+    from app import DiagnosticOutput, MedicationOutput
+    from prediction.responses import FastJSONResponse
+
+    diagnostic_adapter = TypeAdapter(LegacyDiagnosticOutput)
+    medication_adapter = TypeAdapter(LegacyMedicationOutput)
+
+    def diagnostic_before():
+        diagnostics = [
+            {"id": d.id, "disease": d.disease, "probability": d.probability, "explanation": d.explanation}
+            for d in response.diagnostics
+        ]
+        return legacy_response(diagnostic_adapter, LegacyDiagnosticOutput(diagnostics=diagnostics, source="gemini"))
+
+    def diagnostic_after():
+        return FastJSONResponse(DiagnosticOutput(diagnostics=response.diagnostics, source="gemini")).body
+
+    def medications_before():
+        medications = [
+            {"id": m.id, "name": m.name, "indication": m.indication, "dosage": m.dosage,
+             "category": m.category, "cost": m.cost, "selected": False}
+            for m in response.medications
+        ]
+        return legacy_response(medication_adapter, LegacyMedicationOutput(medications=medications))
+
+    def medications_after():
+        return FastJSONResponse(MedicationOutput(medications=response.medications)).body
+
+    return {
+        "/diagnostic": (diagnostic_before, diagnostic_after),
+        "/suggest-medications": (medications_before, medications_after),
+    }
+
+def measure(fn, iterations):
+    for _ in range(min(200, iterations)):
+        fn()
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=5000)
+    parser.add_argument("--diagnostics", type=int, default=5)
+    parser.add_argument("--medications", type=int, default=30)
+    args = parser.parse_args()
+
+    response = make_response(args.diagnostics, args.medications)
+
+    header = f"{'endpoint':<24} {'avant µs':>10} {'après µs':>10} {'gain':>7} {'octets':>8}"
+    print(header)
+    print("-" * len(header))
+    for name, (before, after) in scenarios(response).items():
+        before_body, after_body = json.loads(before()), json.loads(after())
+        if name == "/suggest-medications":
+            # L'ancien modèle ajoutait "selected": false à chaque médicament
+            for medication in before_body["medications"]:
+                medication.pop("selected")
+        if before_body != after_body:
+            sys.exit(f"{name} : les deux chemins ne produisent pas le même JSON")
+        before_us = measure(before, args.iterations)
+        after_us = measure(after, args.iterations)
+        print(f"{name:<24} {before_us:>10.1f} {after_us:>10.1f} {before_us / after_us:>6.1f}x {len(after()):>8}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,321 @@
+# File: prediction/audit_log.py
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import struct
+import sys
+import time
+import uuid
+import zlib
+from pydantic import BaseModel
+from prediction.gemini_client import load_environment
+from prediction.executors import executors
+from prediction.image_pipeline import source_digest, REF_PREFIX
+from prediction.metrics import registry
+from prediction.responses import dumps
+
+load_environment()
+
+DEFAULT_AUDIT_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'audit')
+
+# En-tête de segment, puis enregistrements : longueur (4 octets), CRC32 (4 octets), JSON compressé (zlib)
+MAGIC = b"ESAUDIT1"
+FRAME = struct.Struct(">II")
+
+AUDIT_RECORDS = registry.counter(
+    "esante_audit_records_total",
+    "Enregistrements du journal d'audit (written : écrit, dropped : abandonné file pleine, "
+    "rejected : requête refusée file pleine, failed : échec d'écriture)",
+    ("outcome",)
+)
+AUDIT_FLUSH = registry.histogram(
+    "esante_audit_flush_duration_seconds",
+    "Durée d'écriture d'un lot du journal d'audit (fsync compris)",
+    ("fsync",)
+)
+
+class AuditRejected(Exception):
+    """
+    Levée par record() quand la file est pleine et la politique "reject".
+    """
+
+def segment_name(timestamp):
+    return "audit-" + datetime.datetime.fromtimestamp(timestamp, datetime.timezone.utc).strftime("%Y%m%d") + ".log"
+
+def _scrub(value):
+    """
+    Entrées sérialisables sans les photos base64 : chaque photo est remplacée par son
+    empreinte ("src-<sha256>" de la source, ou la référence "sha256:" déjà utilisée).
+    """
+    if isinstance(value, BaseModel):
+        value = value.model_dump(mode="json")
+    if isinstance(value, dict):
+        return {
+            key: (item if item.startswith(REF_PREFIX) else source_digest(item))
+            if key == "photo" and isinstance(item, str) else _scrub(item)
+            for key, item in value.items()
+        }
+    if isinstance(value, (list, tuple)):
+        return [_scrub(item) for item in value]
+    return value
+
+def encode_record(record):
+    payload = zlib.compress(dumps(record), 6)
+    return FRAME.pack(len(payload), zlib.crc32(payload)) + payload
+
+class AuditLog:
+    """
+    Journal d'audit des prédictions (diagnostics, médicaments, compatibilités), avec
+    entrées, résultat et source (gemini ou fallback).
+
+    Écriture différée : record() dépose l'enregistrement dans une file bornée
+    (`max_queue`) et rend la main ; une tâche d'écriture vide la file par lots
+    (`batch_size` au plus) et les écrit dans le pool de threads, sans bloquer la boucle
+    d'événements. Chaque enregistrement est compressé et préfixé par sa longueur et son
+    CRC32 ; les segments sont journaliers (audit-AAAAMMJJ.log, UTC) et synchronisés sur
+    disque (fsync) au plus toutes les `fsync_interval` secondes (0 : à chaque lot).
+
+    Politique quand la file est pleine (`policy`) :
+    - "wait" : la requête attend une place au plus `wait_timeout` secondes, puis
+      l'enregistrement est abandonné ;
+    - "drop" : l'enregistrement est abandonné immédiatement ;
+    - "reject" : AuditRejected est levée, la requête échoue plutôt que de rendre un
+      résultat non journalisé.
+    Les abandons sont comptés (esante_audit_records_total) et signalés.
+    """
+
+    POLICIES = ("wait", "drop", "reject")
+
+    def __init__(self, directory=DEFAULT_AUDIT_DIR, max_queue=10000, batch_size=256,
+                 fsync_interval=1.0, policy="wait", wait_timeout=1.0, enabled=True):
+        if policy not in self.POLICIES:
+            raise ValueError(f"Politique d'audit inconnue : {policy}")
+        self.directory = directory
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.fsync_interval = fsync_interval
+        self.policy = policy
+        self.wait_timeout = wait_timeout
+        self.enabled = enabled
+        self._queue = None
+        self._writer = None
+        self._file = None
+        self._segment = None
+        self._dirty = False
+        self._synced_at = 0.0
+
+    def depth(self):
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def start(self):
+        """
+        Démarre la tâche d'écriture dans la boucle courante (appelé par le lifespan,
+        sinon au premier enregistrement). Une tâche d'écriture terminée par une erreur
+        est relancée ; les enregistrements encore en file sont conservés.
+        """
+        if not self.enabled:
+            return
+        if self._writer is not None and self._writer.done():
+            if not self._writer.cancelled() and self._writer.exception() is not None:
+                print(f"Audit writer stopped, restarting: {str(self._writer.exception())}")
+            self._writer = None
+        if self._writer is None:
+            if self._queue is None:
+                self._queue = asyncio.Queue(self.max_queue)
+            self._writer = asyncio.ensure_future(self._run())
+
+    async def record(self, endpoint, inputs, output, source, error=None):
+        """
+        Dépose un enregistrement. Les photos des entrées sont remplacées par leur
+        empreinte avant la mise en file (dans le pool de threads) : la file ne retient
+        jamais le texte base64 (plusieurs Mo par photo). Le résultat est sérialisé par
+        la tâche d'écriture, hors du chemin de la requête.
+        """
+        if not self.enabled:
+            return
+        self.start()
+        record = {
+            "id": uuid.uuid4().hex,
+            "ts": time.time(),
+            "endpoint": endpoint,
+            "source": source,
+            "inputs": await executors.run_io(_scrub, inputs, task="audit"),
+            "output": output,
+        }
+        if error:
+            record["error"] = error
+        try:
+            self._queue.put_nowait(record)
+            return
+        except asyncio.QueueFull:
+            pass
+        if self.policy == "reject":
+            AUDIT_RECORDS.inc(outcome="rejected")
+            raise AuditRejected("Journal d'audit saturé")
+        if self.policy == "wait":
+            try:
+                await asyncio.wait_for(self._queue.put(record), self.wait_timeout)
+                return
+            except asyncio.TimeoutError:
+                pass
+        AUDIT_RECORDS.inc(outcome="dropped")
+        print(f"Audit queue full, record dropped ({endpoint})")
+
+    async def _run(self):
+        while True:
+            try:
+                first = await asyncio.wait_for(self._queue.get(), self.fsync_interval or None)
+            except asyncio.TimeoutError:
+                # File au repos : dernier lot synchronisé sur disque
+                if self._dirty:
+                    try:
+                        await executors.run_io(self._sync, task="audit")
+                    except Exception as e:
+                        print(f"Audit fsync failed: {str(e)}")
+                continue
+            batch = [first]
+            while len(batch) < self.batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            closing = batch[-1] is None
+            batch = [record for record in batch if record is not None]
+            if batch:
+                try:
+                    await executors.run_io(self._write, batch, task="audit")
+                    AUDIT_RECORDS.inc(len(batch), outcome="written")
+                except Exception as e:
+                    AUDIT_RECORDS.inc(len(batch), outcome="failed")
+                    print(f"Audit write failed, {len(batch)} records lost: {str(e)}")
+            if closing:
+                return
+
+    def _open(self, segment):
+        if self._file is not None:
+            self._sync()
+            self._file.close()
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, segment)
+        self._file = open(path, "ab")
+        if self._file.tell() == 0:
+            self._file.write(MAGIC)
+        self._segment = segment
+
+    def _write(self, batch):
+        start = time.perf_counter()
+        frames = []
+        for record in batch:
+            segment = segment_name(record["ts"])
+            if segment != self._segment:
+                # Rotation journalière : les enregistrements précédents vont dans l'ancien segment
+                if frames:
+                    self._file.write(b"".join(frames))
+                    frames = []
+                self._open(segment)
+            frames.append(encode_record(record))
+        self._file.write(b"".join(frames))
+        self._file.flush()
+        self._dirty = True
+        synced = self.fsync_interval == 0 or time.monotonic() - self._synced_at >= self.fsync_interval
+        if synced:
+            self._sync()
+        AUDIT_FLUSH.observe(time.perf_counter() - start, fsync=str(synced).lower())
+
+    def _sync(self):
+        if self._file is not None and self._dirty:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._dirty = False
+        self._synced_at = time.monotonic()
+
+    async def close(self):
+        """
+        Écrit les enregistrements en file, synchronise et ferme le segment (extinction).
+        """
+        if self._writer is None:
+            return
+        self.start()
+        await self._queue.put(None)
+        await self._writer
+        self._writer = None
+        self._queue = None
+        if self._file is not None:
+            await executors.run_io(self._close_file, task="audit")
+
+    def _close_file(self):
+        self._sync()
+        self._file.close()
+        self._file = None
+        self._segment = None
+
+def read_segment(path):
+    """
+    Enregistrements d'un segment, dans l'ordre d'écriture. Une fin de fichier
+    tronquée (arrêt pendant une écriture) arrête la lecture ; un CRC invalide lève
+    ValueError.
+    """
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"Segment d'audit invalide : {path}")
+        while True:
+            header = f.read(FRAME.size)
+            if len(header) < FRAME.size:
+                return
+            length, crc = FRAME.unpack(header)
+            payload = f.read(length)
+            if len(payload) < length:
+                print(f"Truncated audit record at end of {path}")
+                return
+            if zlib.crc32(payload) != crc:
+                raise ValueError(f"CRC invalide dans {path} à l'octet {f.tell() - length}")
+            yield json.loads(zlib.decompress(payload))
+
+def read_records(directory=DEFAULT_AUDIT_DIR, start=None, end=None):
+    """
+    Enregistrements de tous les segments, du plus ancien au plus récent, restreints aux
+    jours `start` à `end` inclus ("AAAAMMJJ").
+    """
+    if not os.path.isdir(directory):
+        return
+    for name in sorted(os.listdir(directory)):
+        if not (name.startswith("audit-") and name.endswith(".log")):
+            continue
+        day = name[6:-4]
+        if (start and day < start) or (end and day > end):
+            continue
+        yield from read_segment(os.path.join(directory, name))
+
+audit_log = AuditLog(
+    directory=os.getenv('AUDIT_LOG_DIR', DEFAULT_AUDIT_DIR),
+    max_queue=int(os.getenv('AUDIT_QUEUE_SIZE', 10000)),
+    batch_size=int(os.getenv('AUDIT_BATCH_SIZE', 256)),
+    fsync_interval=float(os.getenv('AUDIT_FSYNC_INTERVAL', 1.0)),
+    policy=os.getenv('AUDIT_BACKPRESSURE', 'wait'),
+    wait_timeout=float(os.getenv('AUDIT_WAIT_TIMEOUT', 1.0)),
+    enabled=os.getenv('AUDIT_ENABLED', '1') not in ('0', 'false', 'False')
+)
+
+registry.collector(
+    "esante_audit_queue_depth",
+    "Enregistrements d'audit en attente d'écriture",
+    (),
+    lambda: {(): audit_log.depth()}
+)
+
+def main():
+    """
+    Relit le journal d'audit en NDJSON sur la sortie standard :
+        python -m prediction.audit_log [--dir audit] [--from 20250101] [--to 20250131] [--endpoint diagnostic]
+    """
+    parser = argparse.ArgumentParser(description="Lecture du journal d'audit (NDJSON)")
+    parser.add_argument("--dir", default=os.getenv('AUDIT_LOG_DIR', DEFAULT_AUDIT_DIR))
+    parser.add_argument("--from", dest="start")
+    parser.add_argument("--to", dest="end")
+    parser.add_argument("--endpoint")
+    args = parser.parse_args()
+    for record in read_records(args.dir, args.start, args.end):
+        if args.endpoint is None or record["endpoint"] == args.endpoint:
+            sys.stdout.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+if __name__ == "__main__":
+    main()
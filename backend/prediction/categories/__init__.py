@@ -0,0 +1,8 @@
+# File: prediction/categories/__init__.py
+from prediction.plugins import plugins
+
+# Catégories évaluées pour chaque patient, dans cet ordre. Les maladies d'une catégorie
+# (prediction/diseases/<catégorie>) ne sont chargées que si son score dépasse le seuil.
+plugins.declare("category", "Infectious", "prediction.categories.infectious:INFECTIOUS_RULE")
+plugins.declare("category", "Inflammatory", "prediction.categories.inflammatory:INFLAMMATORY_RULE")
+plugins.declare("category", "Metabolic", "prediction.categories.metabolic:METABOLIC_RULE")
@@ -0,0 +1,160 @@
+# File: prediction/compatibility_sessions.py
+import asyncio
+import json
+import os
+import time
+from collections import OrderedDict
+from itertools import combinations
+from prediction.gemini_client import load_environment
+from prediction.gemini_compatibility import compatibility_checker, CompatibilityResult, MedicationWarning
+from prediction.interaction_rules import interaction_engine
+
+load_environment()
+
+class CompatibilitySession:
+    """
+    État d'une vérification incrémentale pour un patient : la sélection courante,
+    les paires déjà évaluées et les avertissements trouvés, indexés par combinaison d'IDs.
+    """
+
+    def __init__(self, patient_info):
+        self.patient_info = patient_info
+        self.patient_key = _patient_key(patient_info)
+        self.medications = {}       # id -> médicament
+        self.evaluated_pairs = set()  # frozenset({id_a, id_b})
+        self.gemini_pairs = set()     # paires évaluées par Gemini
+        self.warnings = {}          # frozenset(ids) -> [MedicationWarning]
+        self.lock = asyncio.Lock()
+        self.last_access = time.monotonic()
+
+    def set_patient(self, patient_info):
+        """
+        Nouveau profil patient : la sélection est conservée mais toutes les paires et
+        contre-indications devront être réévaluées.
+        """
+        self.patient_info = patient_info
+        self.patient_key = _patient_key(patient_info)
+        self.evaluated_pairs = set()
+        self.gemini_pairs = set()
+        self.warnings = {}
+
+    def remove(self, med_id):
+        self.medications.pop(med_id, None)
+        self.evaluated_pairs = {pair for pair in self.evaluated_pairs if med_id not in pair}
+        self.gemini_pairs = {pair for pair in self.gemini_pairs if med_id not in pair}
+        self.warnings = {ids: w for ids, w in self.warnings.items() if med_id not in ids}
+
+    def pending_pairs(self):
+        """
+        Paires de la sélection courante qui n'ont pas encore été évaluées.
+        """
+        return [
+            (id_a, id_b) for id_a, id_b in combinations(sorted(self.medications), 2)
+            if frozenset((id_a, id_b)) not in self.evaluated_pairs
+        ]
+
+    def result(self):
+        """
+        Résultat de la sélection courante ; les paires encore en attente (Gemini
+        indisponible) sont signalées comme non vérifiées.
+        """
+        warnings = [warning for group in self.warnings.values() for warning in group]
+        unverified = [list(pair) for pair in self.pending_pairs()]
+        return CompatibilityResult(
+            compatible=len(warnings) == 0 and not unverified,
+            warnings=warnings,
+            unverified_pairs=unverified,
+            source="rules+gemini" if self.gemini_pairs else "rules"
+        )
+
+class CompatibilitySessionStore:
+    """
+    Sessions de vérification incrémentale des interactions médicamenteuses.
+
+    Chaque ajout ou retrait de médicament n'évalue que les nouvelles paires : ajouter le
+    8e médicament coûte 7 vérifications de paires au lieu d'une ré-analyse des 28.
+    Les sessions inactives expirent après `ttl` secondes ; au plus `max_sessions` sont
+    conservées (les moins récemment utilisées sont supprimées).
+    """
+
+    def __init__(self, ttl=3600, max_sessions=1024):
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self._sessions = OrderedDict()
+
+    def get(self, session_id, patient_info=None):
+        """
+        Retourne la session, en la (re)créant si elle a expiré.
+        """
+        now = time.monotonic()
+        session = self._sessions.get(session_id)
+        if session is not None and session.last_access + self.ttl < now:
+            session = None
+        if session is None:
+            session = CompatibilitySession(patient_info)
+            self._sessions[session_id] = session
+        session.last_access = now
+        self._sessions.move_to_end(session_id)
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+        return session
+
+    async def apply_delta(self, session_id, added, removed, patient_info=None):
+        """
+        Applique un delta (médicaments ajoutés, IDs retirés) et retourne le
+        CompatibilityResult de la sélection mise à jour.
+
+        Sans `patient_info`, le profil déjà connu de la session est conservé ; un profil
+        différent entraîne la réévaluation de toute la sélection.
+        """
+        session = self.get(session_id, patient_info)
+        async with session.lock:
+            recheck = []
+            if patient_info is not None and session.patient_key != _patient_key(patient_info):
+                session.set_patient(patient_info)
+                recheck = list(session.medications.values())
+
+            for med_id in removed:
+                session.remove(med_id)
+            recheck = [med for med in recheck if med['id'] in session.medications]
+
+            for med in added:
+                if med['id'] in session.medications:
+                    # Médicament remplacé : ses paires doivent être réévaluées
+                    session.remove(med['id'])
+                    recheck = [other for other in recheck if other['id'] != med['id']]
+                session.medications[med['id']] = med
+                recheck.append(med)
+
+            for med in recheck:
+                for warning in interaction_engine.evaluate_patient([med], session.patient_info):
+                    session.warnings.setdefault(frozenset([med['id']]), []).append(MedicationWarning(**warning))
+
+            pairs = session.pending_pairs()
+            if pairs:
+                warnings, evaluated, gemini_pairs = await compatibility_checker.check_pairs_async(
+                    list(session.medications.values()), pairs, session.patient_info
+                )
+                found = {}
+                for warning in warnings:
+                    ids = frozenset(warning.medication_ids)
+                    if all(med_id in session.medications for med_id in ids):
+                        found.setdefault(ids, []).append(warning)
+                # Une contre-indication déjà signalée localement n'est pas dupliquée
+                for ids, group in found.items():
+                    session.warnings.setdefault(ids, group)
+                session.evaluated_pairs |= evaluated
+                session.gemini_pairs |= gemini_pairs
+
+            return session.result()
+
+    def discard(self, session_id):
+        self._sessions.pop(session_id, None)
+
+def _patient_key(patient_info):
+    return json.dumps(patient_info, sort_keys=True, default=str) if patient_info else ""
+
+compatibility_sessions = CompatibilitySessionStore(
+    ttl=float(os.getenv('COMPATIBILITY_SESSION_TTL', 3600)),
+    max_sessions=int(os.getenv('COMPATIBILITY_SESSION_MAX', 1024))
+)
@@ -0,0 +1,85 @@
+# File: prediction/consultation_cache.py
+import asyncio
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict
+from prediction.gemini_client import load_environment
+
+load_environment()
+
+class ConsultationCache:
+    """
+    Cache des résultats Gemini à l'échelle d'une consultation.
+
+    /diagnostic et /suggest-medications reçoivent le même DiagnosticInput : le premier
+    appel lance la requête Gemini, le second attend ce même appel au lieu d'en lancer
+    un nouveau. Les entrées expirent après `ttl` secondes et le cache ne garde que
+    les `max_size` entrées les plus récemment utilisées.
+    """
+
+    def __init__(self, ttl=600, max_size=256):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries = OrderedDict()  # clé -> (expiration, valeur)
+        self._inflight = {}            # clé -> asyncio.Task
+
+    @staticmethod
+    def make_key(payload):
+        """
+        Hash canonique d'une entrée (dict sérialisable) : l'ordre des clés n'influe pas.
+        """
+        canonical = json.dumps(payload, sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+        return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key, value):
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    async def get_or_compute(self, key, factory):
+        """
+        Retourne la valeur en cache, ou attend le calcul déjà en cours pour cette clé,
+        ou lance `factory()` (coroutine) si aucun calcul n'est en vol.
+        Les erreurs ne sont pas mises en cache : elles sont propagées à tous les appelants.
+        """
+        value = self.get(key)
+        if value is not None:
+            return value
+
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(factory())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._on_done(key, t))
+
+        # shield : l'annulation d'un appelant (client déconnecté) n'annule pas
+        # le calcul partagé avec les autres appelants
+        return await asyncio.shield(task)
+
+    def _on_done(self, key, task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled() and task.exception() is None and task.result() is not None:
+            self.set(key, task.result())
+
+    def clear(self):
+        self._entries.clear()
+
+consultation_cache = ConsultationCache(
+    ttl=float(os.getenv('CONSULTATION_CACHE_TTL', 600)),
+    max_size=int(os.getenv('CONSULTATION_CACHE_MAX_SIZE', 256))
+)
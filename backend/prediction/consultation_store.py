@@ -0,0 +1,310 @@
+# File: prediction/consultation_store.py
+import datetime
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from prediction.gemini_client import load_environment
+
+load_environment()
+
+DEFAULT_STORE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'consultations.sqlite3')
+
+SCHEMA = [
+    "CREATE TABLE IF NOT EXISTS patients ("
+    " cmu_number TEXT PRIMARY KEY,"
+    " first_name TEXT NOT NULL,"
+    " last_name TEXT NOT NULL,"
+    " age INTEGER,"
+    " updated_at REAL NOT NULL)",
+    "CREATE TABLE IF NOT EXISTS consultations ("
+    " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+    " cmu_number TEXT NOT NULL REFERENCES patients(cmu_number),"
+    " consulted_at TEXT NOT NULL,"
+    " medical_history TEXT NOT NULL,"
+    " symptoms TEXT NOT NULL,"
+    " analyses TEXT NOT NULL,"
+    " patient_info TEXT,"
+    " diagnostic TEXT,"
+    " created_at REAL NOT NULL)",
+    # Historique d'un patient (numéro CMU, trié par date) et consultations d'une journée
+    "CREATE INDEX IF NOT EXISTS idx_consultations_patient ON consultations(cmu_number, consulted_at)",
+    "CREATE INDEX IF NOT EXISTS idx_consultations_date ON consultations(consulted_at)",
+    # Photos d'analyses déjà traitées (réduites), adressées par l'empreinte de leur contenu
+    "CREATE TABLE IF NOT EXISTS images ("
+    " digest TEXT PRIMARY KEY,"
+    " mime_type TEXT NOT NULL,"
+    " data BLOB NOT NULL,"
+    " width INTEGER,"
+    " height INTEGER)",
+]
+
+def normalize_date(value=None):
+    """
+    Date ISO ramenée en UTC ("2025-01-15T10:30:00") pour un tri correct par l'index ;
+    la date courante si absente.
+    """
+    if not value:
+        date = datetime.datetime.now(datetime.timezone.utc)
+    else:
+        date = datetime.datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+        if date.tzinfo is None:
+            date = date.replace(tzinfo=datetime.timezone.utc)
+    return date.astimezone(datetime.timezone.utc).replace(tzinfo=None).isoformat(timespec="seconds")
+
+class ConnectionPool:
+    """
+    Connexions SQLite réutilisées entre les requêtes : au plus `size` connexions,
+    ouvertes à la demande. En mode WAL, les lectures ne sont pas bloquées par
+    l'écriture en cours.
+    """
+
+    def __init__(self, path, size=4, timeout=5.0):
+        self.path = path
+        self.size = size
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+        self._opened = 0
+
+    def _open(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=self.timeout)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA foreign_keys=ON")
+        with self._lock:
+            self._opened += 1
+        return conn
+
+    @contextmanager
+    def connection(self):
+        if not self._slots.acquire(timeout=self.timeout):
+            raise TimeoutError("Aucune connexion SQLite disponible")
+        try:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                conn = self._open()
+            try:
+                yield conn
+            finally:
+                if conn.in_transaction:
+                    conn.rollback()
+                self._idle.put(conn)
+        finally:
+            self._slots.release()
+
+    def close(self):
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+            with self._lock:
+                self._opened -= 1
+
+    def stats(self):
+        with self._lock:
+            return {"size": self.size, "open": self._opened, "idle": self._idle.qsize()}
+
+class ConsultationStore:
+    """
+    Stockage local (SQLite) des patients et consultations, en attendant Supabase.
+
+    Un patient est identifié par son numéro CMU. Une consultation enregistrée garde
+    les antécédents, symptômes et analyses envoyés ; les photos y sont remplacées par
+    leur référence ("sha256:<hex>") et les images traitées sont conservées une fois
+    dans la table `images`. Les points d'entrée peuvent alors recevoir une simple
+    référence (patientRef, consultationId) et recharger l'historique côté serveur :
+    antécédents de la dernière consultation et maladies diagnostiquées sur les
+    `history_days` derniers jours (RecentDisease, `date` en jours).
+    """
+
+    def __init__(self, path=DEFAULT_STORE_PATH, pool_size=4, history_days=365, history_limit=20):
+        self.path = path
+        self.history_days = history_days
+        self.history_limit = history_limit
+        self.pool = ConnectionPool(path, pool_size)
+        self._ready = False
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def _connection(self):
+        with self.pool.connection() as conn:
+            if not self._ready:
+                with self._lock:
+                    if not self._ready:
+                        for statement in SCHEMA:
+                            conn.execute(statement)
+                        self._ready = True
+            yield conn
+
+    def save(self, patient, consultation, images=()):
+        """
+        Enregistre (ou met à jour) le patient et ajoute la consultation.
+        `patient` : cmuNumber, firstName, lastName, age ; `consultation` : consultationDate,
+        medicalHistory, symptoms, analyses, patientInfo (dictionnaires sérialisables) ;
+        `images` : (empreinte, type MIME, octets, largeur, hauteur).
+        Retourne l'identifiant de la consultation.
+        """
+        now = time.time()
+        with self._connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute(
+                "INSERT INTO patients (cmu_number, first_name, last_name, age, updated_at) VALUES (?, ?, ?, ?, ?)"
+                " ON CONFLICT(cmu_number) DO UPDATE SET first_name = excluded.first_name,"
+                " last_name = excluded.last_name, age = excluded.age, updated_at = excluded.updated_at",
+                (patient["cmuNumber"], patient["firstName"], patient["lastName"], patient.get("age"), now)
+            )
+            cursor = conn.execute(
+                "INSERT INTO consultations (cmu_number, consulted_at, medical_history, symptoms, analyses,"
+                " patient_info, created_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    patient["cmuNumber"],
+                    normalize_date(consultation.get("consultationDate")),
+                    json.dumps(consultation.get("medicalHistory") or [], ensure_ascii=False),
+                    json.dumps(consultation.get("symptoms") or [], ensure_ascii=False),
+                    json.dumps(consultation.get("analyses") or [], ensure_ascii=False),
+                    json.dumps(consultation["patientInfo"], ensure_ascii=False) if consultation.get("patientInfo") else None,
+                    now,
+                )
+            )
+            conn.executemany(
+                "INSERT OR IGNORE INTO images (digest, mime_type, data, width, height) VALUES (?, ?, ?, ?, ?)",
+                images
+            )
+            conn.execute("COMMIT")
+            return cursor.lastrowid
+
+    def set_diagnostic(self, consultation_id, diagnostic):
+        """
+        Diagnostic retenu par le médecin (alimente les maladies récentes du patient).
+        """
+        with self._connection() as conn:
+            cursor = conn.execute("UPDATE consultations SET diagnostic = ? WHERE id = ?", (diagnostic, consultation_id))
+            return cursor.rowcount > 0
+
+    @staticmethod
+    def _consultation(row):
+        return {
+            "id": row["id"],
+            "patientRef": row["cmu_number"],
+            "consultationDate": row["consulted_at"],
+            "medicalHistory": json.loads(row["medical_history"]),
+            "symptoms": json.loads(row["symptoms"]),
+            "analyses": json.loads(row["analyses"]),
+            "patientInfo": json.loads(row["patient_info"]) if row["patient_info"] else None,
+            "diagnostic": row["diagnostic"],
+        }
+
+    def consultation(self, consultation_id):
+        with self._connection() as conn:
+            row = conn.execute("SELECT * FROM consultations WHERE id = ?", (consultation_id,)).fetchone()
+        return self._consultation(row) if row is not None else None
+
+    def history(self, cmu_number, limit=None):
+        """
+        Consultations d'un patient, de la plus récente à la plus ancienne.
+        """
+        with self._connection() as conn:
+            rows = conn.execute(
+                "SELECT id, cmu_number, consulted_at, diagnostic FROM consultations"
+                " WHERE cmu_number = ? ORDER BY consulted_at DESC LIMIT ?",
+                (cmu_number, limit or self.history_limit)
+            ).fetchall()
+        return [self._summary(row) for row in rows]
+
+    def on_date(self, day):
+        """
+        Consultations d'une journée ("2025-01-15", UTC), dans l'ordre chronologique.
+        """
+        start = datetime.date.fromisoformat(day)
+        with self._connection() as conn:
+            rows = conn.execute(
+                "SELECT id, cmu_number, consulted_at, diagnostic FROM consultations"
+                " WHERE consulted_at >= ? AND consulted_at < ? ORDER BY consulted_at",
+                (start.isoformat(), (start + datetime.timedelta(days=1)).isoformat())
+            ).fetchall()
+        return [self._summary(row) for row in rows]
+
+    @staticmethod
+    def _summary(row):
+        return {
+            "id": row["id"],
+            "patientRef": row["cmu_number"],
+            "consultationDate": row["consulted_at"],
+            "diagnostic": row["diagnostic"],
+        }
+
+    def patient_context(self, cmu_number=None, consultation_id=None):
+        """
+        Historique d'un patient pour compléter un DiagnosticInput : medicalHistory,
+        recentDiseases et, avec `consultation_id`, les symptoms, analyses et patientInfo
+        de cette consultation. None si le patient ou la consultation est inconnu.
+        """
+        with self._connection() as conn:
+            current = None
+            if consultation_id is not None:
+                row = conn.execute("SELECT * FROM consultations WHERE id = ?", (consultation_id,)).fetchone()
+                if row is None or (cmu_number and row["cmu_number"] != cmu_number):
+                    return None
+                current = self._consultation(row)
+                cmu_number = current["patientRef"]
+            elif conn.execute("SELECT 1 FROM patients WHERE cmu_number = ?", (cmu_number,)).fetchone() is None:
+                return None
+
+            now = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+            since = (now - datetime.timedelta(days=self.history_days)).isoformat(timespec="seconds")
+            rows = conn.execute(
+                "SELECT id, consulted_at, medical_history, diagnostic FROM consultations"
+                " WHERE cmu_number = ? AND consulted_at >= ? ORDER BY consulted_at DESC LIMIT ?",
+                (cmu_number, since, self.history_limit)
+            ).fetchall()
+
+        context = {"medicalHistory": [], "recentDiseases": []}
+        seen = set()
+        for row in rows:
+            if current is not None and row["id"] == current["id"]:
+                continue
+            if not context["medicalHistory"]:
+                context["medicalHistory"] = json.loads(row["medical_history"])
+            if row["diagnostic"] and row["diagnostic"].lower() not in seen:
+                seen.add(row["diagnostic"].lower())
+                days = (now - datetime.datetime.fromisoformat(row["consulted_at"])).days
+                context["recentDiseases"].append({"name": row["diagnostic"], "date": max(days, 0)})
+        if current is not None:
+            context["medicalHistory"] = current["medicalHistory"] or context["medicalHistory"]
+            context.update({key: current[key] for key in ("symptoms", "analyses", "patientInfo")})
+        return context
+
+    def images(self, digests):
+        """
+        Images traitées enregistrées : [(empreinte, type MIME, octets, largeur, hauteur)].
+        """
+        if not digests:
+            return []
+        with self._connection() as conn:
+            rows = conn.execute(
+                f"SELECT digest, mime_type, data, width, height FROM images WHERE digest IN ({','.join('?' * len(digests))})",
+                list(digests)
+            ).fetchall()
+        return [tuple(row) for row in rows]
+
+    def close(self):
+        self.pool.close()
+
+consultation_store = ConsultationStore(
+    path=os.getenv('CONSULTATION_DB_PATH', DEFAULT_STORE_PATH),
+    pool_size=int(os.getenv('CONSULTATION_DB_POOL_SIZE', 4)),
+    history_days=int(os.getenv('CONSULTATION_HISTORY_DAYS', 365)),
+    history_limit=int(os.getenv('CONSULTATION_HISTORY_LIMIT', 20))
+)
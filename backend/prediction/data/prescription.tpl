@@ -0,0 +1,56 @@
+# Gabarit de l'ordonnance, lu et compilé une seule fois au démarrage (prediction/prescription_pdf.py).
+# Coordonnées en points PDF (A4 : 595 x 842, origine en bas à gauche).
+#
+# [header] : en-tête en positions absolues, sur chaque page.
+#   font regular|bold <taille> · color <r> <g> <b> · line <x1> <y1> <x2> <y2> <épaisseur>
+#   text left|center|right <x> <y> <texte avec {champs}> · image logo|signature <x> <y> <largeur> <hauteur>
+# [body] : contenu en flux, de haut en bas, avec saut de page automatique.
+#   heading <texte> · fields <libellé>={champ} | <libellé>={champ} · paragraph left|center|right <texte>
+#   medications · total · space <points> · signature
+#   "?<champ> <directive>" : directive omise si le champ est vide.
+
+[header]
+image logo 50 774 44 44
+font bold 13
+color 0.11 0.30 0.85
+text left 102 806 {facility}
+font regular 9
+color 0.35 0.35 0.35
+text left 102 793 {facility_address}
+text left 102 782 {facility_phone}
+font bold 11
+color 0 0 0
+text right 545 806 {doctor_name}
+font regular 9
+color 0.35 0.35 0.35
+text right 545 793 {doctor_specialty}
+text right 545 782 {doctor_registration}
+color 0.11 0.30 0.85
+line 50 764 545 764 1.5
+
+[body]
+font bold 18
+color 0.11 0.30 0.85
+paragraph center ORDONNANCE MÉDICALE
+font regular 10
+color 0.35 0.35 0.35
+paragraph center {city}, le {date}
+space 14
+heading Informations du patient
+fields Nom={patient_last_name} | Prénom={patient_first_name}
+fields Âge={patient_age} ans | N° CMU={patient_cmu}
+space 6
+heading Diagnostic
+paragraph left {diagnostic}
+space 6
+?treatment heading Traitement principal
+?treatment paragraph left {treatment}
+?posology fields Posologie={posology}
+space 6
+heading Médicaments prescrits
+medications
+total
+space 6
+heading Instructions
+paragraph left {instructions}
+signature
@@ -0,0 +1,9 @@
+# File: prediction/diseases/infectious/__init__.py
+from prediction.plugins import plugins
+
+# Maladies de la catégorie Infectious. Pour ajouter une pathologie, créer son module
+# de règle et la déclarer ici (nom affiché, alias reconnus).
+plugins.declare("disease", "Malaria", "prediction.diseases.infectious.malaria:MALARIA_RULE",
+                category="Infectious", aliases=["paludisme", "palu"])
+plugins.declare("disease", "Dengue", "prediction.diseases.infectious.dengue:DENGUE_RULE",
+                category="Infectious")
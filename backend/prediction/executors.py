@@ -0,0 +1,165 @@
+# File: prediction/executors.py
+import asyncio
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from prediction.gemini_client import load_environment
+from prediction.metrics import registry, LATENCY_BUCKETS
+
+load_environment()
+
+EXECUTOR_TASK_DURATION = registry.histogram(
+    "esante_executor_task_duration_seconds",
+    "Durée des tâches déportées (attente en file comprise)",
+    ("pool", "task"),
+    LATENCY_BUCKETS
+)
+
+class TrackedPool:
+    """
+    Pool d'exécution (threads ou processus) dont on suit l'occupation depuis la boucle
+    d'événements : tâches soumises et non terminées, dont `max_workers` au plus
+    s'exécutent ; les suivantes attendent en file.
+    """
+
+    def __init__(self, name, factory, max_workers):
+        self.name = name
+        self.max_workers = max_workers
+        self._factory = factory
+        self._executor = None
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.completed = 0
+
+    @property
+    def executor(self):
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = self._factory(self.max_workers)
+        return self._executor
+
+    @property
+    def started(self):
+        return self._executor is not None
+
+    async def run(self, fn, *args, task=None):
+        loop = asyncio.get_running_loop()
+        start = time.perf_counter()
+        self.in_flight += 1
+        try:
+            return await loop.run_in_executor(self.executor, fn, *args)
+        finally:
+            self.in_flight -= 1
+            self.completed += 1
+            EXECUTOR_TASK_DURATION.observe(
+                time.perf_counter() - start, pool=self.name, task=task or getattr(fn, '__name__', 'task')
+            )
+
+    def stats(self):
+        active = min(self.in_flight, self.max_workers)
+        return {
+            "max_workers": self.max_workers,
+            "active": active,
+            "queued": self.in_flight - active,
+            "saturation": round(active / self.max_workers, 3) if self.max_workers else 0.0,
+            "completed": self.completed,
+            "started": self.started,
+        }
+
+    def shutdown(self, wait=True):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait, cancel_futures=True)
+
+def _warm_up():
+    # Import des modules des étapes CPU dans le processus (règles compilées, Pillow)
+    import prediction.image_pipeline
+    import prediction.predictor
+    import prediction.prescription_pdf
+    return os.getpid()
+
+class Executors:
+    """
+    Couche d'exécution partagée par les endpoints :
+    - pool de threads pour les appels bloquants (SDK synchrone, fichiers, SQLite) ;
+    - pool de processus pour les étapes CPU (décodage et réduction des photos, scoring
+      de gros lots), qui tournent alors sur plusieurs cœurs sans bloquer la boucle.
+
+    Tailles : EXECUTOR_THREADS, EXECUTOR_PROCESSES (0 : étapes CPU exécutées dans le
+    pool de threads). Les pools sont créés au premier usage ou par start() au démarrage.
+    """
+
+    def __init__(self, threads=None, processes=None, start_method="spawn"):
+        cpu_count = os.cpu_count() or 1
+        self.threads = TrackedPool(
+            "thread",
+            lambda workers: ThreadPoolExecutor(max_workers=workers, thread_name_prefix="esante-io"),
+            threads or min(32, cpu_count + 4)
+        )
+        processes = cpu_count if processes is None else processes
+        context = multiprocessing.get_context(start_method)
+        self.processes = TrackedPool(
+            "process",
+            lambda workers: ProcessPoolExecutor(max_workers=workers, mp_context=context),
+            processes
+        ) if processes > 0 else None
+
+    async def start(self):
+        """
+        Démarre les pools (appelé par le lifespan) : les processus sont lancés et
+        importent les modules des étapes CPU avant la première requête.
+        """
+        self.threads.executor
+        if self.processes is not None:
+            await asyncio.gather(*(
+                self.processes.run(_warm_up, task="warmup") for _ in range(self.processes.max_workers)
+            ))
+
+    async def run_io(self, fn, *args, task=None):
+        return await self.threads.run(fn, *args, task=task)
+
+    @property
+    def cpu_workers(self):
+        # Parallélisme disponible pour découper un lot entre les appels run_cpu
+        return (self.processes or self.threads).max_workers
+
+    async def run_cpu(self, fn, *args, task=None):
+        """
+        Exécute `fn(*args)` dans le pool de processus. `fn` doit être une fonction de
+        module et ses arguments sérialisables (pickle).
+        """
+        pool = self.processes or self.threads
+        return await pool.run(fn, *args, task=task)
+
+    def stats(self):
+        pools = {"thread": self.threads.stats()}
+        if self.processes is not None:
+            pools["process"] = self.processes.stats()
+        return pools
+
+    def shutdown(self):
+        self.threads.shutdown()
+        if self.processes is not None:
+            self.processes.shutdown()
+
+executors = Executors(
+    threads=int(os.getenv('EXECUTOR_THREADS', 0)) or None,
+    processes=int(os.getenv('EXECUTOR_PROCESSES')) if os.getenv('EXECUTOR_PROCESSES') else None,
+    start_method=os.getenv('EXECUTOR_START_METHOD', 'spawn')
+)
+
+for _field, _documentation in (
+    ("queued", "Tâches en attente d'un worker, par pool"),
+    ("active", "Tâches en cours d'exécution, par pool"),
+    ("saturation", "Proportion des workers occupés, par pool (1 : pool saturé)"),
+):
+    registry.collector(
+        f"esante_executor_{_field}",
+        _documentation,
+        ("pool",),
+        lambda field=_field: {(pool,): stats[field] for pool, stats in executors.stats().items()}
+    )
@@ -1,12 +1,10 @@
 # File: prediction/gemini_analysis_suggester.py
-from google import genai
-from google.genai import types
 from pydantic import BaseModel
 from typing import List, Optional
-import os
-from dotenv import load_dotenv
-
-load_dotenv()
+from prediction.gemini_client import get_client, generate_content, generate_content_async, parse_response
+from prediction.response_cache import response_cache, normalize_name
+from prediction.prompts import PromptTemplate, prompt_accounting
+from prediction.metrics import FALLBACKS
 
 class AnalysisSuggestion(BaseModel):
     id: int
@@ -18,44 +16,8 @@ class AnalysisSuggestion(BaseModel):
 class AnalysisSuggestionsResponse(BaseModel):
     suggestions: List[AnalysisSuggestion]
 
-class GeminiAnalysisSuggester:
-    def __init__(self):
-        api_key = os.getenv('GEMINI_API_KEY')
-        if not api_key:
-            raise ValueError("GEMINI_API_KEY not found in environment variables")
-
-        self.client = genai.Client(api_key=api_key)
-        self.model = 'gemini-2.0-flash-exp'
-
-    def build_analysis_suggestion_prompt(self, symptoms, medical_history, patient_info):
-        """
-        Construit un prompt pour suggérer des analyses médicales pertinentes
-        basées sur les symptômes et antécédents du patient.
-        """
-        symptoms_text = "Aucun" if not symptoms else "\n".join([
-            f"- {symptom.name}" for symptom in symptoms
-        ])
-
-        history_text = "Aucun" if not medical_history else "\n".join([
-            f"- {item.get('name', item) if isinstance(item, dict) else item}"
-            for item in medical_history
-        ])
-
-        age = patient_info.get('age', 'Non spécifié') if patient_info else 'Non spécifié'
-        gender = patient_info.get('gender', 'Non spécifié') if patient_info else 'Non spécifié'
-
-        prompt = f"""Vous êtes un médecin expert en médecine tropicale et diagnostics médicaux, spécialisé dans le contexte ivoirien (Abidjan).
-
-**INFORMATIONS DU PATIENT:**
-- Âge: {age} ans
-- Genre: {gender}
-- Localisation: Abidjan, Côte d'Ivoire
-
-**SYMPTÔMES ACTUELS:**
-{symptoms_text}
-
-**ANTÉCÉDENTS MÉDICAUX:**
-{history_text}
+# Préfixe statique : rôle, critères et contexte ivoirien
+ANALYSIS_PROMPT = PromptTemplate('analyses', """Vous êtes un médecin expert en médecine tropicale et diagnostics médicaux, spécialisé dans le contexte ivoirien (Abidjan).
 
 **MISSION:**
 Sur la base des symptômes et antécédents du patient, suggérez 3 à 8 analyses médicales pertinentes qui aideraient à établir un diagnostic précis.
@@ -87,9 +49,73 @@ Pour chaque analyse suggérée, retournez:
 - category: Catégorie de l'analyse
 
 **IMPORTANT:** Suggérez des analyses réellement disponibles et pratiques dans un contexte hospitalier ivoirien.
+""")
+
+class GeminiAnalysisSuggester:
+    def __init__(self):
+        self.model = 'gemini-2.0-flash-exp'
+        self.sampling = {'temperature': 0.3, 'top_p': 0.85, 'top_k': 40}
+
+    @property
+    def client(self):
+        # Client partagé, créé au premier appel à Gemini
+        return get_client()
+
+    def build_analysis_suggestion_prompt(self, symptoms, medical_history, patient_info):
+        """
+        Construit la section dynamique du prompt (patient) pour suggérer des analyses
+        médicales pertinentes ; le préfixe statique est ANALYSIS_PROMPT.
+        """
+        symptoms_text = "Aucun" if not symptoms else "\n".join([
+            f"- {symptom.name}" for symptom in symptoms
+        ])
+
+        history_text = "Aucun" if not medical_history else "\n".join([
+            f"- {item.get('name', item) if isinstance(item, dict) else item}"
+            for item in medical_history
+        ])
+
+        age = patient_info.get('age', 'Non spécifié') if patient_info else 'Non spécifié'
+        gender = patient_info.get('gender', 'Non spécifié') if patient_info else 'Non spécifié'
+
+        prompt = f"""**INFORMATIONS DU PATIENT:**
+- Âge: {age} ans
+- Genre: {gender}
+- Localisation: Abidjan, Côte d'Ivoire
+
+**SYMPTÔMES ACTUELS:**
+{symptoms_text}
+
+**ANTÉCÉDENTS MÉDICAUX:**
+{history_text}
 """
+        prompt_accounting.record_prompt(ANALYSIS_PROMPT, prompt)
         return prompt
 
+    def build_config(self):
+        from google.genai import types
+        return types.GenerateContentConfig(
+            response_mime_type='application/json',
+            response_schema=AnalysisSuggestionsResponse,
+            **self.sampling,
+            **ANALYSIS_PROMPT.config_kwargs(self.model)
+        )
+
+    def cache_key(self, symptoms, medical_history, patient_info):
+        """
+        Clé du cache de réponses. Seuls les noms des symptômes figurent dans le prompt.
+        """
+        inputs = {
+            "age": patient_info.get('age') if patient_info else None,
+            "gender": normalize_name(patient_info.get('gender')) if patient_info else None,
+            "symptoms": sorted(normalize_name(symptom.name) for symptom in symptoms),
+            "history": sorted(
+                normalize_name(item.get('name', item) if isinstance(item, dict) else item)
+                for item in (medical_history or [])
+            ),
+        }
+        return response_cache.make_key('analyses', self.model, {**self.sampling, 'prompt': ANALYSIS_PROMPT.version}, inputs)
+
     def suggest_analyses(self, symptoms, medical_history, patient_info=None):
         """
         Suggère des analyses médicales pertinentes basées sur les symptômes et antécédents.
@@ -98,25 +124,56 @@ Pour chaque analyse suggérée, retournez:
             return AnalysisSuggestionsResponse(suggestions=[])
 
         try:
+            key = self.cache_key(symptoms, medical_history, patient_info)
+            cached = response_cache.get('analyses', key, AnalysisSuggestionsResponse)
+            if cached is not None:
+                return cached
+
+            prompt = self.build_analysis_suggestion_prompt(symptoms, medical_history, patient_info)
+
+            response = generate_content(
+                self.client, self.model, prompt, self.build_config(),
+                endpoint=ANALYSIS_PROMPT.name
+            )
+
+            prompt_accounting.record_usage(ANALYSIS_PROMPT, response)
+            result = parse_response(response, ANALYSIS_PROMPT.name)
+            response_cache.set('analyses', key, result)
+            return result
+
+        except Exception as e:
+            print(f"Gemini analysis suggestion error: {str(e)}")
+            FALLBACKS.inc(endpoint="analyses", reason="gemini_error")
+            return AnalysisSuggestionsResponse(suggestions=[])
+
+    async def suggest_analyses_async(self, symptoms, medical_history, patient_info=None):
+        """
+        Variante asynchrone de suggest_analyses, sans blocage de la boucle d'événements.
+        """
+        if not symptoms or len(symptoms) == 0:
+            return AnalysisSuggestionsResponse(suggestions=[])
+
+        try:
+            key = self.cache_key(symptoms, medical_history, patient_info)
+            cached = await response_cache.get_async('analyses', key, AnalysisSuggestionsResponse)
+            if cached is not None:
+                return cached
+
             prompt = self.build_analysis_suggestion_prompt(symptoms, medical_history, patient_info)
 
-            response = self.client.models.generate_content(
-                model=self.model,
-                contents=prompt,
-                config=types.GenerateContentConfig(
-                    response_mime_type='application/json',
-                    response_schema=AnalysisSuggestionsResponse,
-                    temperature=0.3,
-                    top_p=0.85,
-                    top_k=40,
-                )
+            response = await generate_content_async(
+                self.client, self.model, prompt, self.build_config(),
+                endpoint=ANALYSIS_PROMPT.name
             )
 
-            result = response.parsed
+            prompt_accounting.record_usage(ANALYSIS_PROMPT, response)
+            result = parse_response(response, ANALYSIS_PROMPT.name)
+            await response_cache.set_async('analyses', key, result)
             return result
 
         except Exception as e:
             print(f"Gemini analysis suggestion error: {str(e)}")
+            FALLBACKS.inc(endpoint="analyses", reason="gemini_error")
             return AnalysisSuggestionsResponse(suggestions=[])
 
 analysis_suggester = GeminiAnalysisSuggester()
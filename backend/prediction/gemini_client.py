@@ -0,0 +1,301 @@
+# File: prediction/gemini_client.py
+import asyncio
+import os
+import threading
+import time
+from prediction.metrics import registry, GEMINI_CALL_DURATION, GEMINI_ERRORS, GEMINI_PARSE_FAILURES, GEMINI_RETRIES
+from prediction.resilience import CircuitBreaker, CircuitOpenError, RetryPolicy, UpstreamTimeoutError, is_transient
+
+# Nombre maximal d'appels Gemini simultanés pour un worker
+DEFAULT_MAX_CONCURRENCY = 8
+
+# Délai total par endpoint (secondes), au-delà duquel les moteurs locaux prennent le relais
+DEFAULT_DEADLINES = {
+    "diagnostic": 25.0,
+    "compatibility": 8.0,
+    "analyses": 10.0,
+}
+
+# Timeout HTTP d'une requête isolée (filet de sécurité, y compris pour le client sync)
+DEFAULT_HTTP_TIMEOUT = 30.0
+
+_semaphore = None
+_client = None
+_client_lock = threading.Lock()
+_breakers = {}
+_environment_loaded = False
+
+def load_environment():
+    """
+    Charge le fichier .env une seule fois pour tout le processus.
+    """
+    global _environment_loaded
+    if not _environment_loaded:
+        from dotenv import load_dotenv
+        load_dotenv()
+        _environment_loaded = True
+
+def get_client():
+    """
+    Client Gemini partagé, créé au premier usage.
+
+    L'import de google.genai (coûteux) est différé jusqu'ici : importer l'application
+    pour n'utiliser que le moteur de règles ne charge pas le SDK. Lève ValueError si
+    GEMINI_API_KEY est absente, ce qui déclenche les fallbacks des endpoints.
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                load_environment()
+                api_key = os.getenv('GEMINI_API_KEY')
+                if not api_key:
+                    raise ValueError("GEMINI_API_KEY not found in environment variables")
+                from google import genai
+                timeout = float(os.getenv('GEMINI_HTTP_TIMEOUT', DEFAULT_HTTP_TIMEOUT))
+                _client = genai.Client(api_key=api_key, http_options={"timeout": int(timeout * 1000)})
+    return _client
+
+def set_client(client):
+    """
+    Remplace le client partagé (ex. faux client Gemini pour les benchmarks).
+    """
+    global _client
+    with _client_lock:
+        _client = client
+
+async def close_client():
+    global _client
+    client = _client
+    _client = None
+    if client is not None and hasattr(client, 'aio') and hasattr(client.aio, 'aclose'):
+        await client.aio.aclose()
+
+def get_semaphore():
+    """
+    Retourne le sémaphore partagé qui borne le nombre d'appels Gemini en vol.
+    La limite est lue dans GEMINI_MAX_CONCURRENCY au premier appel.
+    """
+    global _semaphore
+    if _semaphore is None:
+        limit = int(os.getenv('GEMINI_MAX_CONCURRENCY', DEFAULT_MAX_CONCURRENCY))
+        _semaphore = asyncio.Semaphore(max(1, limit))
+    return _semaphore
+
+def get_deadline(endpoint):
+    """
+    Délai total accordé à un appel Gemini pour un endpoint (tentatives, backoff et file
+    d'attente compris). Surchargé par GEMINI_DEADLINE_<ENDPOINT>, puis GEMINI_DEADLINE.
+    """
+    value = os.getenv(f'GEMINI_DEADLINE_{endpoint.upper()}') or os.getenv('GEMINI_DEADLINE')
+    return float(value) if value else DEFAULT_DEADLINES.get(endpoint, 15.0)
+
+def get_breaker(model):
+    """
+    Disjoncteur associé à un modèle, partagé par tous les endpoints qui l'appellent.
+    """
+    breaker = _breakers.get(model)
+    if breaker is None:
+        with _client_lock:
+            breaker = _breakers.setdefault(model, CircuitBreaker(
+                model,
+                failure_threshold=int(os.getenv('GEMINI_BREAKER_FAILURES', 5)),
+                reset_timeout=float(os.getenv('GEMINI_BREAKER_RESET', 30))
+            ))
+    return breaker
+
+def breaker_states():
+    return {model: breaker.snapshot() for model, breaker in _breakers.items()}
+
+def record_call(model, endpoint, start, error=None):
+    """
+    Enregistre la durée et l'issue d'un appel Gemini.
+    """
+    outcome = "error" if error is not None else "success"
+    GEMINI_CALL_DURATION.observe(time.perf_counter() - start, model=model, endpoint=endpoint, outcome=outcome)
+    if error is not None:
+        GEMINI_ERRORS.inc(model=model, endpoint=endpoint, error=type(error).__name__)
+
+def record_outcome(breaker, model, endpoint, start, error=None):
+    """
+    Métriques de la tentative et mise à jour du disjoncteur. Retourne True si l'erreur
+    est transitoire (nouvelle tentative possible).
+    """
+    record_call(model, endpoint, start, error)
+    if error is not None and is_transient(error):
+        breaker.record_failure(error)
+        return True
+    # Une réponse, même une erreur 4xx, prouve que l'upstream répond
+    breaker.record_success()
+    return False
+
+def generate_content(client, model, contents, config, endpoint=""):
+    """
+    Appel Gemini synchrone (variantes sync des prédicteurs), avec nouvelles tentatives
+    et disjoncteur. Le délai de chaque tentative est borné par le timeout HTTP du client.
+    """
+    breaker = get_breaker(model)
+    deadline = time.monotonic() + get_deadline(endpoint)
+    attempt = 0
+    while True:
+        if not breaker.allow():
+            raise CircuitOpenError(f"Gemini circuit open for {model}")
+        start = time.perf_counter()
+        try:
+            response = client.models.generate_content(
+                model=model,
+                contents=contents,
+                config=config
+            )
+        except Exception as e:
+            transient = record_outcome(breaker, model, endpoint, start, e)
+            delay = retry_policy.delay(attempt)
+            if not transient or attempt >= retry_policy.max_retries or time.monotonic() + delay >= deadline:
+                raise
+            GEMINI_RETRIES.inc(model=model, endpoint=endpoint)
+            attempt += 1
+            time.sleep(delay)
+            continue
+        record_outcome(breaker, model, endpoint, start)
+        return response
+
+async def call_with_resilience(model, endpoint, call, deadline=None, acquire=True):
+    """
+    Exécute `call()` (fabrique de coroutine) sous le délai de l'endpoint, avec nouvelles
+    tentatives pour les erreurs transitoires et court-circuit si le disjoncteur est ouvert.
+    La place dans la limite de concurrence est libérée pendant le backoff.
+    """
+    loop = asyncio.get_running_loop()
+    if deadline is None:
+        deadline = loop.time() + get_deadline(endpoint)
+    breaker = get_breaker(model)
+    semaphore = get_semaphore()
+    attempt = 0
+    while True:
+        if not breaker.allow():
+            raise CircuitOpenError(f"Gemini circuit open for {model}")
+        if acquire:
+            try:
+                await asyncio.wait_for(semaphore.acquire(), max(0, deadline - loop.time()))
+            except asyncio.TimeoutError as e:
+                # Délai écoulé en file d'attente : l'upstream n'est pas en cause
+                breaker.cancel_probe()
+                raise UpstreamTimeoutError(f"Gemini concurrency queue exceeded the {endpoint} deadline") from e
+            except BaseException:
+                breaker.cancel_probe()
+                raise
+        start = time.perf_counter()
+        try:
+            response = await asyncio.wait_for(call(), max(0, deadline - loop.time()))
+        except asyncio.CancelledError:
+            # Requête annulée (remplacée, client parti) : l'essai semi-ouvert n'a pas abouti
+            breaker.cancel_probe()
+            raise
+        except asyncio.TimeoutError as e:
+            error = UpstreamTimeoutError(f"Gemini did not answer within the {endpoint} deadline")
+            record_outcome(breaker, model, endpoint, start, error)
+            raise error from e
+        except Exception as e:
+            transient = record_outcome(breaker, model, endpoint, start, e)
+            delay = retry_policy.delay(attempt)
+            if not transient or attempt >= retry_policy.max_retries or loop.time() + delay >= deadline:
+                raise
+        else:
+            record_outcome(breaker, model, endpoint, start)
+            return response
+        finally:
+            if acquire:
+                semaphore.release()
+        GEMINI_RETRIES.inc(model=model, endpoint=endpoint)
+        attempt += 1
+        await asyncio.sleep(delay)
+
+async def generate_content_async(client, model, contents, config, endpoint=""):
+    """
+    Appelle Gemini via le client asynchrone sans bloquer la boucle d'événements.
+    Les appels au-delà de la limite de concurrence attendent leur tour ; délai,
+    nouvelles tentatives et disjoncteur sont ceux de call_with_resilience.
+    """
+    return await call_with_resilience(
+        model,
+        endpoint,
+        lambda: client.aio.models.generate_content(
+            model=model,
+            contents=contents,
+            config=config
+        )
+    )
+
+async def generate_content_stream_async(client, model, contents, config, endpoint=""):
+    """
+    Génération en streaming : produit les morceaux de réponse au fur et à mesure.
+    La place dans la limite de concurrence est conservée jusqu'à la fin du flux.
+    Seule l'ouverture du flux est réessayée ; l'attente de chaque morceau reste bornée
+    par le délai de l'endpoint.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + get_deadline(endpoint)
+    breaker = get_breaker(model)
+    semaphore = get_semaphore()
+    try:
+        await asyncio.wait_for(semaphore.acquire(), max(0, deadline - loop.time()))
+    except asyncio.TimeoutError as e:
+        raise UpstreamTimeoutError(f"Gemini concurrency queue exceeded the {endpoint} deadline") from e
+    try:
+        stream = await call_with_resilience(
+            model,
+            endpoint,
+            lambda: client.aio.models.generate_content_stream(
+                model=model,
+                contents=contents,
+                config=config
+            ),
+            deadline=deadline,
+            acquire=False
+        )
+        iterator = stream.__aiter__()
+        while True:
+            try:
+                chunk = await asyncio.wait_for(iterator.__anext__(), max(0, deadline - loop.time()))
+            except StopAsyncIteration:
+                break
+            except Exception as e:
+                error = e
+                if isinstance(e, asyncio.TimeoutError):
+                    error = UpstreamTimeoutError(f"Gemini stream exceeded the {endpoint} deadline")
+                # Échec en cours de flux : l'ouverture a déjà été mesurée comme un appel
+                GEMINI_ERRORS.inc(model=model, endpoint=endpoint, error=type(error).__name__)
+                if is_transient(error):
+                    breaker.record_failure(error)
+                if error is e:
+                    raise
+                raise error from e
+            yield chunk
+    finally:
+        semaphore.release()
+
+def parse_response(response, endpoint=""):
+    """
+    Objet structuré de la réponse Gemini. Lève ValueError (et compte un échec
+    d'analyse) si la réponse ne respecte pas le schéma demandé.
+    """
+    result = response.parsed
+    if result is None:
+        GEMINI_PARSE_FAILURES.inc(endpoint=endpoint)
+        raise ValueError("Réponse Gemini non conforme au schéma attendu")
+    return result
+
+retry_policy = RetryPolicy(
+    max_retries=int(os.getenv('GEMINI_MAX_RETRIES', 2)),
+    base_delay=float(os.getenv('GEMINI_RETRY_BASE_DELAY', 0.25)),
+    max_delay=float(os.getenv('GEMINI_RETRY_MAX_DELAY', 4.0))
+)
+
+_BREAKER_STATE_VALUES = {CircuitBreaker.CLOSED: 0, CircuitBreaker.HALF_OPEN: 1, CircuitBreaker.OPEN: 2}
+
+registry.collector(
+    "esante_gemini_circuit_state",
+    "État du disjoncteur Gemini par modèle (0 fermé, 1 semi-ouvert, 2 ouvert)",
+    ("model",),
+    lambda: {(model,): _BREAKER_STATE_VALUES[state["state"]] for model, state in breaker_states().items()}
+)
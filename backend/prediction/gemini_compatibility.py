@@ -1,12 +1,11 @@
 # File: prediction/gemini_compatibility.py
-from google import genai
-from google.genai import types
 from pydantic import BaseModel
 from typing import List, Optional
-import os
-from dotenv import load_dotenv
-
-load_dotenv()
+from prediction.gemini_client import get_client, generate_content, generate_content_async, parse_response
+from prediction.response_cache import response_cache, normalize_name
+from prediction.interaction_rules import interaction_engine
+from prediction.prompts import PromptTemplate, prompt_accounting
+from prediction.metrics import FALLBACKS
 
 class MedicationWarning(BaseModel):
     medication_ids: List[int]
@@ -15,44 +14,25 @@ class MedicationWarning(BaseModel):
     reason: str
     recommendation: Optional[str] = None
 
-class CompatibilityResult(BaseModel):
+class GeminiCompatibilityResponse(BaseModel):
+    # Schéma de réponse demandé à Gemini (et conservé dans le cache de réponses)
     compatible: bool
     warnings: List[MedicationWarning]
 
-class GeminiCompatibilityChecker:
-    def __init__(self):
-        api_key = os.getenv('GEMINI_API_KEY')
-        if not api_key:
-            raise ValueError("GEMINI_API_KEY not found in environment variables")
-
-        self.client = genai.Client(api_key=api_key)
-        self.model = 'gemini-2.0-flash-exp'
-
-    def build_compatibility_prompt(self, medications, patient_info):
-        meds_text = "\n".join([
-            f"- **{med['name']}** (ID: {med['id']})\n  Catégorie: {med['category']}\n  Indication: {med['indication']}\n  Posologie: {med['dosage']}"
-            for med in medications
-        ])
-
-        age = patient_info.get('age', 'Non spécifié') if patient_info else 'Non spécifié'
-        gender = patient_info.get('gender', 'Non spécifié') if patient_info else 'Non spécifié'
-        history = patient_info.get('medicalHistory', []) if patient_info else []
-
-        history_text = "Aucun" if not history else "\n".join([f"- {item['name']}" for item in history])
-
-        prompt = f"""Vous êtes un pharmacologue expert spécialisé dans les interactions médicamenteuses et les contre-indications.
-
-**INFORMATIONS DU PATIENT:**
-- Âge: {age} ans
-- Genre: {gender}
-- Antécédents médicaux:
-{history_text}
+class CompatibilityResult(BaseModel):
+    compatible: bool
+    warnings: List[MedicationWarning]
+    # Paires [id_a, id_b] inconnues du moteur local que Gemini n'a pas pu vérifier :
+    # tant qu'il en reste, la sélection n'est pas déclarée compatible
+    unverified_pairs: List[List[int]] = []
+    # "rules" (moteur local seul), "rules+gemini" ou "fallback"
+    source: Optional[str] = None
 
-**MÉDICAMENTS SÉLECTIONNÉS:**
-{meds_text}
+# Préfixe statique : rôle, mission et critères d'alerte
+COMPATIBILITY_PROMPT = PromptTemplate('compatibility', """Vous êtes un pharmacologue expert spécialisé dans les interactions médicamenteuses et les contre-indications.
 
 **MISSION:**
-Analysez ces médicaments et identifiez TOUTES les interactions potentiellement dangereuses, contre-indications ou incompatibilités:
+Analysez les médicaments sélectionnés pour le patient décrit et identifiez TOUTES les interactions potentiellement dangereuses, contre-indications ou incompatibilités:
 
 1. **Interactions médicament-médicament:**
    - Interactions majeures (risque vital)
@@ -84,36 +64,207 @@ Pour chaque incompatibilité trouvée, retournez:
 - recommendation: Suggestion alternative ou précaution
 
 Si AUCUNE incompatibilité détectée, retournez: compatible=true, warnings=[]
-"""
+""")
+
+class GeminiCompatibilityChecker:
+    def __init__(self):
+        self.model = 'gemini-2.0-flash-exp'
+        self.sampling = {'temperature': 0.2, 'top_p': 0.8, 'top_k': 40}
+
+    @property
+    def client(self):
+        # Client partagé, créé au premier appel à Gemini
+        return get_client()
+
+    def build_compatibility_prompt(self, medications, patient_info, pairs=None):
+        meds_text = "\n".join([
+            f"- **{med['name']}** (ID: {med['id']})\n  Catégorie: {med['category']}\n  Indication: {med['indication']}\n  Posologie: {med['dosage']}"
+            for med in medications
+        ])
+
+        age = patient_info.get('age', 'Non spécifié') if patient_info else 'Non spécifié'
+        gender = patient_info.get('gender', 'Non spécifié') if patient_info else 'Non spécifié'
+        history = patient_info.get('medicalHistory', []) if patient_info else []
+
+        history_text = "Aucun" if not history else "\n".join([f"- {item['name']}" for item in history])
+
+        # Paires restant à analyser (les autres ont déjà été vérifiées localement)
+        names = {med['id']: med['name'] for med in medications}
+        pairs_text = ""
+        if pairs:
+            pairs_text = "\n**PAIRES À ANALYSER EN PRIORITÉ:**\n" + "\n".join(
+                [f"- {names[id_a]} (ID: {id_a}) + {names[id_b]} (ID: {id_b})" for id_a, id_b in pairs]
+            ) + "\nLes autres associations ont déjà été vérifiées : ne les signalez pas.\n"
+
+        prompt = f"""**INFORMATIONS DU PATIENT:**
+- Âge: {age} ans
+- Genre: {gender}
+- Antécédents médicaux:
+{history_text}
+
+**MÉDICAMENTS SÉLECTIONNÉS:**
+{meds_text}
+{pairs_text}"""
+        prompt_accounting.record_prompt(COMPATIBILITY_PROMPT, prompt)
         return prompt
 
+    def build_config(self):
+        from google.genai import types
+        return types.GenerateContentConfig(
+            response_mime_type='application/json',
+            response_schema=GeminiCompatibilityResponse,
+            **self.sampling,
+            **COMPATIBILITY_PROMPT.config_kwargs(self.model)
+        )
+
+    def cache_key(self, medications, patient_info, pairs=None):
+        """
+        Clé du cache de réponses. Les IDs sont conservés car la réponse les référence.
+        """
+        history = patient_info.get('medicalHistory', []) if patient_info else []
+        inputs = {
+            "age": patient_info.get('age') if patient_info else None,
+            "gender": normalize_name(patient_info.get('gender')) if patient_info else None,
+            "history": sorted(normalize_name(item['name']) for item in history),
+            "medications": sorted(
+                [med['id'], normalize_name(med['name']), normalize_name(med['category']),
+                 normalize_name(med['indication']), normalize_name(med['dosage'])]
+                for med in medications
+            ),
+            "pairs": sorted(sorted(pair) for pair in pairs) if pairs else None,
+        }
+        return response_cache.make_key('compatibility', self.model, {**self.sampling, 'prompt': COMPATIBILITY_PROMPT.version}, inputs)
+
+    def check_locally(self, medications, patient_info=None, pairs=None):
+        """
+        Évalue les paires avec le moteur local. Retourne (warnings, paires inconnues).
+        """
+        warnings, unknown_pairs = interaction_engine.evaluate(medications, patient_info, pairs)
+        warnings.extend(interaction_engine.evaluate_patient(medications, patient_info))
+        return warnings, unknown_pairs
+
+    def gemini_inputs(self, medications, unknown_pairs):
+        """
+        Médicaments à envoyer à Gemini : seulement ceux impliqués dans une paire inconnue.
+        """
+        involved = {med_id for pair in unknown_pairs for med_id in pair}
+        return [med for med in medications if med['id'] in involved]
+
+    def merge_results(self, local_warnings, gemini_result, unverified_pairs=()):
+        """
+        Fusionne les avertissements locaux et ceux de Gemini. Pour une même combinaison de
+        médicaments, l'avertissement du moteur local (déterministe) est conservé.
+        Les `unverified_pairs` (paires inconnues sans réponse de Gemini) rendent le
+        résultat non compatible et sont retournées pour être signalées au prescripteur.
+        """
+        warnings = [MedicationWarning(**warning) for warning in local_warnings]
+        if gemini_result is not None:
+            seen = {frozenset(warning.medication_ids) for warning in warnings}
+            for warning in gemini_result.warnings:
+                if frozenset(warning.medication_ids) not in seen:
+                    warnings.append(warning)
+                    seen.add(frozenset(warning.medication_ids))
+        unverified = sorted(sorted(pair) for pair in unverified_pairs)
+        return CompatibilityResult(
+            compatible=len(warnings) == 0 and not unverified,
+            warnings=warnings,
+            unverified_pairs=unverified,
+            source="rules+gemini" if gemini_result is not None else "rules"
+        )
+
     def check_compatibility(self, medications, patient_info=None):
         if not medications or len(medications) == 0:
-            return CompatibilityResult(compatible=True, warnings=[])
+            return CompatibilityResult(compatible=True, warnings=[], source="rules")
 
-        if len(medications) == 1:
-            return CompatibilityResult(compatible=True, warnings=[])
+        local_warnings, unknown_pairs = self.check_locally(medications, patient_info)
+        if not unknown_pairs:
+            return self.merge_results(local_warnings, None)
 
         try:
-            prompt = self.build_compatibility_prompt(medications, patient_info)
-
-            response = self.client.models.generate_content(
-                model=self.model,
-                contents=prompt,
-                config=types.GenerateContentConfig(
-                    response_mime_type='application/json',
-                    response_schema=CompatibilityResult,
-                    temperature=0.2,
-                    top_p=0.8,
-                    top_k=40,
+            gemini_medications = self.gemini_inputs(medications, unknown_pairs)
+            key = self.cache_key(gemini_medications, patient_info, unknown_pairs)
+            result = response_cache.get('compatibility', key, GeminiCompatibilityResponse)
+            if result is None:
+                prompt = self.build_compatibility_prompt(gemini_medications, patient_info, unknown_pairs)
+
+                response = generate_content(
+                    self.client, self.model, prompt, self.build_config(),
+                    endpoint=COMPATIBILITY_PROMPT.name
                 )
-            )
 
-            result = response.parsed
+                prompt_accounting.record_usage(COMPATIBILITY_PROMPT, response)
+                result = parse_response(response, COMPATIBILITY_PROMPT.name)
+                response_cache.set('compatibility', key, result)
+
+        except Exception as e:
+            print(f"Gemini compatibility check error: {str(e)}")
+            FALLBACKS.inc(endpoint="compatibility", reason="gemini_error")
+            return self.merge_results(local_warnings, None, unknown_pairs)
+
+        return self.merge_results(local_warnings, result)
+
+    async def ask_gemini_async(self, medications, patient_info, unknown_pairs):
+        """
+        Soumet à Gemini les paires inconnues du moteur local.
+        Retourne un GeminiCompatibilityResponse, ou None si Gemini est indisponible
+        (les paires restent alors non vérifiées).
+        """
+        try:
+            gemini_medications = self.gemini_inputs(medications, unknown_pairs)
+            key = self.cache_key(gemini_medications, patient_info, unknown_pairs)
+            result = await response_cache.get_async('compatibility', key, GeminiCompatibilityResponse)
+            if result is None:
+                prompt = self.build_compatibility_prompt(gemini_medications, patient_info, unknown_pairs)
+
+                response = await generate_content_async(
+                    self.client, self.model, prompt, self.build_config(),
+                    endpoint=COMPATIBILITY_PROMPT.name
+                )
+
+                prompt_accounting.record_usage(COMPATIBILITY_PROMPT, response)
+                result = parse_response(response, COMPATIBILITY_PROMPT.name)
+                await response_cache.set_async('compatibility', key, result)
             return result
 
         except Exception as e:
             print(f"Gemini compatibility check error: {str(e)}")
-            return CompatibilityResult(compatible=True, warnings=[])
+            FALLBACKS.inc(endpoint="compatibility", reason="gemini_error")
+            return None
+
+    async def check_compatibility_async(self, medications, patient_info=None):
+        """
+        Variante asynchrone de check_compatibility, sans blocage de la boucle d'événements.
+        """
+        if not medications or len(medications) == 0:
+            return CompatibilityResult(compatible=True, warnings=[], source="rules")
+
+        local_warnings, unknown_pairs = self.check_locally(medications, patient_info)
+        if not unknown_pairs:
+            return self.merge_results(local_warnings, None)
+
+        result = await self.ask_gemini_async(medications, patient_info, unknown_pairs)
+        return self.merge_results(local_warnings, result, unknown_pairs if result is None else ())
+
+    async def check_pairs_async(self, medications, pairs, patient_info=None):
+        """
+        Évalue uniquement les paires données (mode incrémental).
+
+        Retourne (warnings, evaluated_pairs, gemini_pairs) : la liste des MedicationWarning
+        trouvés, l'ensemble des paires effectivement évaluées et, parmi elles, celles
+        évaluées par Gemini. Les paires confiées à Gemini ne sont pas marquées évaluées si
+        Gemini n'a pas répondu, afin d'être réessayées.
+        """
+        local_warnings, unknown_pairs = interaction_engine.evaluate(medications, patient_info, pairs)
+        evaluated = {frozenset(pair) for pair in pairs} - {frozenset(pair) for pair in unknown_pairs}
+
+        result = None
+        gemini_pairs = set()
+        if unknown_pairs:
+            result = await self.ask_gemini_async(medications, patient_info, unknown_pairs)
+            if result is not None:
+                gemini_pairs = {frozenset(pair) for pair in unknown_pairs}
+                evaluated |= gemini_pairs
+
+        return self.merge_results(local_warnings, result).warnings, evaluated, gemini_pairs
 
 compatibility_checker = GeminiCompatibilityChecker()
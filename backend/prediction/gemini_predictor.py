@@ -1,14 +1,14 @@
 # File: prediction/gemini_predictor.py
-from google import genai
-from google.genai import types
-from pydantic import BaseModel
+from pydantic import BaseModel, ValidationError
 from typing import List, Optional
-import os
-from dotenv import load_dotenv
+import asyncio
 import datetime
-import base64
-
-load_dotenv()
+from prediction.gemini_client import get_client, generate_content, generate_content_async, parse_response, generate_content_stream_async
+from prediction.json_stream import JsonArrayStreamParser
+from prediction.response_cache import response_cache, normalize_name
+from prediction.image_pipeline import image_pipeline, source_digest
+from prediction.prompts import PromptTemplate, prompt_accounting
+from prediction.metrics import GEMINI_PARSE_FAILURES
 
 class DiagnosticResult(BaseModel):
     id: int
@@ -28,16 +28,51 @@ class GeminiDiagnosticResponse(BaseModel):
     diagnostics: List[DiagnosticResult]
     medications: List[MedicationSuggestion]
 
+# Préfixe statique, identique pour toutes les consultations
+MEDICAL_PROMPT = PromptTemplate('diagnostic', """Vous êtes un médecin expert en diagnostic médical exerçant à Abidjan, Côte d'Ivoire.
+Analysez les informations du patient fournies et proposez des suggestions de diagnostic avec des médicaments appropriés.
+
+**CONTEXTE GÉOGRAPHIQUE ET CLIMATIQUE:**
+- Localisation: Abidjan, Côte d'Ivoire
+- La saison actuelle est précisée avec les informations du patient
+- Considérez les maladies prévalentes localement: paludisme, dengue, fièvre typhoïde, infections respiratoires
+
+**INSTRUCTIONS:**
+1. Proposez entre 3 et 5 diagnostics les plus probables avec:
+   - Un score de probabilité entre 0 et 100
+   - Une explication concise (2-3 phrases) justifiant pourquoi vous pensez à ce diagnostic
+   - Basez-vous sur les symptômes, analyses, contexte épidémiologique local et historique du patient
+
+2. Pour chaque diagnostic, suggérez 5 à 10 médicaments appropriés disponibles en Côte d'Ivoire:
+   - Utilisez les noms génériques ET commerciaux si pertinent
+   - Indiquez la posologie précise et la durée du traitement
+   - Estimez le coût en Francs CFA (FCFA) basé sur les prix pharmaceutiques ivoiriens
+   - Privilégiez les médicaments génériques quand c'est possible
+   - Incluez différentes catégories: antipyrétiques, analgésiques, antibiotiques si nécessaire, antipaludiques si pertinent, etc.
+
+3. Tenez compte:
+   - Des interactions possibles avec l'historique médical
+   - De l'âge et du genre du patient
+   - Du contexte local (médicaments disponibles en pharmacie ivoirienne)
+   - De la saison (risques accrus pendant la saison des pluies)
+
+Retournez votre réponse au format JSON structuré selon le schéma fourni.
+""")
+
 class GeminiMedicalPredictor:
     def __init__(self):
-        api_key = os.getenv('GEMINI_API_KEY')
-        if not api_key:
-            raise ValueError("GEMINI_API_KEY not found in environment variables")
-
-        self.client = genai.Client(api_key=api_key)
         self.model = 'gemini-2.0-flash-exp'
+        self.sampling = {'temperature': 0.3, 'top_p': 0.8, 'top_k': 40}
+
+    @property
+    def client(self):
+        # Client partagé, créé au premier appel à Gemini
+        return get_client()
 
     def build_medical_prompt(self, symptoms, analyses, history, recent_diseases, patient_info=None):
+        """
+        Section dynamique du prompt (patient) ; le préfixe statique est MEDICAL_PROMPT.
+        """
         season = self._get_current_season()
 
         symptoms_text = self._format_symptoms(symptoms)
@@ -48,13 +83,7 @@ class GeminiMedicalPredictor:
         age = patient_info.get('age', 'Non spécifié') if patient_info else 'Non spécifié'
         gender = patient_info.get('gender', 'Non spécifié') if patient_info else 'Non spécifié'
 
-        prompt = f"""Vous êtes un médecin expert en diagnostic médical exerçant à Abidjan, Côte d'Ivoire.
-Analysez les informations du patient suivant et fournissez des suggestions de diagnostic avec des médicaments appropriés.
-
-**CONTEXTE GÉOGRAPHIQUE ET CLIMATIQUE:**
-- Localisation: Abidjan, Côte d'Ivoire
-- Saison actuelle: {season}
-- Considérez les maladies prévalentes localement: paludisme, dengue, fièvre typhoïde, infections respiratoires
+        prompt = f"""**SAISON ACTUELLE:** {season}
 
 **INFORMATIONS DU PATIENT:**
 - Âge: {age} ans
@@ -71,80 +100,224 @@ Analysez les informations du patient suivant et fournissez des suggestions de di
 
 **RÉSULTATS D'ANALYSES MÉDICALES:**
 {analyses_text}
-
-**INSTRUCTIONS:**
-1. Proposez entre 3 et 5 diagnostics les plus probables avec:
-   - Un score de probabilité entre 0 et 100
-   - Une explication concise (2-3 phrases) justifiant pourquoi vous pensez à ce diagnostic
-   - Basez-vous sur les symptômes, analyses, contexte épidémiologique local et historique du patient
-
-2. Pour chaque diagnostic, suggérez 5 à 10 médicaments appropriés disponibles en Côte d'Ivoire:
-   - Utilisez les noms génériques ET commerciaux si pertinent
-   - Indiquez la posologie précise et la durée du traitement
-   - Estimez le coût en Francs CFA (FCFA) basé sur les prix pharmaceutiques ivoiriens
-   - Privilégiez les médicaments génériques quand c'est possible
-   - Incluez différentes catégories: antipyrétiques, analgésiques, antibiotiques si nécessaire, antipaludiques si pertinent, etc.
-
-3. Tenez compte:
-   - Des interactions possibles avec l'historique médical
-   - De l'âge et du genre du patient
-   - Du contexte local (médicaments disponibles en pharmacie ivoirienne)
-   - De la saison (risques accrus pendant la saison des pluies)
-
-Retournez votre réponse au format JSON structuré selon le schéma fourni.
 """
+        prompt_accounting.record_prompt(MEDICAL_PROMPT, prompt)
         return prompt
 
+    def build_contents(self, prompt, analyses, images=None):
+        """
+        Prépare le contenu envoyé à Gemini : le prompt texte suivi des images d'analyses.
+        `images` est le résultat de prepare_images ; sans lui, les photos sont traitées ici.
+        """
+        contents = [prompt]
+
+        # Ajouter les images des analyses si disponibles
+        if analyses:
+            from google.genai import types
+            for analysis in analyses:
+                if hasattr(analysis, 'photo') and analysis.photo:
+                    try:
+                        # Décodage, type MIME réel et réduction de taille ; mis en cache par contenu
+                        image = self._image(analysis.photo, images)
+
+                        # Ajouter l'image au contenu
+                        contents.append(types.Part.from_bytes(data=image.data, mime_type=image.mime_type))
+
+                        # Ajouter un contexte pour l'image
+                        contents.append(f"\n[Image de l'analyse: {analysis.name}]\n")
+                    except Exception as img_error:
+                        print(f"Erreur traitement image pour {analysis.name}: {str(img_error)}")
+
+        return contents
+
+    def build_config(self):
+        from google.genai import types
+        return types.GenerateContentConfig(
+            response_mime_type='application/json',
+            response_schema=GeminiDiagnosticResponse,
+            **self.sampling,
+            **MEDICAL_PROMPT.config_kwargs(self.model)
+        )
+
+    def cache_key(self, symptoms, analyses, history, recent_diseases, patient_info=None, images=None):
+        """
+        Clé du cache de réponses : entrées normalisées du prompt + modèle + échantillonnage.
+        L'ordre de saisie des symptômes, analyses et antécédents n'influe pas sur la clé.
+        """
+        def selected_details(details):
+            return sorted(
+                [normalize_name(d.name), normalize_name(d.selected)]
+                for d in (details or []) if getattr(d, 'selected', None)
+            )
+
+        inputs = {
+            "season": self._get_current_season(),
+            "age": patient_info.get('age') if patient_info else None,
+            "gender": normalize_name(patient_info.get('gender')) if patient_info else None,
+            "symptoms": sorted(
+                [normalize_name(s.name), selected_details(s.details)] for s in (symptoms or [])
+            ),
+            "analyses": sorted(
+                [
+                    normalize_name(a.name),
+                    normalize_name(a.result),
+                    normalize_name(a.unit),
+                    self._photo_digest(a.photo, images) if a.photo else None
+                ]
+                for a in (analyses or [])
+            ),
+            "history": sorted(
+                [normalize_name(h.name), selected_details(h.details)] for h in (history or [])
+            ),
+            "recent_diseases": sorted(
+                [normalize_name(d.name), d.date] for d in (recent_diseases or [])
+            ),
+        }
+        return response_cache.make_key('diagnostic', self.model, {**self.sampling, 'prompt': MEDICAL_PROMPT.version}, inputs)
+
+    async def prepare_images(self, analyses, sources=None):
+        """
+        Pré-traite en parallèle (pool de processus) les photos d'analyses, avant le calcul
+        de la clé de cache et du contenu. Retourne {photo: ProcessedImage ou exception},
+        à passer à cache_key et build_contents : aucune image n'est alors traitée sur la
+        boucle d'événements. Les erreurs sont signalées par build_contents.
+        `sources` (une empreinte source_digest par analyse, None sans photo) évite de
+        hacher une seconde fois des photos dont l'appelant a déjà l'empreinte.
+        """
+        analyses = analyses or []
+        sources = sources or [None] * len(analyses)
+        pending = [(a.photo, source) for a, source in zip(analyses, sources) if getattr(a, 'photo', None)]
+        if not pending:
+            return {}
+        results = await asyncio.gather(
+            *(image_pipeline.process_async(photo, source) for photo, source in pending), return_exceptions=True
+        )
+        return {photo: result for (photo, _), result in zip(pending, results)}
+
+    def _image(self, photo, images=None):
+        if images is None:
+            return image_pipeline.process(photo)
+        image = images.get(photo)
+        if isinstance(image, Exception):
+            raise image
+        if image is None:
+            raise ValueError("Image non préparée")
+        return image
+
+    def _photo_digest(self, photo, images=None):
+        # Empreinte du contenu de l'image : base64 et référence "sha256:" donnent la même clé
+        try:
+            return self._image(photo, images).digest
+        except Exception:
+            return source_digest(photo)
+
     def predict_with_gemini(self, symptoms, analyses, history, recent_diseases, patient_info=None):
         try:
+            key = self.cache_key(symptoms, analyses, history, recent_diseases, patient_info)
+            cached = response_cache.get('diagnostic', key, GeminiDiagnosticResponse)
+            if cached is not None:
+                return cached
+
             prompt = self.build_medical_prompt(
                 symptoms, analyses, history, recent_diseases, patient_info
             )
 
             # Préparer le contenu : texte + images si présentes
-            contents = [prompt]
-
-            # Ajouter les images des analyses si disponibles
-            if analyses:
-                for analysis in analyses:
-                    if hasattr(analysis, 'photo') and analysis.photo:
-                        try:
-                            # Extraire les données de l'image base64
-                            if ',' in analysis.photo:
-                                # Format: data:image/jpeg;base64,<données>
-                                image_data = analysis.photo.split(',')[1]
-                            else:
-                                image_data = analysis.photo
-
-                            # Ajouter l'image au contenu
-                            contents.append({
-                                "mime_type": "image/jpeg",
-                                "data": base64.b64decode(image_data)
-                            })
-
-                            # Ajouter un contexte pour l'image
-                            contents.append(f"\n[Image de l'analyse: {analysis.name}]\n")
-                        except Exception as img_error:
-                            print(f"Erreur traitement image pour {analysis.name}: {str(img_error)}")
-
-            response = self.client.models.generate_content(
-                model=self.model,
-                contents=contents,
-                config=types.GenerateContentConfig(
-                    response_mime_type='application/json',
-                    response_schema=GeminiDiagnosticResponse,
-                    temperature=0.3,
-                    top_p=0.8,
-                    top_k=40,
-                )
+            contents = self.build_contents(prompt, analyses)
+
+            response = generate_content(
+                self.client, self.model, contents, self.build_config(),
+                endpoint=MEDICAL_PROMPT.name
             )
 
-            result = response.parsed
+            prompt_accounting.record_usage(MEDICAL_PROMPT, response)
+            result = parse_response(response, MEDICAL_PROMPT.name)
+            response_cache.set('diagnostic', key, result)
             return result
 
         except Exception as e:
             raise Exception(f"Gemini API error: {str(e)}")
 
+    async def predict_with_gemini_async(self, symptoms, analyses, history, recent_diseases, patient_info=None, sources=None):
+        """
+        Variante asynchrone de predict_with_gemini : l'appel Gemini passe par le client
+        asynchrone et ne bloque pas la boucle d'événements du serveur. `sources` : voir
+        prepare_images.
+        """
+        try:
+            images = await self.prepare_images(analyses, sources)
+            key = self.cache_key(symptoms, analyses, history, recent_diseases, patient_info, images)
+            cached = await response_cache.get_async('diagnostic', key, GeminiDiagnosticResponse)
+            if cached is not None:
+                return cached
+
+            prompt = self.build_medical_prompt(
+                symptoms, analyses, history, recent_diseases, patient_info
+            )
+            contents = self.build_contents(prompt, analyses, images)
+
+            response = await generate_content_async(
+                self.client, self.model, contents, self.build_config(),
+                endpoint=MEDICAL_PROMPT.name
+            )
+
+            prompt_accounting.record_usage(MEDICAL_PROMPT, response)
+            result = parse_response(response, MEDICAL_PROMPT.name)
+            await response_cache.set_async('diagnostic', key, result)
+            return result
+
+        except Exception as e:
+            raise Exception(f"Gemini API error: {str(e)}")
+
+    async def stream_with_gemini(self, symptoms, analyses, history, recent_diseases, patient_info=None, sources=None):
+        """
+        Variante en streaming : produit ("diagnostic", DiagnosticResult) puis
+        ("medication", MedicationSuggestion) dès que chaque objet JSON est complet,
+        et enfin ("complete", GeminiDiagnosticResponse) avec la réponse entière.
+        """
+        images = await self.prepare_images(analyses, sources)
+        key = self.cache_key(symptoms, analyses, history, recent_diseases, patient_info, images)
+        cached = await response_cache.get_async('diagnostic', key, GeminiDiagnosticResponse)
+        if cached is not None:
+            for diagnostic in cached.diagnostics:
+                yield "diagnostic", diagnostic
+            for medication in cached.medications:
+                yield "medication", medication
+            yield "complete", cached
+            return
+
+        prompt = self.build_medical_prompt(
+            symptoms, analyses, history, recent_diseases, patient_info
+        )
+        contents = self.build_contents(prompt, analyses, images)
+
+        parser = JsonArrayStreamParser()
+        last_chunk = None
+        item_types = {"diagnostics": ("diagnostic", DiagnosticResult), "medications": ("medication", MedicationSuggestion)}
+        try:
+            async for chunk in generate_content_stream_async(
+                self.client, self.model, contents, self.build_config(),
+                endpoint=MEDICAL_PROMPT.name
+            ):
+                last_chunk = chunk
+                if not chunk.text:
+                    continue
+                for array_key, item in parser.feed(chunk.text):
+                    if array_key in item_types:
+                        event, item_type = item_types[array_key]
+                        yield event, item_type.model_validate(item)
+
+            prompt_accounting.record_usage(MEDICAL_PROMPT, last_chunk)
+            result = GeminiDiagnosticResponse.model_validate_json(parser.text)
+        except ValidationError as e:
+            GEMINI_PARSE_FAILURES.inc(endpoint=MEDICAL_PROMPT.name)
+            raise Exception(f"Gemini API error: {str(e)}")
+        except Exception as e:
+            raise Exception(f"Gemini API error: {str(e)}")
+
+        await response_cache.set_async('diagnostic', key, result)
+        yield "complete", result
+
     def _format_symptoms(self, symptoms):
         if not symptoms or len(symptoms) == 0:
             return "Aucun symptôme rapporté"
@@ -0,0 +1,294 @@
+# File: prediction/image_pipeline.py
+import base64
+import binascii
+import hashlib
+import io
+import os
+import threading
+from collections import OrderedDict
+from prediction.gemini_client import load_environment
+from prediction.executors import executors
+from prediction.single_flight import SingleFlight
+
+load_environment()
+
+# Taille des blocs de décodage : multiple de 4 caractères base64 (= 3 octets décodés)
+CHUNK_CHARS = 64 * 1024
+
+# Préfixe des références d'images déjà téléversées (ex. "sha256:<hex>")
+REF_PREFIX = "sha256:"
+
+# Signatures de fichiers (magic bytes) -> type MIME
+_SIGNATURES = [
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+    (b"BM", "image/bmp"),
+    (b"%PDF", "application/pdf"),
+]
+
+class ProcessedImage:
+    """
+    Image prête à être envoyée à Gemini : octets (éventuellement réduits), type MIME
+    réel et empreinte SHA-256 du contenu.
+    """
+
+    __slots__ = ("digest", "mime_type", "data", "width", "height")
+
+    def __init__(self, digest, mime_type, data, width=None, height=None):
+        self.digest = digest
+        self.mime_type = mime_type
+        self.data = data
+        self.width = width
+        self.height = height
+
+    @property
+    def ref(self):
+        return REF_PREFIX + self.digest
+
+def sniff_mime_type(data):
+    """
+    Détermine le type MIME réel à partir des premiers octets du fichier.
+    """
+    head = bytes(data[:16])
+    for signature, mime_type in _SIGNATURES:
+        if head.startswith(signature):
+            return mime_type
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    if head[4:8] == b"ftyp" and head[8:12] in (b"heic", b"heix", b"mif1", b"msf1"):
+        return "image/heic"
+    return "application/octet-stream"
+
+def split_data_url(photo):
+    """
+    Sépare l'en-tête d'une data URL ("data:image/png;base64,") des données base64.
+    Retourne (type MIME déclaré ou None, position du début des données).
+    """
+    if photo.startswith("data:"):
+        comma = photo.find(",", 0, 256)
+        if comma != -1:
+            header = photo[5:comma]
+            return (header.split(";")[0] or None), comma + 1
+    return None, 0
+
+def decode_base64(photo):
+    """
+    Décode une image base64 (ou data URL) par blocs dans un seul tampon, sans créer
+    de copie intermédiaire de la chaîne complète.
+    """
+    _, start = split_data_url(photo)
+    buffer = bytearray()
+    position = start
+    pending = ""
+    length = len(photo)
+    while position < length:
+        chunk = pending + photo[position:position + CHUNK_CHARS]
+        position += CHUNK_CHARS
+        if "\n" in chunk or "\r" in chunk or " " in chunk:
+            chunk = "".join(chunk.split())
+        usable = len(chunk) - (len(chunk) % 4) if position < length else len(chunk)
+        pending = chunk[usable:]
+        buffer += base64.b64decode(chunk[:usable], validate=False)
+    if pending:
+        raise binascii.Error("Incorrect base64 padding")
+    return buffer
+
+def source_digest(photo):
+    """
+    Empreinte de la photo telle que reçue (texte base64 ou référence), calculée par blocs.
+    Sert de clé de cache : une même photo renvoyée n'est décodée qu'une fois.
+    """
+    if photo.startswith(REF_PREFIX):
+        return photo[len(REF_PREFIX):]
+    digest = hashlib.sha256()
+    for position in range(0, len(photo), CHUNK_CHARS):
+        digest.update(photo[position:position + CHUNK_CHARS].encode("ascii", "ignore"))
+    return "src-" + digest.hexdigest()
+
+def downscale_image(data, mime_type, max_dimension, jpeg_quality):
+    """
+    Réduit l'image si son plus grand côté dépasse max_dimension.
+    Sans Pillow, ou pour les formats non gérés (PDF, HEIC), l'image est laissée telle quelle.
+    Retourne (octets, type MIME, largeur, hauteur).
+    """
+    if not mime_type.startswith("image/") or mime_type == "image/heic":
+        return data, mime_type, None, None
+    try:
+        from PIL import Image
+    except ImportError:
+        return data, mime_type, None, None
+
+    with Image.open(io.BytesIO(data)) as image:
+        width, height = image.size
+        if max(width, height) <= max_dimension:
+            return data, mime_type, width, height
+
+        image.draft("RGB", (max_dimension, max_dimension))
+        image.thumbnail((max_dimension, max_dimension))
+        output = io.BytesIO()
+        if image.mode in ("RGBA", "LA", "P"):
+            image.save(output, format="PNG", optimize=True)
+            mime_type = "image/png"
+        else:
+            image.convert("RGB").save(output, format="JPEG", quality=jpeg_quality, optimize=True)
+            mime_type = "image/jpeg"
+        return output.getvalue(), mime_type, image.size[0], image.size[1]
+
+def decode_photo(photo):
+    """
+    Décodage base64 et empreinte du contenu (étape exécutée dans le pool de threads).
+    Retourne (empreinte du contenu, octets).
+    """
+    data = decode_base64(photo)
+    return hashlib.sha256(data).hexdigest(), data
+
+def prepare_image(payload, max_dimension, jpeg_quality):
+    """
+    Étape CPU complète (décodage base64, empreinte, détection du type, réduction), sans
+    état partagé : exécutable dans un processus du pool. `payload` est une chaîne base64
+    (ou data URL) ou des octets. Retourne (empreinte, type MIME, octets, largeur, hauteur).
+    """
+    data = decode_base64(payload) if isinstance(payload, str) else payload
+    digest = hashlib.sha256(data).hexdigest()
+    data, mime_type, width, height = downscale_image(data, sniff_mime_type(data), max_dimension, jpeg_quality)
+    return digest, mime_type, bytes(data), width, height
+
+class ImagePipeline:
+    """
+    Pré-traitement des photos d'analyses avant envoi à Gemini.
+
+    Décodage par blocs, détection du type MIME réel, réduction à une résolution adaptée
+    au modèle (IMAGE_MAX_DIMENSION, Pillow requis) et cache adressé par le contenu :
+    une photo renvoyée entre /diagnostic et /suggest-medications n'est traitée qu'une
+    seule fois. Le cache est borné en octets (IMAGE_CACHE_MAX_BYTES).
+    """
+
+    def __init__(self, max_dimension=1536, jpeg_quality=85, max_cache_bytes=64 * 1024 * 1024):
+        self.max_dimension = max_dimension
+        self.jpeg_quality = jpeg_quality
+        self.max_cache_bytes = max_cache_bytes
+        self._images = OrderedDict()  # empreinte du contenu -> ProcessedImage
+        self._sources = {}            # empreinte de la source -> empreinte du contenu
+        self._aliases = {}            # empreinte du contenu -> empreintes des sources
+        self._cache_bytes = 0
+        self._lock = threading.Lock()
+        # Traitements en cours, par empreinte de source puis de contenu : une même photo
+        # reçue par des requêtes concurrentes n'est décodée et réduite qu'une fois
+        self._flights = SingleFlight("images")
+
+    def get(self, digest):
+        with self._lock:
+            image = self._images.get(digest)
+            if image is not None:
+                self._images.move_to_end(digest)
+            return image
+
+    def _store(self, image, source=None):
+        with self._lock:
+            if image.digest not in self._images:
+                self._images[image.digest] = image
+                self._cache_bytes += len(image.data)
+            self._images.move_to_end(image.digest)
+            if source:
+                previous = self._sources.get(source)
+                if previous is not None and previous != image.digest:
+                    self._aliases.get(previous, set()).discard(source)
+                self._sources[source] = image.digest
+                self._aliases.setdefault(image.digest, set()).add(source)
+            while self._cache_bytes > self.max_cache_bytes and len(self._images) > 1:
+                digest, evicted = self._images.popitem(last=False)
+                self._cache_bytes -= len(evicted.data)
+                for src in self._aliases.pop(digest, ()):
+                    self._sources.pop(src, None)
+        return image
+
+    def put(self, image):
+        """
+        Réinsère une image déjà traitée (ex. rechargée depuis le stockage des consultations).
+        """
+        return self._store(image)
+
+    def process_bytes(self, data, source=None):
+        """
+        Traite des octets bruts (ex. fichier téléversé en multipart).
+        """
+        content_digest = hashlib.sha256(data).hexdigest()
+        cached = self.get(content_digest)
+        if cached is not None:
+            if source:
+                self._store(cached, source)
+            return cached
+
+        mime_type = sniff_mime_type(data)
+        data, mime_type, width, height = self.downscale(data, mime_type)
+        return self._store(ProcessedImage(content_digest, mime_type, bytes(data), width, height), source)
+
+    def process(self, photo):
+        """
+        Traite une photo reçue en base64 / data URL, ou une référence "sha256:<hex>"
+        vers une image déjà téléversée. Lève ValueError si la référence est inconnue.
+        """
+        source = source_digest(photo)
+        image = self._cached_source(photo, source)
+        if image is not None:
+            return image
+        return self.process_bytes(decode_base64(photo), source)
+
+    def _cached_source(self, photo, source):
+        if photo.startswith(REF_PREFIX):
+            image = self.get(source)
+            if image is None:
+                raise ValueError(f"Image inconnue ou expirée : {photo}")
+            return image
+        with self._lock:
+            digest = self._sources.get(source)
+        return self.get(digest) if digest is not None else None
+
+    async def process_async(self, photo, source=None):
+        """
+        Équivalent de process() sans travail sur la boucle d'événements : empreinte et
+        décodage base64 dans le pool de threads, puis réduction dans le pool de
+        processus. Seuls les octets décodés (3/4 du texte base64) sont transmis au
+        processus, pas la chaîne reçue. Les traitements concurrents d'une même photo
+        (même source ou même contenu) sont partagés. `source` est l'empreinte de la
+        photo (source_digest) quand l'appelant l'a déjà calculée.
+        """
+        if source is None:
+            source = await executors.run_io(source_digest, photo, task="image")
+        image = self._cached_source(photo, source)
+        if image is not None:
+            return image
+        return await self._flights.do(source, lambda: self._process_source(photo, source))
+
+    async def _process_source(self, photo, source):
+        digest, data = await executors.run_io(decode_photo, photo, task="image")
+        return await self._process_content(digest, data, source)
+
+    async def _process_content(self, digest, data, source=None):
+        cached = self.get(digest)
+        if cached is None:
+            cached = await self._flights.do(digest, lambda: self._prepare(data))
+        return self._store(cached, source) if source else cached
+
+    async def _prepare(self, data):
+        result = await executors.run_cpu(
+            prepare_image, data, self.max_dimension, self.jpeg_quality, task="image"
+        )
+        return self._store(ProcessedImage(*result))
+
+    async def process_bytes_async(self, data, source=None):
+        """
+        Équivalent de process_bytes() exécuté dans le pool de processus.
+        """
+        return await self._process_content(hashlib.sha256(data).hexdigest(), bytes(data), source)
+
+    def downscale(self, data, mime_type):
+        return downscale_image(data, mime_type, self.max_dimension, self.jpeg_quality)
+
+image_pipeline = ImagePipeline(
+    max_dimension=int(os.getenv('IMAGE_MAX_DIMENSION', 1536)),
+    jpeg_quality=int(os.getenv('IMAGE_JPEG_QUALITY', 85)),
+    max_cache_bytes=int(os.getenv('IMAGE_CACHE_MAX_BYTES', 64 * 1024 * 1024))
+)
@@ -0,0 +1,351 @@
+# File: prediction/interaction_rules.py
+import re
+from functools import lru_cache
+from itertools import combinations
+from prediction.normalization import fold_text
+
+# Classes pharmacologiques reconnues, par nom de molécule (forme normalisée sans accents).
+DRUG_CLASSES = {
+    # AINS
+    "ibuprofene": {"ains"},
+    "diclofenac": {"ains"},
+    "ketoprofene": {"ains"},
+    "naproxene": {"ains"},
+    "piroxicam": {"ains"},
+    "meloxicam": {"ains"},
+    "indometacine": {"ains"},
+    "aspirine": {"ains", "antiagregant"},
+    "acide acetylsalicylique": {"ains", "antiagregant"},
+    "clopidogrel": {"antiagregant"},
+    # Anticoagulants
+    "warfarine": {"anticoagulant"},
+    "acenocoumarol": {"anticoagulant"},
+    "fluindione": {"anticoagulant"},
+    "heparine": {"anticoagulant"},
+    "enoxaparine": {"anticoagulant"},
+    "rivaroxaban": {"anticoagulant"},
+    "apixaban": {"anticoagulant"},
+    # Antibiotiques
+    "amoxicilline": {"antibiotique"},
+    "ampicilline": {"antibiotique"},
+    "ceftriaxone": {"antibiotique"},
+    "cefixime": {"antibiotique"},
+    "cotrimoxazole": {"antibiotique"},
+    "metronidazole": {"antibiotique"},
+    "erythromycine": {"antibiotique", "macrolide"},
+    "azithromycine": {"antibiotique", "macrolide"},
+    "clarithromycine": {"antibiotique", "macrolide"},
+    "doxycycline": {"antibiotique", "cycline"},
+    "ciprofloxacine": {"antibiotique", "quinolone"},
+    "ofloxacine": {"antibiotique", "quinolone"},
+    "levofloxacine": {"antibiotique", "quinolone"},
+    "norfloxacine": {"antibiotique", "quinolone"},
+    "moxifloxacine": {"antibiotique", "quinolone"},
+    # Fer et antiacides
+    "fer": {"fer"},
+    "sulfate ferreux": {"fer"},
+    "fumarate ferreux": {"fer"},
+    "hydroxyde d'aluminium": {"antiacide"},
+    "hydroxyde de magnesium": {"antiacide"},
+    "carbonate de calcium": {"antiacide"},
+    # Paracétamol et hépatotoxiques
+    "paracetamol": {"paracetamol"},
+    "isoniazide": {"hepatotoxique"},
+    "rifampicine": {"hepatotoxique"},
+    "ketoconazole": {"hepatotoxique"},
+    "methotrexate": {"hepatotoxique"},
+    # Antipaludiques
+    "artemether": {"antipaludique"},
+    "lumefantrine": {"antipaludique"},
+    "artesunate": {"antipaludique"},
+    "amodiaquine": {"antipaludique"},
+    "quinine": {"antipaludique", "quinine"},
+    "mefloquine": {"antipaludique", "mefloquine"},
+    # Corticoïdes
+    "prednisolone": {"corticoide"},
+    "prednisone": {"corticoide"},
+    "dexamethasone": {"corticoide"},
+    "hydrocortisone": {"corticoide"},
+    "betamethasone": {"corticoide"},
+    # IEC
+    "captopril": {"iec"},
+    "enalapril": {"iec"},
+    "lisinopril": {"iec"},
+    "ramipril": {"iec"},
+    # Divers sans interaction majeure référencée
+    "metoclopramide": {"antiemetique"},
+    "multivitamines": {"complement"},
+    "vitamine c": {"complement"},
+    "sro": {"rehydratation"},
+    "sels de rehydratation orale": {"rehydratation"},
+}
+
+# Dénominations internationales (DCI anglaises) et spécialités courantes.
+DRUG_ALIASES = {
+    "ibuprofen": "ibuprofene",
+    "ketoprofen": "ketoprofene",
+    "naproxen": "naproxene",
+    "indomethacin": "indometacine",
+    "aspirin": "aspirine",
+    "acetylsalicylic acid": "acide acetylsalicylique",
+    "warfarin": "warfarine",
+    "heparin": "heparine",
+    "enoxaparin": "enoxaparine",
+    "lovenox": "enoxaparine",
+    "amoxicillin": "amoxicilline",
+    "ampicillin": "ampicilline",
+    "co-trimoxazole": "cotrimoxazole",
+    "bactrim": "cotrimoxazole",
+    "erythromycin": "erythromycine",
+    "azithromycin": "azithromycine",
+    "clarithromycin": "clarithromycine",
+    "ciprofloxacin": "ciprofloxacine",
+    "ofloxacin": "ofloxacine",
+    "levofloxacin": "levofloxacine",
+    "norfloxacin": "norfloxacine",
+    "moxifloxacin": "moxifloxacine",
+    "iron": "fer",
+    "ferrous sulfate": "sulfate ferreux",
+    "ferrous sulphate": "sulfate ferreux",
+    "ferrous fumarate": "fumarate ferreux",
+    "aluminium hydroxide": "hydroxyde d'aluminium",
+    "aluminum hydroxide": "hydroxyde d'aluminium",
+    "magnesium hydroxide": "hydroxyde de magnesium",
+    "calcium carbonate": "carbonate de calcium",
+    "maalox": "hydroxyde d'aluminium",
+    "gaviscon": "carbonate de calcium",
+    "acetaminophen": "paracetamol",
+    "doliprane": "paracetamol",
+    "efferalgan": "paracetamol",
+    "isoniazid": "isoniazide",
+    "rifampin": "rifampicine",
+    "rifampicin": "rifampicine",
+    "coartem": "artemether",
+    "mefloquin": "mefloquine",
+}
+
+# Classes déduites de la catégorie déclarée du médicament, quand le nom est inconnu.
+CATEGORY_CLASSES = {
+    "anti-inflammatoire": {"ains"},
+    "ains": {"ains"},
+    "anticoagulant": {"anticoagulant"},
+    "antibiotique": {"antibiotique"},
+    "antipaludique": {"antipaludique"},
+    "corticoide": {"corticoide"},
+    "antiacide": {"antiacide"},
+    "complement": {"complement"},
+    "supplement": {"complement"},
+}
+
+# Règles d'interaction : (classe A, classe B, gravité, raison, recommandation).
+# Une règle A == B signale une redondance entre deux médicaments de la même classe.
+INTERACTION_RULES = [
+    ("ains", "anticoagulant", "high",
+     "L'association d'un AINS et d'un anticoagulant augmente fortement le risque hémorragique.",
+     "Éviter l'association ; préférer le paracétamol comme antalgique."),
+    ("antiagregant", "anticoagulant", "high",
+     "L'association d'un antiagrégant plaquettaire et d'un anticoagulant majore le risque hémorragique.",
+     "Réévaluer l'indication ; surveillance clinique et biologique étroite si maintenue."),
+    ("antibiotique", "anticoagulant", "medium",
+     "Certains antibiotiques potentialisent l'effet des anticoagulants (risque de surdosage).",
+     "Surveiller l'INR pendant et après l'antibiothérapie."),
+    ("fer", "quinolone", "medium",
+     "Le fer réduit l'absorption digestive des quinolones.",
+     "Espacer les prises d'au moins 2 heures."),
+    ("antiacide", "quinolone", "medium",
+     "Les antiacides réduisent l'absorption digestive des quinolones.",
+     "Espacer les prises d'au moins 2 heures."),
+    ("antiacide", "fer", "low",
+     "Les antiacides diminuent l'absorption du fer.",
+     "Espacer les prises d'au moins 2 heures."),
+    ("antiacide", "cycline", "medium",
+     "Les antiacides réduisent l'absorption des cyclines.",
+     "Espacer les prises d'au moins 2 heures."),
+    ("fer", "cycline", "medium",
+     "Le fer réduit l'absorption des cyclines.",
+     "Espacer les prises d'au moins 2 heures."),
+    ("paracetamol", "hepatotoxique", "high",
+     "Le paracétamol associé à un médicament hépatotoxique expose à une toxicité hépatique, surtout au-delà de 4 g/j.",
+     "Limiter le paracétamol à 3 g/j et surveiller les transaminases."),
+    ("paracetamol", "paracetamol", "medium",
+     "Plusieurs spécialités contenant du paracétamol exposent à un surdosage.",
+     "Ne garder qu'une seule spécialité ; ne pas dépasser 4 g/j au total."),
+    ("ains", "ains", "medium",
+     "L'association de deux AINS n'augmente pas l'efficacité mais majore le risque digestif et rénal.",
+     "Ne prescrire qu'un seul AINS."),
+    ("ains", "corticoide", "medium",
+     "L'association AINS + corticoïde augmente le risque d'ulcère et d'hémorragie digestive.",
+     "Associer un protecteur gastrique ou éviter l'AINS."),
+    ("ains", "iec", "medium",
+     "Les AINS diminuent l'effet antihypertenseur des IEC et exposent à une insuffisance rénale aiguë.",
+     "Surveiller la fonction rénale et la pression artérielle."),
+    ("quinolone", "corticoide", "medium",
+     "L'association quinolone + corticoïde augmente le risque de tendinopathie et de rupture tendineuse.",
+     "Informer le patient ; arrêter en cas de douleur tendineuse."),
+    ("quinine", "mefloquine", "high",
+     "L'association quinine + méfloquine expose à des troubles du rythme cardiaque et à des convulsions.",
+     "Ne pas associer ; respecter un délai après la quinine."),
+    ("macrolide", "quinolone", "medium",
+     "Macrolides et quinolones allongent tous deux l'intervalle QT.",
+     "Éviter l'association ou surveiller l'ECG."),
+]
+
+# Contre-indications liées au profil patient : (classe, condition, gravité, raison, recommandation).
+PATIENT_RULES = [
+    ("antiagregant", "age_under_16", "high",
+     "L'aspirine est contre-indiquée chez l'enfant et l'adolescent (risque de syndrome de Reye).",
+     "Utiliser le paracétamol."),
+    ("quinolone", "age_under_16", "medium",
+     "Les quinolones sont déconseillées chez l'enfant (toxicité cartilagineuse).",
+     "Préférer une autre classe d'antibiotiques."),
+    ("ains", "history:ulcere", "high",
+     "Les AINS sont contre-indiqués en cas d'antécédent d'ulcère gastro-duodénal.",
+     "Préférer le paracétamol."),
+    ("ains", "history:insuffisance renale", "high",
+     "Les AINS aggravent l'insuffisance rénale.",
+     "Préférer le paracétamol."),
+    ("ains", "history:grossesse", "high",
+     "Les AINS sont contre-indiqués pendant la grossesse, en particulier au 3e trimestre.",
+     "Préférer le paracétamol."),
+    ("quinolone", "history:grossesse", "medium",
+     "Les quinolones sont déconseillées pendant la grossesse.",
+     "Préférer une autre classe d'antibiotiques."),
+]
+
+_TOKEN_SPLIT = re.compile(r"[^a-z0-9']+")
+
+class InteractionEngine:
+    """
+    Moteur local et déterministe d'interactions médicamenteuses.
+
+    Les médicaments sont rattachés à des classes pharmacologiques via un index par nom
+    normalisé (puis par catégorie). Les règles sont indexées par paire de classes :
+    l'examen d'une paire est une suite de recherches dans un dict. Une paire est
+    « connue » lorsqu'une règle s'applique ou que les deux médicaments sont reconnus
+    par leur nom : une classe déduite de la seule catégorie ne suffit pas à déclarer
+    une paire sans interaction, elle est alors laissée à Gemini.
+    """
+
+    def __init__(self, drug_classes=DRUG_CLASSES, category_classes=CATEGORY_CLASSES,
+                 rules=INTERACTION_RULES, patient_rules=PATIENT_RULES, aliases=DRUG_ALIASES):
+        self.name_index = {fold_text(name): frozenset(classes) for name, classes in drug_classes.items()}
+        for alias, name in aliases.items():
+            self.name_index[fold_text(alias)] = self.name_index[fold_text(name)]
+        self.max_name_words = max(len(name.split()) for name in self.name_index)
+        self.category_index = {fold_text(cat): frozenset(classes) for cat, classes in category_classes.items()}
+        self.rule_index = {}
+        for class_a, class_b, severity, reason, recommendation in rules:
+            self.rule_index[frozenset((class_a, class_b))] = (severity, reason, recommendation)
+        self.patient_rules = patient_rules
+
+    @lru_cache(maxsize=4096)
+    def classify_name(self, name):
+        """
+        Classes d'un médicament reconnu par son nom dans l'index (frozenset vide sinon).
+        Le nom est découpé en mots et chaque n-gramme est cherché dans l'index.
+        """
+        classes = set()
+        words = [w for w in _TOKEN_SPLIT.split(fold_text(name)) if w]
+        for size in range(1, self.max_name_words + 1):
+            for start in range(len(words) - size + 1):
+                found = self.name_index.get(" ".join(words[start:start + size]))
+                if found:
+                    classes |= found
+        return frozenset(classes)
+
+    @lru_cache(maxsize=4096)
+    def classify(self, name, category=""):
+        """
+        Classes pharmacologiques d'un médicament : par son nom, sinon déduites de sa
+        catégorie (frozenset vide si inconnu).
+        """
+        classes = set(self.classify_name(name))
+        if not classes and category:
+            folded = fold_text(category)
+            for part in re.split(r"[/,;]", folded):
+                found = self.category_index.get(part.strip())
+                if found:
+                    classes |= found
+        return frozenset(classes)
+
+    def check_pair(self, classes_a, classes_b):
+        """
+        Règles applicables à une paire de médicaments déjà classés.
+        """
+        matches = []
+        for class_a in classes_a:
+            for class_b in classes_b:
+                rule = self.rule_index.get(frozenset((class_a, class_b)))
+                if rule and rule not in matches:
+                    matches.append(rule)
+        return matches
+
+    def evaluate(self, medications, patient_info=None, pairs=None):
+        """
+        Évalue localement les paires de médicaments (toutes, ou seulement `pairs`).
+
+        Retourne (warnings, unknown_pairs) : les avertissements des paires connues et
+        la liste des paires (id, id) qu'il faut soumettre à Gemini.
+        """
+        by_id = {med['id']: med for med in medications}
+        classes = {
+            med['id']: self.classify(med.get('name', ''), med.get('category', '') or '')
+            for med in medications
+        }
+        named = {med['id'] for med in medications if self.classify_name(med.get('name', ''))}
+
+        if pairs is None:
+            pairs = combinations([med['id'] for med in medications], 2)
+
+        warnings = []
+        unknown_pairs = []
+        for id_a, id_b in pairs:
+            matches = self.check_pair(classes[id_a], classes[id_b])
+            if not matches and (id_a not in named or id_b not in named):
+                unknown_pairs.append((id_a, id_b))
+                continue
+            for severity, reason, recommendation in matches:
+                warnings.append({
+                    "medication_ids": [id_a, id_b],
+                    "medication_names": [by_id[id_a]['name'], by_id[id_b]['name']],
+                    "severity": severity,
+                    "reason": reason,
+                    "recommendation": recommendation,
+                })
+        return warnings, unknown_pairs
+
+    def evaluate_patient(self, medications, patient_info):
+        """
+        Contre-indications liées au profil du patient (âge, antécédents).
+        """
+        if not patient_info:
+            return []
+
+        conditions = set()
+        age = patient_info.get('age')
+        try:
+            if age is not None and float(age) < 16:
+                conditions.add("age_under_16")
+        except (TypeError, ValueError):
+            pass
+        for item in patient_info.get('medicalHistory', []) or []:
+            name = fold_text(item.get('name', '') if isinstance(item, dict) else getattr(item, 'name', item))
+            for _, condition, _, _, _ in self.patient_rules:
+                if condition.startswith("history:") and condition[len("history:"):] in name:
+                    conditions.add(condition)
+
+        warnings = []
+        for med in medications:
+            med_classes = self.classify(med.get('name', ''), med.get('category', '') or '')
+            for drug_class, condition, severity, reason, recommendation in self.patient_rules:
+                if drug_class in med_classes and condition in conditions:
+                    warnings.append({
+                        "medication_ids": [med['id']],
+                        "medication_names": [med['name']],
+                        "severity": severity,
+                        "reason": reason,
+                        "recommendation": recommendation,
+                    })
+        return warnings
+
+interaction_engine = InteractionEngine()
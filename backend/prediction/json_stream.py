@@ -0,0 +1,65 @@
+# File: prediction/json_stream.py
+import json
+
+class JsonArrayStreamParser:
+    """
+    Analyse incrémentale d'un objet JSON reçu par morceaux, de la forme
+    {"cle": [{...}, {...}], "autre_cle": [{...}]}.
+
+    Chaque objet d'un tableau de premier niveau est renvoyé dès que son accolade
+    fermante est reçue, sans attendre la fin du document.
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self.position = 0
+        self.stack = []
+        self.in_string = False
+        self.escape = False
+        self.string_start = None
+        self.last_key = None
+        self.array_key = None
+        self.item_start = None
+
+    def feed(self, chunk):
+        """
+        Ajoute un morceau de texte et retourne la liste des (clé du tableau, objet) complétés.
+        """
+        self.buffer += chunk
+        completed = []
+        buffer = self.buffer
+        for i in range(self.position, len(buffer)):
+            char = buffer[i]
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif char == '\\':
+                    self.escape = True
+                elif char == '"':
+                    self.in_string = False
+                    if len(self.stack) == 1:
+                        # Chaîne au premier niveau de l'objet racine : clé candidate
+                        self.last_key = json.loads(buffer[self.string_start:i + 1])
+                continue
+
+            if char == '"':
+                self.in_string = True
+                self.string_start = i
+            elif char in '{[':
+                self.stack.append(char)
+                if len(self.stack) == 2 and char == '[':
+                    self.array_key = self.last_key
+                elif len(self.stack) == 3 and char == '{' and self.stack[1] == '[':
+                    self.item_start = i
+            elif char in '}]':
+                if len(self.stack) == 3 and char == '}' and self.item_start is not None:
+                    completed.append((self.array_key, json.loads(buffer[self.item_start:i + 1])))
+                    self.item_start = None
+                if self.stack:
+                    self.stack.pop()
+        self.position = len(buffer)
+        return completed
+
+    @property
+    def text(self):
+        return self.buffer
@@ -0,0 +1,172 @@
+# File: prediction/medication_catalog.py
+import json
+import os
+from prediction.gemini_client import load_environment
+from prediction.normalization import fold_text, alias_key, symptom_aliases, analysis_aliases
+
+load_environment()
+
+DEFAULT_FORMULARY_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'formulary.json')
+
+# Score minimal (coefficient de Dice sur les trigrammes) d'un résultat approché
+FUZZY_THRESHOLD = 0.3
+
+def trigrams(text):
+    """
+    Trigrammes d'un texte déjà normalisé, bornés par des espaces ("  pa", " par", ...).
+    """
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+class MedicationCatalog:
+    """
+    Formulaire des médicaments génériques disponibles en Côte d'Ivoire (prix en FCFA).
+
+    Chargé une fois depuis un fichier JSON (MEDICATION_FORMULARY_PATH), puis indexé en
+    mémoire :
+    - index inversé symptôme -> [(médicament, poids)] et prédicats d'analyses, pour les
+      suggestions ;
+    - index des préfixes des mots (nom, marques, catégorie) et index de trigrammes, pour
+      la recherche approchée insensible aux accents (saisie semi-automatique).
+    """
+
+    def __init__(self, path=DEFAULT_FORMULARY_PATH):
+        self.path = path
+        with open(path, encoding='utf-8') as f:
+            formulary = json.load(f)
+        self.version = formulary.get("version")
+        self.medications = {}
+        self.symptom_index = {}    # identifiant de symptôme -> [(id, poids)]
+        self.analysis_index = {}   # identifiant d'analyse -> [(prédicat, id)]
+        self.contains_rules = []   # (fragment, identifiants d'analyses, prédicat, id)
+        self.prefix_index = {}     # préfixe d'un mot -> {id}
+        self.trigram_index = {}    # trigramme -> {id}
+        self.search_names = {}     # id -> [libellés normalisés (nom, marques)]
+        self.label_grams = {}      # id -> [trigrammes de chaque libellé]
+
+        for medication in formulary["medications"]:
+            self._add(medication)
+
+    def _add(self, medication):
+        medication_id = medication["id"]
+        self.medications[medication_id] = medication
+
+        for symptom, weight in medication.get("symptoms", {}).items():
+            self.symptom_index.setdefault(symptom_aliases.register(symptom), []).append((medication_id, weight))
+        for predicate in medication.get("analyses", []):
+            if predicate.get("match") == "contains":
+                fragment = alias_key(predicate["name"])
+                self.contains_rules.append((fragment, analysis_aliases.ids_containing(fragment), predicate, medication_id))
+            else:
+                analysis_id = analysis_aliases.register(predicate["name"])
+                self.analysis_index.setdefault(analysis_id, []).append((predicate, medication_id))
+
+        labels = [fold_text(medication["name"])] + [fold_text(brand) for brand in medication.get("brands", [])]
+        self.search_names[medication_id] = labels
+        for text in labels + [fold_text(medication["category"])]:
+            for word in text.replace("-", " ").replace("/", " ").split():
+                for end in range(1, len(word) + 1):
+                    self.prefix_index.setdefault(word[:end], set()).add(medication_id)
+        self.label_grams[medication_id] = [trigrams(label) for label in labels]
+        for grams in self.label_grams[medication_id]:
+            for gram in grams:
+                self.trigram_index.setdefault(gram, set()).add(medication_id)
+
+    def as_item(self, medication_id):
+        medication = self.medications[medication_id]
+        return {
+            "id": medication_id,
+            "name": medication["name"],
+            "indication": medication["indication"],
+            "dosage": medication["dosage"],
+            "category": medication["category"],
+            "cost": medication["price"],
+        }
+
+    @staticmethod
+    def _analysis_matches(predicate, analysis):
+        if predicate.get("resultType") and getattr(analysis, 'resultType', None) != predicate["resultType"]:
+            return False
+        if predicate.get("positive"):
+            return fold_text(analysis.result) in ("positif", "true")
+        if predicate.get("belowThreshold"):
+            threshold = getattr(analysis, 'threshold', None)
+            try:
+                return threshold is not None and float(analysis.result) < threshold
+            except (TypeError, ValueError):
+                return False
+        return False
+
+    def suggest(self, symptoms, analyses, limit=None):
+        """
+        Médicaments indiqués pour les symptômes et analyses du patient, classés par
+        pertinence (somme des poids) puis par prix croissant. Sans `limit`, tous les
+        médicaments indiqués sont retournés.
+        """
+        scores = {}
+        for symptom_id in symptom_aliases.resolve_all(symptoms):
+            for medication_id, weight in self.symptom_index.get(symptom_id, ()):
+                scores[medication_id] = scores.get(medication_id, 0) + weight
+
+        analyses = [analysis for analysis in analyses if hasattr(analysis, 'name')]
+        for analysis, analysis_id in zip(analyses, analysis_aliases.resolve_all(analyses)):
+            rules = list(self.analysis_index.get(analysis_id, ()))
+            key = alias_key(analysis.name)
+            rules.extend(
+                (predicate, medication_id) for fragment, ids, predicate, medication_id in self.contains_rules
+                if analysis_id in ids or fragment in key
+            )
+            for predicate, medication_id in rules:
+                if self._analysis_matches(predicate, analysis):
+                    scores[medication_id] = scores.get(medication_id, 0) + predicate.get("points", 1)
+
+        ranked = sorted(scores, key=lambda i: (-scores[i], self.medications[i]["price"], i))
+        return [self.as_item(medication_id) for medication_id in ranked[:limit]]
+
+    def search(self, query, limit=10):
+        """
+        Recherche par nom, marque ou catégorie, insensible aux accents et à la casse.
+        Classement : nom exact, début du nom, début d'un mot, puis correspondance
+        approchée (fautes de frappe) par similarité de trigrammes.
+        """
+        text = fold_text(query)
+        if not text:
+            return []
+        words = text.replace("-", " ").replace("/", " ").split()
+
+        scores = {}
+        # Tous les mots de la requête doivent préfixer un mot du médicament
+        candidates = None
+        for word in words:
+            matches = self.prefix_index.get(word, set())
+            candidates = set(matches) if candidates is None else candidates & matches
+        for medication_id in candidates or ():
+            labels = self.search_names[medication_id]
+            if text in labels:
+                scores[medication_id] = 1.0
+            elif any(label.startswith(text) for label in labels):
+                scores[medication_id] = 0.9
+            else:
+                scores[medication_id] = 0.8
+
+        if len(scores) < limit:
+            query_grams = trigrams(text)
+            candidates = set()
+            for gram in query_grams:
+                candidates.update(self.trigram_index.get(gram, ()))
+            for medication_id in candidates - scores.keys():
+                best = max(
+                    2 * len(query_grams & grams) / (len(query_grams) + len(grams))
+                    for grams in self.label_grams[medication_id]
+                )
+                if best >= FUZZY_THRESHOLD:
+                    scores[medication_id] = 0.7 * best
+
+        ranked = sorted(scores, key=lambda i: (-scores[i], self.medications[i]["name"]))
+        return [
+            {**self.as_item(medication_id), "brands": self.medications[medication_id].get("brands", []),
+             "score": round(scores[medication_id], 3)}
+            for medication_id in ranked[:limit]
+        ]
+
+medication_catalog = MedicationCatalog(os.getenv('MEDICATION_FORMULARY_PATH', DEFAULT_FORMULARY_PATH))
@@ -0,0 +1,268 @@
+# File: prediction/metrics.py
+import bisect
+import threading
+import time
+
+# Bornes des histogrammes (secondes, octets)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+def _format_labels(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _format_value(value):
+    if value == float('inf'):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+class Counter:
+    """
+    Compteur monotone, une série par combinaison de labels.
+    """
+
+    kind = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+        return self._values.get(key, 0)
+
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        return [(self.name, _format_labels(self.labelnames, key), value) for key, value in items]
+
+class Histogram:
+    """
+    Histogramme cumulatif au format Prometheus (_bucket, _sum, _count).
+    Une observation coûte une recherche dichotomique et un incrément sous verrou.
+    """
+
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # labels -> [compteurs par borne (+Inf inclus), somme, nombre]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def time(self, **labels):
+        return _Timer(self, labels)
+
+    def count(self, **labels):
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+        series = self._series.get(key)
+        return series[2] if series else 0
+
+    def samples(self):
+        with self._lock:
+            items = [(key, list(series[0]), series[1], series[2]) for key, series in self._series.items()]
+        samples = []
+        for key, counts, total, count in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.labelnames, key, f'le="{_format_value(bound)}"')
+                samples.append((self.name + "_bucket", labels, cumulative))
+            labels = _format_labels(self.labelnames, key)
+            samples.append((self.name + "_sum", labels, total))
+            samples.append((self.name + "_count", labels, count))
+        return samples
+
+class _Timer:
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.perf_counter() - self.start, **self.labels)
+
+class CallbackMetric:
+    """
+    Métrique dont les valeurs sont lues au moment de l'export (ex. statistiques des caches).
+    `callback` retourne un dict {tuple de valeurs des labels: valeur}.
+    """
+
+    def __init__(self, name, documentation, labelnames, callback, kind="gauge"):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.callback = callback
+        self.kind = kind
+
+    def samples(self):
+        try:
+            values = self.callback()
+        except Exception as e:
+            print(f"Metrics collector {self.name} failed: {str(e)}")
+            return []
+        return [(self.name, _format_labels(self.labelnames, key), value) for key, value in values.items()]
+
+class MetricsRegistry:
+    """
+    Registre des métriques du processus, exporté au format texte Prometheus sur /metrics.
+    """
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def collector(self, name, documentation, labelnames, callback, kind="gauge"):
+        return self._register(CallbackMetric(name, documentation, labelnames, callback, kind))
+
+    def render(self):
+        lines = []
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{labels} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+registry = MetricsRegistry()
+
+HTTP_REQUEST_DURATION = registry.histogram(
+    "esante_http_request_duration_seconds",
+    "Durée de traitement des requêtes HTTP (flux complets inclus)",
+    ("method", "route", "status")
+)
+HTTP_REQUEST_SIZE = registry.histogram(
+    "esante_http_request_size_bytes",
+    "Taille des corps de requête reçus",
+    ("method", "route"),
+    SIZE_BUCKETS
+)
+HTTP_RESPONSE_SIZE = registry.histogram(
+    "esante_http_response_size_bytes",
+    "Taille des corps de réponse envoyés",
+    ("method", "route"),
+    SIZE_BUCKETS
+)
+GEMINI_CALL_DURATION = registry.histogram(
+    "esante_gemini_call_duration_seconds",
+    "Durée des appels Gemini (attente du sémaphore exclue)",
+    ("model", "endpoint", "outcome")
+)
+GEMINI_ERRORS = registry.counter(
+    "esante_gemini_errors_total",
+    "Appels Gemini en échec, par type d'exception",
+    ("model", "endpoint", "error")
+)
+GEMINI_RETRIES = registry.counter(
+    "esante_gemini_retries_total",
+    "Nouvelles tentatives après une erreur transitoire",
+    ("model", "endpoint")
+)
+GEMINI_PARSE_FAILURES = registry.counter(
+    "esante_gemini_parse_failures_total",
+    "Réponses Gemini non conformes au schéma attendu",
+    ("endpoint",)
+)
+FALLBACKS = registry.counter(
+    "esante_fallbacks_total",
+    "Réponses servies par les moteurs locaux à la place de Gemini",
+    ("endpoint", "reason")
+)
+HANDLER_ERRORS = registry.counter(
+    "esante_handler_errors_total",
+    "Erreurs interceptées par les endpoints (réponse dégradée ou 500)",
+    ("endpoint",)
+)
+
+class MetricsMiddleware:
+    """
+    Middleware ASGI mesurant chaque requête HTTP : durée jusqu'au dernier octet envoyé
+    (utile pour les réponses en streaming), taille des corps reçus et envoyés.
+
+    Le label `route` est le gabarit de la route FastAPI (ex. "/diagnostic"), jamais le
+    chemin brut, pour borner le nombre de séries.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        sizes = {"request": 0, "response": 0}
+        status = {"code": 500}
+
+        async def counting_receive():
+            message = await receive()
+            if message["type"] == "http.request":
+                sizes["request"] += len(message.get("body", b""))
+            return message
+
+        async def counting_send(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            elif message["type"] == "http.response.body":
+                sizes["response"] += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, counting_receive, counting_send)
+        finally:
+            route = scope.get("route")
+            route_path = getattr(route, "path", None) or "unmatched"
+            method = scope.get("method", "")
+            HTTP_REQUEST_DURATION.observe(
+                time.perf_counter() - start, method=method, route=route_path, status=str(status["code"])
+            )
+            HTTP_REQUEST_SIZE.observe(sizes["request"], method=method, route=route_path)
+            HTTP_RESPONSE_SIZE.observe(sizes["response"], method=method, route=route_path)
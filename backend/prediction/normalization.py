@@ -0,0 +1,158 @@
+# File: prediction/normalization.py
+import re
+import unicodedata
+from functools import lru_cache
+
+_NON_ALNUM = re.compile(r"[^a-z0-9]+")
+
+def fold_text(value):
+    """
+    Normalise un texte pour la comparaison : minuscules, sans accents, espaces uniques.
+    Exemple : "  Fièvre  Élevée " -> "fievre elevee"
+    """
+    if value is None:
+        return ""
+    decomposed = unicodedata.normalize('NFKD', str(value))
+    stripped = "".join(c for c in decomposed if not unicodedata.combining(c))
+    return " ".join(stripped.lower().split())
+
+def alias_key(value):
+    """
+    Clé d'alias : texte normalisé dont la ponctuation est remplacée par des espaces.
+    Exemple : "T.D.R." -> "t d r", "Taux d'hémoglobine" -> "taux d hemoglobine"
+    """
+    return " ".join(_NON_ALNUM.sub(" ", fold_text(value)).split())
+
+# Symptômes : nom canonique -> variantes (orthographe, anglais, termes médicaux)
+SYMPTOM_ALIASES = {
+    "fièvre": ["fievre", "fever", "fébrile", "hyperthermie", "température élevée", "corps chaud"],
+    "maux de tête": ["mal de tête", "mal de tete", "céphalées", "céphalée", "headache", "headaches", "migraine"],
+    "frissons": ["frisson", "chills", "tremblements"],
+    "sueurs": ["sueur", "sueurs nocturnes", "transpiration", "sweating", "sweats"],
+    "nausées": ["nausée", "nausea", "envie de vomir"],
+    "vomissements": ["vomissement", "vomiting", "vomi", "vomit"],
+    "douleurs musculaires": ["douleur musculaire", "myalgies", "myalgie", "courbatures", "muscle pain"],
+    "douleurs articulaires": ["douleur articulaire", "arthralgies", "arthralgie", "joint pain"],
+    "fatigue": ["asthénie", "asthenie", "épuisement", "tiredness", "faiblesse"],
+    "anémie clinique": ["anémie", "anemie", "anemia", "pâleur", "paleur"],
+    "éruption cutanée": ["rash", "skin rash", "éruption", "exanthème", "boutons"],
+    "soif": ["soif intense", "polydipsie", "thirst"],
+    "toux": ["cough", "toux sèche", "toux grasse"],
+    "diarrhée": ["diarrhee", "diarrhea", "selles liquides"],
+    "douleurs abdominales": ["douleur abdominale", "mal au ventre", "maux de ventre", "abdominal pain"],
+    "brûlures d'estomac": ["brulures d'estomac", "pyrosis", "heartburn", "reflux"],
+    "démangeaisons": ["prurit", "itching", "grattage"],
+    "congestion nasale": ["nez bouché", "rhinite", "rhume"],
+    "mal de gorge": ["maux de gorge", "sore throat", "odynophagie", "angine"],
+    "difficultés respiratoires": ["dyspnée", "dyspnee", "essoufflement", "shortness of breath"],
+}
+
+# Négations précédant un terme : "pas de toux", "absence de fièvre", "sans frissons"
+NEGATIONS = (("sans",), ("pas", "de"), ("pas", "d"), ("absence", "de"), ("absence", "d"), ("aucun",), ("aucune",))
+
+# Analyses : nom canonique -> variantes (abréviations usuelles en Côte d'Ivoire, anglais)
+ANALYSIS_ALIASES = {
+    "test de diagnostic rapide du paludisme": ["tdr", "tdr paludisme", "tdr palu", "test rapide paludisme",
+                                               "rdt", "malaria rdt", "malaria rapid diagnostic test"],
+    # Autres tests rapides : l'alias le plus long l'emporte ("TDR dengue" n'est pas le TDR paludisme)
+    "test de diagnostic rapide de la dengue": ["tdr dengue", "test rapide dengue", "dengue rdt", "ns1", "antigene ns1"],
+    "test de diagnostic rapide de la typhoïde": ["tdr typhoide", "test rapide typhoide", "typhidot"],
+    "goutte épaisse": ["ge", "goutte epaisse", "thick smear", "thick blood smear"],
+    "frottis sanguin": ["frottis", "fs", "blood smear", "thin smear"],
+    "hémoglobine": ["hemoglobine", "hb", "hgb", "hemoglobin", "taux d'hémoglobine"],
+    "leucocytes": ["globules blancs", "gb", "wbc", "white blood cells", "leucocytose"],
+    "plaquettes": ["plt", "platelets", "thrombocytes", "numération plaquettaire"],
+    "crp": ["protéine c réactive", "proteine c reactive", "c reactive protein"],
+    "glycémie": ["glycemie", "glucose", "blood sugar", "glycémie à jeun"],
+    "cholestérol": ["cholesterol", "cholestérol total"],
+    "numération formule sanguine": ["nfs", "hémogramme", "hemogramme", "cbc"],
+}
+
+class AliasIndex:
+    """
+    Index des noms canoniques et de leurs alias, compilé au démarrage en une table de
+    hachage clé d'alias -> identifiant entier.
+
+    Un nom reçu est résolu une fois (résultat mémorisé) : correspondance exacte, sinon le
+    plus long alias d'au moins `fallback_min_words` mots présent comme suite de mots
+    (ex. "Taux d'hémoglobine (g/dL)" -> hémoglobine), hors suite précédée d'une négation
+    ("pas de", "absence de", "sans"...). Les moteurs en aval comparent ensuite des
+    entiers. Les noms utilisés par les règles et absents du dictionnaire sont ajoutés
+    via register().
+    """
+
+    def __init__(self, vocabulary=None, cache_size=4096, fallback_min_words=1):
+        self.ids = {}       # clé d'alias -> identifiant
+        self.names = []     # identifiant -> nom canonique
+        self.aliases = []   # identifiant -> clés d'alias
+        self.max_words = 1
+        self.fallback_min_words = fallback_min_words
+        self.resolve = lru_cache(maxsize=cache_size)(self._resolve)
+        for canonical, aliases in (vocabulary or {}).items():
+            canonical_id = self.register(canonical)
+            for alias in aliases:
+                self.add_alias(canonical_id, alias)
+
+    def register(self, name):
+        """
+        Identifiant du nom (créé s'il n'est pas encore connu).
+        """
+        key = alias_key(name)
+        canonical_id = self.ids.get(key)
+        if canonical_id is None:
+            canonical_id = len(self.names)
+            self.names.append(name)
+            self.aliases.append([])
+            self.add_alias(canonical_id, name)
+        return canonical_id
+
+    def add_alias(self, canonical_id, alias):
+        key = alias_key(alias)
+        if not key or key in self.ids:
+            return
+        self.ids[key] = canonical_id
+        self.aliases[canonical_id].append(key)
+        self.max_words = max(self.max_words, len(key.split()))
+        self.resolve.cache_clear()
+
+    def _resolve(self, name):
+        key = alias_key(name)
+        canonical_id = self.ids.get(key)
+        if canonical_id is not None:
+            return canonical_id
+        words = key.split()
+        for size in range(min(self.max_words, len(words)), self.fallback_min_words - 1, -1):
+            for start in range(len(words) - size + 1):
+                canonical_id = self.ids.get(" ".join(words[start:start + size]))
+                if canonical_id is not None and not _negated(words, start):
+                    return canonical_id
+        return None
+
+    def resolve_all(self, items):
+        """
+        Identifiants (ou None si inconnu) d'une liste d'objets ayant un attribut `name`.
+        """
+        return [self.resolve(item.name if hasattr(item, 'name') else str(item)) for item in items]
+
+    def ids_containing(self, fragment):
+        """
+        Identifiants dont un alias contient `fragment` (prédicats "contains" des règles).
+        """
+        fragment = alias_key(fragment)
+        return {
+            canonical_id
+            for canonical_id, keys in enumerate(self.aliases)
+            if any(fragment in key for key in keys)
+        }
+
+    def canonical(self, canonical_id):
+        return self.names[canonical_id]
+
+def _negated(words, start):
+    return any(tuple(words[max(0, start - len(negation)):start]) == negation for negation in NEGATIONS)
+
+# Symptômes : un mot isolé dans une phrase ("température normale", "toux absente") ne
+# suffit pas à affirmer le symptôme, seuls les alias de plusieurs mots sont recherchés.
+# Les noms d'analyses portent souvent unité ou précision ("Hb (g/dL)") : tout alias compte.
+symptom_aliases = AliasIndex(SYMPTOM_ALIASES, fallback_min_words=2)
+analysis_aliases = AliasIndex(ANALYSIS_ALIASES)
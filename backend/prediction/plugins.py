@@ -0,0 +1,108 @@
+# File: prediction/plugins.py
+import importlib
+import pkgutil
+import threading
+from functools import lru_cache
+from prediction.normalization import alias_key
+
+class PluginEntry:
+    """
+    Entrée déclarée du registre : nom, cible "module:attribut" et catégorie éventuelle.
+    Le module n'est importé qu'au premier appel de load().
+    """
+
+    __slots__ = ("kind", "name", "target", "category", "_value", "_loaded")
+
+    def __init__(self, kind, name, target, category=None):
+        self.kind = kind
+        self.name = name
+        self.target = target
+        self.category = category
+        self._value = None
+        self._loaded = False
+
+    @property
+    def loaded(self):
+        return self._loaded
+
+    def load(self):
+        if not self._loaded:
+            module_name, attribute = self.target.split(":")
+            self._value = getattr(importlib.import_module(module_name), attribute)
+            self._loaded = True
+        return self._value
+
+class PluginRegistry:
+    """
+    Registre des catégories, maladies et traitements.
+
+    Chaque paquet de prediction/categories, prediction/diseases et prediction/treatments
+    déclare ses entrées dans son __init__.py (declare()) sans importer les modules des
+    règles : la découverte n'importe que les __init__. La recherche est un accès
+    dictionnaire sur le nom normalisé (ou un alias) ; le module d'une entrée est chargé
+    à sa première utilisation.
+    """
+
+    def __init__(self, packages, cache_size=4096):
+        self.packages = packages   # paquets à parcourir pour découvrir les déclarations
+        self._entries = {}         # type -> nom normalisé -> PluginEntry
+        self._ordered = {}         # type -> [PluginEntry] dans l'ordre de déclaration
+        self._discovered = False
+        self._lock = threading.RLock()
+        # Normalisation des noms reçus mémorisée : un diagnostic déjà vu coûte deux accès dictionnaire
+        self._key = lru_cache(maxsize=cache_size)(alias_key)
+
+    def declare(self, kind, name, target, category=None, aliases=()):
+        entry = PluginEntry(kind, name, target, category)
+        with self._lock:
+            self._ordered.setdefault(kind, []).append(entry)
+            names = self._entries.setdefault(kind, {})
+            for key in (name, *aliases):
+                names[alias_key(key)] = entry
+        return entry
+
+    def discover(self):
+        """
+        Importe les __init__.py des paquets (et sous-paquets) déclarés, une seule fois.
+        """
+        if self._discovered:
+            return
+        with self._lock:
+            if self._discovered:
+                return
+            pending = list(self.packages)
+            while pending:
+                package = importlib.import_module(pending.pop(0))
+                pending.extend(
+                    f"{package.__name__}.{module.name}"
+                    for module in pkgutil.iter_modules(package.__path__) if module.ispkg
+                )
+            self._discovered = True
+
+    def entry(self, kind, name):
+        if not self._discovered:
+            self.discover()
+        return self._entries.get(kind, {}).get(self._key(name))
+
+    def load(self, kind, name):
+        """
+        Objet déclaré sous ce nom ou alias (module chargé si besoin), ou None si inconnu.
+        """
+        entry = self.entry(kind, name)
+        return entry.load() if entry is not None else None
+
+    def entries(self, kind, category=None):
+        self.discover()
+        return [
+            entry for entry in self._ordered.get(kind, [])
+            if category is None or entry.category == category
+        ]
+
+    def stats(self):
+        self.discover()
+        return {
+            kind: {"declared": len(entries), "loaded": sum(entry.loaded for entry in entries)}
+            for kind, entries in self._ordered.items()
+        }
+
+plugins = PluginRegistry(["prediction.categories", "prediction.diseases", "prediction.treatments"])
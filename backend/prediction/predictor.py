@@ -1,37 +1,63 @@
 # File: prediction/predictor.py
 
-# Import de la fonction de calcul du score de la catégorie Infectious
-from prediction.categories.infectious import calculate_infectious_score
+import os
+from types import SimpleNamespace
+from prediction.gemini_client import load_environment
+from prediction.plugins import plugins
+from prediction.scoring_engine import TieredScoringEngine, ScoringJitter
 
-# Import des fonctions de calcul des scores pour les maladies de la catégorie Infectious
-from prediction.diseases.infectious.malaria import calculate_malaria_score
-from prediction.diseases.infectious.dengue import calculate_dengue_score
+load_environment()
+
+def load_category_diseases(category):
+    """
+    Règles des maladies déclarées pour une catégorie (modules importés à ce moment).
+    """
+    return [entry.load() for entry in plugins.entries("disease", category=category)]
+
+# Catégories compilées au démarrage ; maladies chargées et compilées par catégorie à la
+# première catégorie au-dessus du seuil. Pour ajouter une pathologie, déclarer sa règle
+# dans le __init__.py du paquet de sa catégorie (prediction/diseases/<catégorie>).
+# Variation des scores (SCORING_JITTER : hashed, off ou random ; SCORING_SEED : graine
+# du déploiement). Avec hashed ou off, mêmes entrées -> mêmes scores, résultats mémorisés.
+# Sans SCORING_SEED, hashed utilise un sel aléatoire par processus : fixer la graine pour
+# des scores identiques entre workers et entre redémarrages.
+scoring_engine = TieredScoringEngine(
+    [entry.load() for entry in plugins.entries("category")],
+    load_category_diseases,
+    category_threshold=30,
+    jitter=ScoringJitter(
+        mode=os.getenv('SCORING_JITTER', 'hashed'),
+        seed=int(os.getenv('SCORING_SEED')) if os.getenv('SCORING_SEED') else None
+    ),
+    memo_size=int(os.getenv('SCORING_MEMO_SIZE', 4096))
+)
 
 def predict_disease_scores(symptoms, analyses, history, recent_diseases):
     """
     Pour chaque catégorie, on calcule d'abord le score global.
-    Si le score dépasse 30%, on calcule les scores individuels pour chaque maladie de cette catégorie.
+    Si le score dépasse 30%, on retient les scores individuels des maladies de cette catégorie.
     """
-    results = []
+    return scoring_engine.predict(symptoms, analyses, history, recent_diseases)
 
-    # Traitement de la catégorie "Infectious"
-    infectious_category_score = calculate_infectious_score(symptoms, analyses, history, recent_diseases)
-    if infectious_category_score > 30:
-        # Calcul des scores pour les maladies de la catégorie Infectious
-        malaria_score = calculate_malaria_score(symptoms, analyses, history, recent_diseases)
-        results.append({
-            "id": 1,
-            "disease": "Malaria",
-            "probability": round(malaria_score, 2)
-        })
-        dengue_score = calculate_dengue_score(symptoms, analyses, history, recent_diseases)
-        results.append({
-            "id": 2,
-            "disease": "Dengue",
-            "probability": round(dengue_score, 2)
-        })
+def predict_disease_scores_batch(patients):
+    """
+    Scores de plusieurs patients : une multiplication matricielle par étage.
+    `patients` : liste de (symptoms, analyses, history, recent_diseases).
+    """
+    return scoring_engine.predict_batch(patients)
 
-    # Vous pourrez ajouter d'autres catégories en suivant le même schéma :
-    # e.g., pour une catégorie "Inflammatory", calculer le score global et, si > 30, lancer le calcul des maladies associées.
-    
-    return results
+def predict_disease_scores_batch_records(records):
+    """
+    Variante de predict_disease_scores_batch exécutable dans le pool de processus :
+    `records` est une liste de (symptômes, analyses) sous forme de dictionnaires
+    (ex. model_dump() sans les photos), sérialisables sans importer les modèles de l'API.
+    """
+    return scoring_engine.predict_batch([
+        (
+            [SimpleNamespace(**symptom) for symptom in symptoms],
+            [SimpleNamespace(**analysis) for analysis in analyses],
+            None,
+            None
+        )
+        for symptoms, analyses in records
+    ])
@@ -0,0 +1,625 @@
+# File: prediction/prescription_pdf.py
+import datetime
+import io
+import os
+import re
+import string
+import unicodedata
+import zipfile
+import zlib
+from prediction.gemini_client import load_environment
+
+load_environment()
+
+DEFAULT_TEMPLATE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'prescription.tpl')
+
+# Page A4 en points PDF ; zone du contenu en flux sous l'en-tête
+PAGE_WIDTH, PAGE_HEIGHT = 595, 842
+LEFT, RIGHT = 50, 545
+BODY_TOP, BODY_BOTTOM = 744, 60
+
+MONTHS = ["janvier", "février", "mars", "avril", "mai", "juin", "juillet", "août",
+          "septembre", "octobre", "novembre", "décembre"]
+
+# Largeurs (millièmes d'em) des caractères ASCII 32 à 126 des polices standard PDF (métriques AFM Adobe)
+HELVETICA_WIDTHS = [
+    278, 278, 355, 556, 556, 889, 667, 191, 333, 333, 389, 584, 278, 333, 278, 278,
+    556, 556, 556, 556, 556, 556, 556, 556, 556, 556, 278, 278, 584, 584, 584, 556,
+    1015, 667, 667, 722, 722, 667, 611, 778, 722, 278, 500, 667, 556, 833, 722, 778,
+    667, 778, 722, 667, 611, 722, 667, 944, 667, 667, 611, 278, 278, 278, 469, 556,
+    333, 556, 556, 500, 556, 556, 278, 556, 556, 222, 222, 500, 222, 833, 556, 556,
+    556, 556, 333, 500, 278, 556, 500, 722, 500, 500, 500, 334, 260, 334, 584,
+]
+HELVETICA_BOLD_WIDTHS = [
+    278, 333, 474, 556, 556, 889, 722, 238, 333, 333, 389, 584, 278, 333, 278, 278,
+    556, 556, 556, 556, 556, 556, 556, 556, 556, 556, 333, 333, 584, 584, 584, 611,
+    975, 722, 722, 722, 722, 667, 611, 778, 722, 278, 556, 722, 611, 833, 722, 778,
+    667, 778, 722, 667, 611, 722, 667, 944, 667, 667, 611, 333, 278, 333, 584, 556,
+    333, 556, 611, 556, 611, 556, 333, 611, 611, 278, 278, 556, 278, 889, 611, 611,
+    611, 611, 389, 556, 333, 611, 556, 778, 556, 556, 500, 389, 280, 389, 584,
+]
+
+# Tableau des médicaments : (titre, largeur, alignement)
+MEDICATION_COLUMNS = [("#", 22, "right"), ("Médicament", 150, "left"), ("Posologie", 165, "left"),
+                      ("Indication", 103, "left"), ("Coût", 55, "right")]
+
+ACCENT = (0.11, 0.30, 0.85)
+MUTED = (0.35, 0.35, 0.35)
+
+class TemplateError(ValueError):
+    """
+    Gabarit d'ordonnance invalide (détecté au démarrage, à la compilation).
+    """
+
+def _num(value):
+    return f"{value:.2f}".rstrip("0").rstrip(".").encode("ascii")
+
+def _pdf_string(data):
+    return b"(" + data.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)") + b")"
+
+def _color(rgb):
+    r, g, b = (_num(c) for c in rgb)
+    return b"%s %s %s rg %s %s %s RG\n" % (r, g, b, r, g, b)
+
+class FontMetrics:
+    """
+    Police standard PDF (non embarquée, WinAnsiEncoding). La table des largeurs est
+    indexée par octet cp1252 et construite une fois ; une lettre accentuée prend la
+    largeur de sa lettre de base.
+    """
+
+    def __init__(self, resource, base_font, ascii_widths):
+        self.resource = resource.encode("ascii")
+        self.base_font = base_font
+        self.widths = [556] * 256
+        for code in range(256):
+            try:
+                char = bytes([code]).decode("cp1252")
+            except UnicodeDecodeError:
+                continue
+            base = unicodedata.normalize("NFD", char)[0] if code >= 128 else char
+            if 32 <= ord(base) < 127:
+                self.widths[code] = ascii_widths[ord(base) - 32]
+        self.widths[0xA0] = ascii_widths[0]
+        self.object = (
+            f"<< /Type /Font /Subtype /Type1 /BaseFont /{base_font} /Encoding /WinAnsiEncoding >>"
+        ).encode("ascii")
+
+    @staticmethod
+    def encode(text):
+        return " ".join(str(text).split()).encode("cp1252", "replace")
+
+    def width(self, text, size):
+        return sum(self.widths[byte] for byte in self.encode(text)) * size / 1000
+
+    def wrap(self, text, size, max_width):
+        """
+        Découpe un texte en lignes de largeur maximale `max_width` (mots trop longs coupés).
+        """
+        lines, line = [], ""
+        for word in str(text).split():
+            candidate = f"{line} {word}" if line else word
+            if self.width(candidate, size) <= max_width:
+                line = candidate
+                continue
+            if line:
+                lines.append(line)
+            while self.width(word, size) > max_width and len(word) > 1:
+                cut = len(word) - 1
+                while cut > 1 and self.width(word[:cut], size) > max_width:
+                    cut -= 1
+                lines.append(word[:cut])
+                word = word[cut:]
+            line = word
+        if line:
+            lines.append(line)
+        return lines or [""]
+
+def jpeg_size(data):
+    """
+    (largeur, hauteur, composantes) lues dans le marqueur SOF d'un JPEG.
+    """
+    position = 2
+    while position + 9 < len(data):
+        if data[position] != 0xFF:
+            position += 1
+            continue
+        marker = data[position + 1]
+        if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+            height = int.from_bytes(data[position + 5:position + 7], "big")
+            width = int.from_bytes(data[position + 7:position + 9], "big")
+            return width, height, data[position + 9]
+        position += 2 + int.from_bytes(data[position + 2:position + 4], "big")
+    raise ValueError("Marqueur SOF introuvable")
+
+class PdfImage:
+    """
+    Image intégrée une fois en XObject JPEG (DCTDecode), réutilisée par chaque document.
+    """
+
+    __slots__ = ("name", "width", "height", "object")
+
+    def __init__(self, name, path):
+        with open(path, "rb") as f:
+            data = f.read()
+        if not data.startswith(b"\xff\xd8"):
+            # Autres formats (PNG...) convertis une fois en JPEG ; Pillow requis
+            from PIL import Image
+            with Image.open(io.BytesIO(data)) as image:
+                output = io.BytesIO()
+                image.convert("RGB").save(output, format="JPEG", quality=90)
+                data = output.getvalue()
+        self.name = name.encode("ascii")
+        self.width, self.height, components = jpeg_size(data)
+        colorspace = {1: "DeviceGray", 3: "DeviceRGB", 4: "DeviceCMYK"}.get(components, "DeviceRGB")
+        self.object = (
+            f"<< /Type /XObject /Subtype /Image /Width {self.width} /Height {self.height} "
+            f"/ColorSpace /{colorspace} /BitsPerComponent 8 /Filter /DCTDecode /Length {len(data)} >>\nstream\n"
+        ).encode("ascii") + data + b"\nendstream"
+
+class PageLayout:
+    """
+    État d'un rendu : pages produites, curseur vertical, police et couleur courantes.
+    """
+
+    def __init__(self, renderer, header):
+        self.renderer = renderer
+        self.header = header
+        self.pages = []
+        self.font = renderer.fonts["regular"]
+        self.size = 10
+        self.color = (0, 0, 0)
+        self.new_page()
+
+    def new_page(self):
+        self.content = bytearray(self.header)
+        self.content += _color(self.color)
+        self.pages.append(self.content)
+        self.y = BODY_TOP
+
+    def ensure(self, height):
+        if self.y - height < BODY_BOTTOM:
+            self.new_page()
+
+    def set_color(self, rgb):
+        self.color = rgb
+        self.content += _color(rgb)
+
+    def text(self, x, y, text, font=None, size=None, align="left"):
+        font = font or self.font
+        size = size or self.size
+        if align != "left":
+            width = font.width(text, size)
+            x = x - width if align == "right" else x - width / 2
+        self.content += b"BT /%s %s Tf %s %s Td %s Tj ET\n" % (
+            font.resource, _num(size), _num(x), _num(y), _pdf_string(font.encode(text))
+        )
+
+    def line(self, x1, y1, x2, y2, width=0.5):
+        self.content += b"%s w %s %s m %s %s l S\n" % (_num(width), _num(x1), _num(y1), _num(x2), _num(y2))
+
+    def rect(self, x, y, width, height):
+        self.content += b"%s %s %s %s re f\n" % (_num(x), _num(y), _num(width), _num(height))
+
+    def image(self, name, x, y, width, height):
+        image = self.renderer.images.get(name)
+        if image is not None:
+            self.content += b"q %s 0 0 %s %s %s cm /%s Do Q\n" % (_num(width), _num(height), _num(x), _num(y), image.name)
+
+class CompiledTemplate:
+    """
+    Gabarit compilé : en-tête (octets statiques et fonctions des champs) et suite
+    d'opérations du contenu en flux, chacune appliquée à un PageLayout.
+    """
+
+    def __init__(self, header, body, fields):
+        self.header = header
+        self.body = body
+        self.fields = fields
+
+    def render_header(self, fields):
+        return b"".join(part if isinstance(part, bytes) else part(fields) for part in self.header)
+
+def _field_names(text):
+    return [name for _, name, _, _ in string.Formatter().parse(text) if name]
+
+def compile_template(source, renderer):
+    """
+    Lit le gabarit (voir prediction/data/prescription.tpl) et le compile une fois en
+    opérations : les parties sans champ sont pré-encodées en octets.
+    """
+    fonts = renderer.fonts
+    header, body, fields = [], [], set()
+    section = None
+    state = {"font": fonts["regular"], "size": 10}
+
+    for number, raw in enumerate(source.splitlines(), 1):
+        line = raw.strip()
+        if not line or line.startswith("#"):
+            continue
+        if line in ("[header]", "[body]"):
+            section = line[1:-1]
+            continue
+        condition = None
+        if line.startswith("?"):
+            condition, _, line = line[1:].partition(" ")
+            fields.add(condition)
+        directive, _, argument = line.partition(" ")
+        try:
+            if section == "header":
+                op = _compile_header(directive, argument, state, fonts)
+                if condition:
+                    raise TemplateError("condition non prise en charge dans l'en-tête")
+                if isinstance(op, bytes) and header and isinstance(header[-1], bytes):
+                    header[-1] += op
+                elif op is not None:
+                    header.append(op)
+            elif section == "body":
+                op = _compile_body(directive, argument, fonts)
+                if condition:
+                    op = (lambda op, condition: lambda layout, values: op(layout, values) if values.get(condition) else None)(op, condition)
+                body.append(op)
+            else:
+                raise TemplateError("directive hors section")
+        except (TemplateError, ValueError, KeyError) as e:
+            raise TemplateError(f"Ligne {number} du gabarit ({raw.strip()}) : {e}")
+        fields.update(_field_names(argument))
+
+    return CompiledTemplate(header, body, fields)
+
+def _compile_header(directive, argument, state, fonts):
+    args = argument.split()
+    if directive == "font":
+        state["font"], state["size"] = fonts[args[0]], float(args[1])
+        return b""
+    if directive == "color":
+        return _color(tuple(float(value) for value in args))
+    if directive == "line":
+        x1, y1, x2, y2, width = (float(value) for value in args)
+        return b"%s w %s %s m %s %s l S\n" % (_num(width), _num(x1), _num(y1), _num(x2), _num(y2))
+    if directive == "image":
+        name, x, y, width, height = args[0], *(float(value) for value in args[1:])
+
+        def draw_image(values, name=name):
+            image = values["_images"].get(name)
+            if image is None:
+                return b""
+            # Image réduite dans la boîte en conservant ses proportions
+            scale = min(width / image.width, height / image.height)
+            return b"q %s 0 0 %s %s %s cm /%s Do Q\n" % (
+                _num(image.width * scale), _num(image.height * scale), _num(x), _num(y), image.name
+            )
+        return draw_image
+    if directive == "text":
+        align, x, y, text = argument.split(" ", 3)
+        x, y = float(x), float(y)
+        font, size = state["font"], state["size"]
+
+        def draw_text(values, text=text):
+            content = text.format_map(values) if _field_names(text) else text
+            encoded = font.encode(content)
+            if not encoded:
+                return b""
+            left = x
+            if align != "left":
+                width = font.width(content, size)
+                left = x - width if align == "right" else x - width / 2
+            return b"BT /%s %s Tf %s %s Td %s Tj ET\n" % (
+                font.resource, _num(size), _num(left), _num(y), _pdf_string(encoded)
+            )
+        return draw_text({}) if not _field_names(text) else draw_text
+    raise TemplateError(f"directive d'en-tête inconnue : {directive}")
+
+def _compile_body(directive, argument, fonts):
+    args = argument.split()
+    if directive == "font":
+        font, size = fonts[args[0]], float(args[1])
+
+        def set_font(layout, values):
+            layout.font, layout.size = font, size
+        return set_font
+    if directive == "color":
+        rgb = tuple(float(value) for value in args)
+        return lambda layout, values: layout.set_color(rgb)
+    if directive == "space":
+        points = float(args[0])
+
+        def space(layout, values):
+            layout.y -= points
+        return space
+    if directive == "paragraph":
+        align, _, text = argument.partition(" ")
+        x = {"left": LEFT, "center": PAGE_WIDTH / 2, "right": RIGHT}[align]
+        dynamic = bool(_field_names(text))
+
+        def paragraph(layout, values):
+            content = text.format_map(values) if dynamic else text
+            leading = layout.size * 1.35
+            for line in layout.font.wrap(content, layout.size, RIGHT - LEFT):
+                layout.ensure(leading)
+                layout.y -= leading
+                layout.text(x, layout.y, line, align=align)
+        return paragraph
+    if directive == "heading":
+        return lambda layout, values: _draw_heading(layout, argument)
+    if directive == "fields":
+        pairs = [tuple(part.strip().split("=", 1)) for part in argument.split("|")]
+        return lambda layout, values: _draw_fields(layout, [(label, value.format_map(values)) for label, value in pairs])
+    if directive == "medications":
+        return lambda layout, values: _draw_medications(layout, values["_medications"])
+    if directive == "total":
+        return lambda layout, values: _draw_total(layout, values["_medications"])
+    if directive == "signature":
+        return lambda layout, values: _draw_signature(layout, values)
+    raise TemplateError(f"directive de contenu inconnue : {directive}")
+
+def _draw_heading(layout, title):
+    bold = layout.renderer.fonts["bold"]
+    previous = layout.color
+    layout.ensure(40)
+    layout.y -= 22
+    layout.set_color(ACCENT)
+    layout.rect(LEFT, layout.y - 3, 3, 15)
+    layout.set_color((0.12, 0.12, 0.12))
+    layout.text(LEFT + 9, layout.y, title, bold, 12)
+    layout.y -= 6
+    layout.set_color(previous)
+
+def _draw_fields(layout, pairs):
+    regular, bold = layout.renderer.fonts["regular"], layout.renderer.fonts["bold"]
+    size, leading = 10, 14
+    column_width = (RIGHT - LEFT) / len(pairs)
+    rows = []
+    for index, (label, value) in enumerate(pairs):
+        label = f"{label} : "
+        offset = bold.width(label, size)
+        rows.append((LEFT + index * column_width, label, offset, regular.wrap(value, size, column_width - offset - 10)))
+    height = max(len(lines) for _, _, _, lines in rows) * leading
+    layout.ensure(height)
+    for x, label, offset, lines in rows:
+        layout.text(x, layout.y - leading, label, bold, size)
+        for i, line in enumerate(lines):
+            layout.text(x + offset, layout.y - leading * (i + 1), line, regular, size)
+    layout.y -= height
+
+def _format_fcfa(amount):
+    return f"{int(round(amount)):,}".replace(",", " ") + " FCFA"
+
+def _draw_table_header(layout):
+    bold = layout.renderer.fonts["bold"]
+    previous = layout.color
+    layout.y -= 18
+    layout.set_color((0.93, 0.95, 0.99))
+    layout.rect(LEFT, layout.y - 5, RIGHT - LEFT, 18)
+    layout.set_color(ACCENT)
+    x = LEFT
+    for title, width, align in MEDICATION_COLUMNS:
+        layout.text(x + width - 4 if align == "right" else x + 4, layout.y, title, bold, 9, align)
+        x += width
+    layout.y -= 7
+    layout.set_color(previous)
+
+def _draw_medications(layout, medications):
+    regular, bold = layout.renderer.fonts["regular"], layout.renderer.fonts["bold"]
+    size, leading = 9, 11.5
+    previous = layout.color
+    layout.ensure(60)
+    _draw_table_header(layout)
+    if not medications:
+        layout.y -= leading
+        layout.text(LEFT + 4, layout.y, "Aucun médicament prescrit.", regular, size)
+        return
+    for index, medication in enumerate(medications, 1):
+        cost = medication.get("cost") or 0
+        widths = [width - 8 for _, width, _ in MEDICATION_COLUMNS]
+        cells = [
+            [(str(index), bold, (0, 0, 0))],
+            [(line, bold, (0, 0, 0)) for line in bold.wrap(medication["name"], size, widths[1])]
+            + [(line, regular, MUTED) for line in regular.wrap(medication.get("category", ""), size - 1, widths[1])],
+            [(line, regular, (0, 0, 0)) for line in regular.wrap(medication.get("dosage", ""), size, widths[2])],
+            [(line, regular, MUTED) for line in regular.wrap(medication.get("indication", ""), size, widths[3])],
+            [(_format_fcfa(cost) if cost > 0 else "—", regular, (0, 0, 0))],
+        ]
+        height = max(len(cell) for cell in cells) * leading + 8
+        if layout.y - height < BODY_BOTTOM:
+            layout.new_page()
+            _draw_table_header(layout)
+        x = LEFT
+        for (_, width, align), cell in zip(MEDICATION_COLUMNS, cells):
+            for i, (line, font, rgb) in enumerate(cell):
+                layout.set_color(rgb)
+                layout.text(x + width - 4 if align == "right" else x + 4, layout.y - 4 - leading * (i + 1) + 2.5,
+                            line, font, size if font is bold or rgb != MUTED else size - 0.5, align)
+            x += width
+        layout.y -= height
+        layout.set_color((0.85, 0.85, 0.85))
+        layout.line(LEFT, layout.y, RIGHT, layout.y)
+    layout.set_color(previous)
+
+def _draw_total(layout, medications):
+    total = sum(medication.get("cost") or 0 for medication in medications)
+    if total <= 0:
+        return
+    previous = layout.color
+    layout.ensure(24)
+    layout.y -= 18
+    layout.set_color((0.08, 0.45, 0.2))
+    layout.text(RIGHT - 4, layout.y, f"Coût total estimé : {_format_fcfa(total)}", layout.renderer.fonts["bold"], 11, "right")
+    layout.set_color(previous)
+
+def _draw_signature(layout, values):
+    regular, bold = layout.renderer.fonts["regular"], layout.renderer.fonts["bold"]
+    previous = layout.color
+    layout.ensure(120)
+    layout.y -= 30
+    layout.set_color((0, 0, 0))
+    layout.text(RIGHT, layout.y, "Le Médecin", bold, 10, "right")
+    if values.get("doctor_name"):
+        layout.text(RIGHT, layout.y - 13, values["doctor_name"], regular, 9, "right")
+    signature = layout.renderer.images.get("signature")
+    if signature is not None:
+        scale = min(150 / signature.width, 50 / signature.height)
+        layout.image("signature", RIGHT - signature.width * scale, layout.y - 70, signature.width * scale, signature.height * scale)
+    layout.set_color((0.6, 0.6, 0.6))
+    layout.line(RIGHT - 150, layout.y - 76, RIGHT, layout.y - 76, 1)
+    layout.set_color(MUTED)
+    layout.text(RIGHT, layout.y - 88, "Signature et cachet", regular, 8, "right")
+    layout.y -= 90
+    layout.set_color(previous)
+
+def format_date(value):
+    """
+    "2025-01-15T10:30:00Z" -> "15 janvier 2025" (texte laissé tel quel s'il n'est pas ISO).
+    """
+    try:
+        date = datetime.datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    except ValueError:
+        return str(value)
+    return f"{date.day} {MONTHS[date.month - 1]} {date.year}"
+
+def prescription_filename(prescription):
+    patient = prescription["patient"]
+    reference = patient.get("cmuNumber") or f"{patient.get('lastName', '')}-{patient.get('firstName', '')}"
+    slug = re.sub(r"[^a-z0-9]+", "-", unicodedata.normalize("NFKD", reference).encode("ascii", "ignore").decode().lower()).strip("-")
+    date = re.sub(r"[^0-9]", "", str(prescription.get("consultationDate", ""))[:10])
+    return f"ordonnance-{slug or 'patient'}-{date or 'sans-date'}.pdf"
+
+class PrescriptionRenderer:
+    """
+    Rendu PDF des ordonnances (PrescriptionOutput sous forme de dictionnaire).
+
+    Le gabarit (PRESCRIPTION_TEMPLATE_PATH) est lu et compilé une seule fois ; les
+    métriques des polices standard et les images (logo, signature : JPEG intégrés tels
+    quels, autres formats convertis via Pillow) sont préparées au démarrage et leurs
+    objets PDF pré-sérialisés. Un rendu ne fait que remplir les champs, mettre en page
+    et compresser le contenu des pages : quelques millisecondes.
+
+    Les informations du médecin et de l'établissement viennent de l'ordonnance
+    (`doctor`) ou, à défaut, de la configuration (PRESCRIPTION_DOCTOR_NAME, ...).
+    """
+
+    def __init__(self, template_path=DEFAULT_TEMPLATE_PATH, doctor=None, city="Abidjan",
+                 logo_path=None, signature_path=None):
+        self.fonts = {
+            "regular": FontMetrics("F1", "Helvetica", HELVETICA_WIDTHS),
+            "bold": FontMetrics("F2", "Helvetica-Bold", HELVETICA_BOLD_WIDTHS),
+        }
+        self.doctor = {key: value for key, value in (doctor or {}).items() if value}
+        self.city = city
+        self.images = {}
+        for name, path in (("logo", logo_path), ("signature", signature_path)):
+            if path:
+                try:
+                    self.images[name] = PdfImage("Im" + name.capitalize(), path)
+                except Exception as e:
+                    print(f"Prescription {name} image ignored ({path}): {str(e)}")
+        with open(template_path, encoding="utf-8") as f:
+            self.template = compile_template(f.read(), self)
+
+        # Objets communs à tous les documents (3 : Helvetica, 4 : Helvetica-Bold, 5+ : images)
+        self._shared = [self.fonts["regular"].object, self.fonts["bold"].object] + [image.object for image in self.images.values()]
+        xobjects = b"".join(b"/%s %d 0 R " % (image.name, 5 + i) for i, image in enumerate(self.images.values()))
+        self._resources = b"<< /Font << /F1 3 0 R /F2 4 0 R >>" + (b" /XObject << " + xobjects + b">>" if xobjects else b"") + b" >>"
+
+    def fields(self, prescription):
+        patient = prescription["patient"]
+        doctor = {**self.doctor, **{key: value for key, value in (prescription.get("doctor") or {}).items() if value}}
+        treatment = prescription.get("treatment") or ""
+        defined = treatment and treatment != "Traitement non défini"
+        return {
+            "facility": doctor.get("facility", ""),
+            "facility_address": doctor.get("address", ""),
+            "facility_phone": f"Tél. : {doctor['phone']}" if doctor.get("phone") else "",
+            "doctor_name": doctor.get("name", ""),
+            "doctor_specialty": doctor.get("specialty", ""),
+            "doctor_registration": f"N° d'ordre : {doctor['registration']}" if doctor.get("registration") else "",
+            "city": self.city,
+            "date": format_date(prescription.get("consultationDate", "")),
+            "patient_last_name": patient.get("lastName", ""),
+            "patient_first_name": patient.get("firstName", ""),
+            "patient_age": patient.get("age", ""),
+            "patient_cmu": patient.get("cmuNumber", ""),
+            "diagnostic": prescription.get("diagnostic", ""),
+            "treatment": treatment if defined else "",
+            "posology": prescription.get("posology", "") if defined else "",
+            "instructions": prescription.get("instructions", ""),
+            "_medications": prescription.get("medications") or [],
+            "_images": self.images,
+        }
+
+    def render(self, prescription):
+        """
+        Document PDF (octets) d'une ordonnance.
+        """
+        values = self.fields(prescription)
+        layout = PageLayout(self, self.template.render_header(values))
+        for op in self.template.body:
+            op(layout, values)
+
+        output = bytearray(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+        offsets = []
+
+        def add(body):
+            offsets.append(len(output))
+            output.extend(b"%d 0 obj\n" % len(offsets))
+            output.extend(body)
+            output.extend(b"\nendobj\n")
+
+        first_page = 3 + len(self._shared)
+        page_ids = [first_page + 2 * i for i in range(len(layout.pages))]
+        title = _pdf_string(FontMetrics.encode(f"Ordonnance - {values['patient_last_name']} {values['patient_first_name']}"))
+        add(b"<< /Type /Catalog /Pages 2 0 R >>")
+        add(b"<< /Type /Pages /Kids [%s] /Count %d >>" % (b" ".join(b"%d 0 R" % i for i in page_ids), len(page_ids)))
+        for body in self._shared:
+            add(body)
+        for page_id, content in zip(page_ids, layout.pages):
+            add(b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %d %d] /Resources %s /Contents %d 0 R >>"
+                % (PAGE_WIDTH, PAGE_HEIGHT, self._resources, page_id + 1))
+            stream = zlib.compress(bytes(content), 6)
+            add(b"<< /Length %d /Filter /FlateDecode >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        info_id = len(offsets) + 1
+        add(b"<< /Title %s /Producer (e-Sante) >>" % title)
+
+        xref = len(output)
+        output.extend(b"xref\n0 %d\n0000000000 65535 f \n" % (len(offsets) + 1))
+        output.extend(b"".join(b"%010d 00000 n \n" % offset for offset in offsets))
+        output.extend(b"trailer\n<< /Size %d /Root 1 0 R /Info %d 0 R >>\nstartxref\n%d\n%%%%EOF\n"
+                      % (len(offsets) + 1, info_id, xref))
+        return bytes(output)
+
+prescription_renderer = PrescriptionRenderer(
+    template_path=os.getenv('PRESCRIPTION_TEMPLATE_PATH', DEFAULT_TEMPLATE_PATH),
+    doctor={
+        "name": os.getenv('PRESCRIPTION_DOCTOR_NAME'),
+        "specialty": os.getenv('PRESCRIPTION_DOCTOR_SPECIALTY'),
+        "registration": os.getenv('PRESCRIPTION_DOCTOR_REGISTRATION'),
+        "facility": os.getenv('PRESCRIPTION_FACILITY'),
+        "address": os.getenv('PRESCRIPTION_FACILITY_ADDRESS'),
+        "phone": os.getenv('PRESCRIPTION_FACILITY_PHONE'),
+    },
+    city=os.getenv('PRESCRIPTION_CITY', 'Abidjan'),
+    logo_path=os.getenv('PRESCRIPTION_LOGO_PATH'),
+    signature_path=os.getenv('PRESCRIPTION_SIGNATURE_PATH')
+)
+
+def render_prescriptions(prescriptions):
+    """
+    Étape CPU de l'export en lot (exécutée dans le pool de processus) :
+    [(nom de fichier, PDF)] pour une liste d'ordonnances (dictionnaires).
+    """
+    return [(prescription_filename(prescription), prescription_renderer.render(prescription)) for prescription in prescriptions]
+
+def build_archive(files):
+    """
+    Archive ZIP des PDF ; les noms en double sont numérotés.
+    """
+    buffer = io.BytesIO()
+    seen = {}
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+        for name, data in files:
+            count = seen.get(name, 0)
+            seen[name] = count + 1
+            if count:
+                name = f"{name[:-4]}-{count + 1}.pdf"
+            archive.writestr(name, data)
+    return buffer.getvalue()
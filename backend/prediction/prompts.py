@@ -0,0 +1,207 @@
+# File: prediction/prompts.py
+import hashlib
+import os
+import threading
+import time
+from prediction.gemini_client import load_environment, get_client
+from prediction.executors import executors
+
+load_environment()
+
+def estimate_tokens(text):
+    """
+    Estimation locale du nombre de tokens (~4 octets UTF-8 par token pour du français).
+    Les comptes exacts sont relevés dans usage_metadata des réponses Gemini.
+    """
+    if not text:
+        return 0
+    return max(1, round(len(text.encode('utf-8')) / 4))
+
+class PromptTemplate:
+    """
+    Prompt découpé en un préfixe statique (rôle, contexte, instructions, format),
+    compilé une seule fois, et une section dynamique propre au patient.
+
+    Le préfixe est envoyé comme instruction système, ou référencé via le cache de
+    contexte Gemini lorsqu'il est actif : il n'est alors plus retransmis à chaque appel.
+    """
+
+    def __init__(self, name, static_prefix):
+        self.name = name
+        self.static_prefix = static_prefix.strip() + "\n"
+        self.version = hashlib.sha256(self.static_prefix.encode('utf-8')).hexdigest()[:12]
+        self.static_tokens = estimate_tokens(self.static_prefix)
+
+    def config_kwargs(self, model):
+        """
+        Paramètres de GenerateContentConfig portant le préfixe statique.
+        """
+        cached_name = context_cache.lookup(self, model)
+        if cached_name:
+            return {"cached_content": cached_name}
+        return {"system_instruction": self.static_prefix}
+
+class PromptAccounting:
+    """
+    Comptabilité des tokens d'entrée par endpoint et par section du prompt.
+
+    Les sections statique et dynamique sont estimées localement à chaque construction ;
+    les totaux réels (dont les tokens servis depuis le cache de contexte) proviennent de
+    usage_metadata. Permet de suivre le coût en tokens et de repérer un prompt qui grossit.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def _entry(self, name):
+        entry = self._stats.get(name)
+        if entry is None:
+            entry = self._stats[name] = {
+                "calls": 0,
+                "static_tokens": 0,
+                "dynamic_tokens_total": 0,
+                "dynamic_tokens_max": 0,
+                "responses": 0,
+                "prompt_tokens_total": 0,
+                "prompt_tokens_max": 0,
+                "cached_tokens_total": 0,
+                "output_tokens_total": 0,
+            }
+        return entry
+
+    def record_prompt(self, template, dynamic_text):
+        dynamic_tokens = estimate_tokens(dynamic_text)
+        with self._lock:
+            entry = self._entry(template.name)
+            entry["calls"] += 1
+            entry["static_tokens"] = template.static_tokens
+            entry["dynamic_tokens_total"] += dynamic_tokens
+            entry["dynamic_tokens_max"] = max(entry["dynamic_tokens_max"], dynamic_tokens)
+        return dynamic_tokens
+
+    def record_usage(self, template, response):
+        usage = getattr(response, 'usage_metadata', None)
+        if usage is None:
+            return
+        prompt_tokens = usage.prompt_token_count or 0
+        with self._lock:
+            entry = self._entry(template.name)
+            entry["responses"] += 1
+            entry["prompt_tokens_total"] += prompt_tokens
+            entry["prompt_tokens_max"] = max(entry["prompt_tokens_max"], prompt_tokens)
+            entry["cached_tokens_total"] += usage.cached_content_token_count or 0
+            entry["output_tokens_total"] += usage.candidates_token_count or 0
+
+    def stats(self):
+        with self._lock:
+            result = {}
+            for name, entry in self._stats.items():
+                calls = entry["calls"] or 1
+                responses = entry["responses"] or 1
+                result[name] = {
+                    **entry,
+                    "dynamic_tokens_avg": round(entry["dynamic_tokens_total"] / calls, 1),
+                    "prompt_tokens_avg": round(entry["prompt_tokens_total"] / responses, 1),
+                }
+            return result
+
+class ContextCache:
+    """
+    Préfixes statiques mis en cache côté Gemini (context caching), un par (modèle, prompt).
+
+    Activé par GEMINI_CONTEXT_CACHE=1. Si le modèle ou la taille du préfixe ne permettent
+    pas la mise en cache, le préfixe reste envoyé comme instruction système (équivalent
+    local : compilé une fois, non reconstruit à chaque appel).
+
+    Les caches sont créés au démarrage puis renouvelés à l'usage : un lookup à moins de
+    `RENEW_MARGIN` secondes de l'expiration lance le renouvellement dans le pool de
+    threads (un seul à la fois par préfixe) ; d'ici là, le cache courant, ou à défaut
+    l'instruction système, est utilisé.
+    """
+
+    RENEW_MARGIN = 300
+
+    def __init__(self, enabled=False, ttl=3600, client_factory=get_client):
+        self.enabled = enabled
+        self.ttl = ttl
+        self.client_factory = client_factory
+        self._entries = {}       # (modèle, version) -> (nom, expiration)
+        self._unsupported = set()
+        self._refreshing = {}    # (modèle, version) -> renouvellement en cours (Future)
+        self._lock = threading.Lock()
+        # Verrou distinct : ensure() garde _lock pendant l'appel réseau, lookup() ne doit pas l'attendre
+        self._refresh_lock = threading.Lock()
+
+    def lookup(self, template, model):
+        if not self.enabled:
+            return None
+        key = (model, template.version)
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        now = time.time()
+        if entry[1] - self.RENEW_MARGIN <= now:
+            self._renew(template, model)
+        if entry[1] < now:
+            return None
+        return entry[0]
+
+    def _renew(self, template, model):
+        key = (model, template.version)
+        with self._refresh_lock:
+            if key in self._refreshing or key in self._unsupported:
+                return
+            future = executors.threads.executor.submit(self._refresh, template, model)
+            self._refreshing[key] = future
+        future.add_done_callback(lambda _: self._refreshing.pop(key, None))
+
+    def _refresh(self, template, model):
+        try:
+            self.ensure(self.client_factory(), template, model)
+        except Exception as e:
+            print(f"Context cache renewal failed for {template.name} ({model}): {str(e)}")
+
+    def ensure(self, client, template, model):
+        """
+        Crée (ou renouvelle) le cache de contexte du préfixe. Appel bloquant : à lancer
+        au démarrage ou dans un thread.
+        """
+        key = (model, template.version)
+        if not self.enabled or key in self._unsupported:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            # Renouvellement avec une marge de 5 minutes avant expiration
+            if entry is not None and entry[1] - self.RENEW_MARGIN > time.time():
+                return entry[0]
+            try:
+                from google.genai import types
+                cached = client.caches.create(
+                    model=model,
+                    config=types.CreateCachedContentConfig(
+                        display_name=f"{template.name}-{template.version}",
+                        system_instruction=template.static_prefix,
+                        ttl=f"{int(self.ttl)}s",
+                    )
+                )
+                self._entries[key] = (cached.name, time.time() + self.ttl)
+                return cached.name
+            except Exception as e:
+                print(f"Context caching unavailable for {template.name} ({model}), using system instruction: {str(e)}")
+                self._unsupported.add(key)
+                return None
+
+    def status(self):
+        return {
+            "enabled": self.enabled,
+            "cached": {f"{model}:{version}": name for (model, version), (name, _) in self._entries.items()},
+            "unsupported": [f"{model}:{version}" for model, version in self._unsupported],
+        }
+
+prompt_accounting = PromptAccounting()
+
+context_cache = ContextCache(
+    enabled=os.getenv('GEMINI_CONTEXT_CACHE', '0') == '1',
+    ttl=float(os.getenv('GEMINI_CONTEXT_CACHE_TTL', 3600))
+)
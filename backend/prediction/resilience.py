@@ -0,0 +1,133 @@
+# File: prediction/resilience.py
+import random
+import threading
+import time
+
+# Codes HTTP considérés comme transitoires (surcharge, indisponibilité, délai dépassé)
+TRANSIENT_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+
+class CircuitOpenError(Exception):
+    """
+    Levée sans appel réseau lorsque le disjoncteur est ouvert : les endpoints
+    basculent immédiatement sur les moteurs locaux.
+    """
+
+class UpstreamTimeoutError(TimeoutError):
+    """
+    Le délai alloué à l'endpoint (tentatives et attentes comprises) est écoulé.
+    """
+
+def is_transient(error):
+    """
+    Une erreur transitoire justifie une nouvelle tentative et compte comme un signe
+    d'indisponibilité pour le disjoncteur. Les erreurs 4xx (requête invalide, clé
+    refusée) ne sont ni réessayées ni imputées à l'upstream.
+    """
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    code = getattr(error, 'code', None) or getattr(error, 'status_code', None)
+    if isinstance(code, int):
+        return code in TRANSIENT_STATUS_CODES
+    # Erreurs de transport httpx (connexion, lecture) sans code HTTP
+    return type(error).__module__.startswith(('httpx', 'httpcore', 'aiohttp'))
+
+def failure_reason(error):
+    """
+    Motif de bascule sur le fallback, en remontant la chaîne des exceptions
+    (les prédicteurs ré-emballent les erreurs du client).
+    """
+    seen = set()
+    while error is not None and id(error) not in seen:
+        seen.add(id(error))
+        if isinstance(error, CircuitOpenError):
+            return "circuit_open"
+        if isinstance(error, TimeoutError):
+            return "timeout"
+        error = error.__cause__ or error.__context__
+    return "gemini_error"
+
+class RetryPolicy:
+    """
+    Nouvelles tentatives bornées avec backoff exponentiel et jitter complet :
+    délai tiré uniformément dans [0, min(max_delay, base_delay * 2^tentative)].
+    """
+
+    def __init__(self, max_retries=2, base_delay=0.25, max_delay=4.0):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def delay(self, attempt):
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+class CircuitBreaker:
+    """
+    Disjoncteur : après `failure_threshold` échecs transitoires consécutifs, le circuit
+    s'ouvre et les appels échouent immédiatement pendant `reset_timeout` secondes.
+    Un seul appel d'essai est ensuite autorisé (semi-ouvert) : son succès referme le
+    circuit, son échec le rouvre.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name, failure_threshold=5, reset_timeout=30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self.probe_in_flight = False
+        self.last_error = None
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                self.probe_in_flight = False
+            if self.state == self.HALF_OPEN and not self.probe_in_flight:
+                self.probe_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.consecutive_failures = 0
+            self.opened_at = None
+            self.probe_in_flight = False
+
+    def record_failure(self, error=None):
+        with self._lock:
+            self.consecutive_failures += 1
+            self.last_error = f"{type(error).__name__}: {error}" if error is not None else None
+            if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    print(f"Circuit breaker {self.name} opened after {self.consecutive_failures} failures")
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+                self.probe_in_flight = False
+
+    def cancel_probe(self):
+        """
+        Libère l'appel d'essai autorisé en semi-ouvert s'il n'a finalement pas eu lieu.
+        """
+        with self._lock:
+            self.probe_in_flight = False
+
+    def snapshot(self):
+        with self._lock:
+            retry_in = None
+            if self.state == self.OPEN:
+                retry_in = max(0.0, round(self.reset_timeout - (time.monotonic() - self.opened_at), 1))
+            return {
+                "state": self.state,
+                "consecutive_failures": self.consecutive_failures,
+                "retry_in": retry_in,
+                "last_error": self.last_error,
+            }
@@ -0,0 +1,161 @@
+# File: prediction/response_cache.py
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from prediction.gemini_client import load_environment
+from prediction.executors import executors
+
+load_environment()
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'gemini_cache.sqlite3')
+
+class ResponseCache:
+    """
+    Cache persistant (SQLite) des réponses Gemini, adressé par le contenu.
+
+    La clé est le hash des entrées normalisées du prompt, du modèle et des paramètres
+    d'échantillonnage. Les réponses sont stockées en JSON et restituées sous leur type
+    Pydantic d'origine. Les entrées expirent après `ttl` secondes ; au-delà de
+    `max_entries`, les moins récemment utilisées sont supprimées.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, ttl=86400, max_entries=10000, enabled=True):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.enabled = enabled
+        self.hits = {}
+        self.misses = {}
+        self._lock = threading.Lock()
+        self._conn = None
+        self._count = None
+
+    def _connection(self):
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                " key TEXT PRIMARY KEY,"
+                " kind TEXT NOT NULL,"
+                " payload TEXT NOT NULL,"
+                " created_at REAL NOT NULL,"
+                " accessed_at REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_accessed ON responses(accessed_at)")
+            self._count = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        return self._conn
+
+    @staticmethod
+    def make_key(kind, model, params, inputs):
+        canonical = json.dumps(
+            {"kind": kind, "model": model, "params": params, "inputs": inputs},
+            sort_keys=True, ensure_ascii=False, separators=(',', ':'), default=str
+        )
+        return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+    def get(self, kind, key, response_type):
+        """
+        Retourne la réponse en cache sous forme de `response_type`, ou None.
+        """
+        if not self.enabled:
+            return None
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            row = conn.execute(
+                "SELECT payload, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None and row[1] + self.ttl < now:
+                conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._count -= 1
+                row = None
+            if row is None:
+                self.misses[kind] = self.misses.get(kind, 0) + 1
+                return None
+            conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+            self.hits[kind] = self.hits.get(kind, 0) + 1
+        return response_type.model_validate_json(row[0])
+
+    async def get_async(self, kind, key, response_type):
+        """
+        get() exécuté dans le pool de threads : la lecture SQLite (ou un checkpoint WAL)
+        ne bloque pas la boucle d'événements.
+        """
+        if not self.enabled:
+            return None
+        return await executors.run_io(self.get, kind, key, response_type, task="response_cache")
+
+    async def set_async(self, kind, key, value):
+        if not self.enabled or value is None:
+            return
+        await executors.run_io(self.set, kind, key, value, task="response_cache")
+
+    def set(self, kind, key, value):
+        if not self.enabled or value is None:
+            return
+        payload = value.model_dump_json()
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            existed = conn.execute("SELECT 1 FROM responses WHERE key = ?", (key,)).fetchone() is not None
+            conn.execute(
+                "INSERT OR REPLACE INTO responses (key, kind, payload, created_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (key, kind, payload, now, now)
+            )
+            if not existed:
+                self._count += 1
+            if self._count > self.max_entries:
+                self._evict(conn, now)
+
+    def _evict(self, conn, now):
+        conn.execute("DELETE FROM responses WHERE created_at < ?", (now - self.ttl,))
+        excess = conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0] - self.max_entries
+        if excess > 0:
+            conn.execute(
+                "DELETE FROM responses WHERE key IN ("
+                " SELECT key FROM responses ORDER BY accessed_at ASC LIMIT ?)",
+                (excess,)
+            )
+        self._count = conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def stats(self):
+        """
+        Compteurs de hits/misses par type de requête (diagnostic, compatibility, analyses).
+        """
+        with self._lock:
+            entries = self._count if self._count is not None else 0
+            kinds = sorted(set(self.hits) | set(self.misses))
+            return {
+                "enabled": self.enabled,
+                "entries": entries,
+                "max_entries": self.max_entries,
+                "ttl": self.ttl,
+                "hits": sum(self.hits.values()),
+                "misses": sum(self.misses.values()),
+                "by_kind": {
+                    kind: {"hits": self.hits.get(kind, 0), "misses": self.misses.get(kind, 0)}
+                    for kind in kinds
+                },
+            }
+
+    def clear(self):
+        with self._lock:
+            self._connection().execute("DELETE FROM responses")
+            self._count = 0
+            self.hits.clear()
+            self.misses.clear()
+
+def normalize_name(value):
+    return " ".join(str(value).lower().split()) if value is not None else ""
+
+response_cache = ResponseCache(
+    path=os.getenv('GEMINI_CACHE_PATH', DEFAULT_CACHE_PATH),
+    ttl=float(os.getenv('GEMINI_CACHE_TTL', 86400)),
+    max_entries=int(os.getenv('GEMINI_CACHE_MAX_ENTRIES', 10000)),
+    enabled=os.getenv('GEMINI_CACHE_ENABLED', '1') not in ('0', 'false', 'False')
+)
@@ -0,0 +1,43 @@
+# File: prediction/responses.py
+import json
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+from pydantic_core import to_json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+def _default(value):
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json")
+    if hasattr(value, "tolist"):
+        # Scalaires et tableaux NumPy
+        return value.tolist()
+    raise TypeError(f"Type non sérialisable en JSON : {type(value).__name__}")
+
+def dumps(content):
+    """
+    Sérialise un contenu de réponse en JSON (octets UTF-8).
+    Un modèle Pydantic est écrit directement par pydantic-core, sans passer par un
+    dictionnaire intermédiaire ; les dictionnaires et listes passent par orjson
+    (json de la bibliothèque standard si orjson n'est pas installé).
+    """
+    if isinstance(content, BaseModel):
+        return to_json(content)
+    if orjson is not None:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":"), default=_default).encode("utf-8")
+
+class FastJSONResponse(JSONResponse):
+    """
+    Réponse JSON sérialisée en une seule passe par dumps().
+
+    Un endpoint qui retourne FastJSONResponse(modèle) évite la re-validation du modèle
+    de réponse par FastAPI et la copie en dictionnaire : le `response_model` déclaré ne
+    sert plus qu'à la documentation OpenAPI.
+    """
+
+    def render(self, content):
+        return dumps(content)
@@ -0,0 +1,340 @@
+# File: prediction/scoring_engine.py
+import hashlib
+import secrets
+import threading
+from collections import OrderedDict
+import numpy as np
+from prediction.normalization import alias_key, symptom_aliases, analysis_aliases
+
+class ScoringJitter:
+    """
+    Variation (±amplitude points) ajoutée aux scores du calcul manuel :
+    - "off" : aucune variation ;
+    - "hashed" : variation dérivée d'un hash (SHAKE-128) du vecteur de caractéristiques
+      du patient, salé par la graine du déploiement : mêmes entrées, mêmes scores ;
+    - "random" : tirage aléatoire par un Generator unique (graine facultative).
+    Avec "off" et "hashed", le résultat est une fonction pure des entrées (mémoïsable).
+
+    Sans graine, le mode "hashed" tire un sel aléatoire propre au processus (affiché au
+    démarrage) : les scores ne sont stables que pour la durée de vie du processus et ne
+    sont pas prévisibles d'un déploiement à l'autre. Fixer la graine (SCORING_SEED) pour
+    des scores reproductibles entre redémarrages et entre workers.
+    """
+
+    MODES = ("off", "hashed", "random")
+
+    def __init__(self, mode="hashed", seed=None, amplitude=5.0):
+        if mode not in self.MODES:
+            raise ValueError(f"Mode de variation inconnu : {mode} (attendu : {', '.join(self.MODES)})")
+        self.mode = mode
+        self.amplitude = amplitude
+        if seed is None and mode == "hashed":
+            seed = secrets.randbits(64)
+            print(f"SCORING_SEED not set, using per-process scoring salt {seed}")
+        self.seed = seed
+        self.salt = str(seed).encode("utf-8")
+        self.generator = np.random.default_rng(seed)
+
+    @property
+    def deterministic(self):
+        return self.mode != "random"
+
+    def sample(self, features, n_targets):
+        """
+        Variations pour une matrice patients × caractéristiques : matrice patients × cibles.
+        """
+        shape = (features.shape[0], n_targets)
+        if self.mode == "off" or n_targets == 0:
+            return np.zeros(shape)
+        if self.mode == "random":
+            return self.generator.uniform(-self.amplitude, self.amplitude, size=shape)
+        digests = b"".join(
+            hashlib.shake_128(self.salt + row.tobytes()).digest(8 * n_targets) for row in features
+        )
+        unit = np.frombuffer(digests, dtype="<u8").reshape(shape) / 2.0 ** 64
+        return (2 * unit - 1) * self.amplitude
+
+class ScoringEngine:
+    """
+    Moteur de scoring à base de règles, compilé une seule fois en matrices NumPy.
+
+    Chaque cible (catégorie ou maladie) est décrite par une règle déclarative : poids des
+    symptômes, prédicats sur les analyses et pondération symptômes/analyses. À la
+    compilation, on construit :
+      - une matrice symptômes (cibles × vocabulaire) déjà normalisée en pourcentage ;
+      - une matrice analyses (cibles × prédicats) contenant les points de chaque prédicat.
+    Le score de toutes les cibles d'un patient est alors un produit matrice-vecteur.
+
+    Symptômes et analyses sont indexés par identifiant canonique (prediction/normalization.py) :
+    les variantes d'orthographe, l'anglais et les abréviations (TDR, GE...) sont reconnus.
+    """
+
+    def __init__(self, categories, category_threshold=30, jitter=None):
+        """
+        `categories` : liste de (règle de catégorie, [règles des maladies de la catégorie]).
+        `jitter` : ScoringJitter appliqué aux scores (par défaut : dérivé des entrées).
+        """
+        self.category_threshold = category_threshold
+        self.jitter = jitter or ScoringJitter()
+
+        targets = []
+        self.category_rows = []
+        self.disease_rows = []  # (ligne de la catégorie, ligne de la maladie, règle)
+        for category_rule, disease_rules in categories:
+            category_row = len(targets)
+            targets.append(category_rule)
+            self.category_rows.append(category_row)
+            for disease_rule in disease_rules:
+                self.disease_rows.append((category_row, len(targets), disease_rule))
+                targets.append(disease_rule)
+        self.targets = targets
+
+        # Vocabulaire des symptômes : identifiant canonique -> colonne
+        self.symptom_index = {}
+        for rule in targets:
+            for name in rule["symptoms"]:
+                self.symptom_index.setdefault(symptom_aliases.register(name), len(self.symptom_index))
+
+        # Prédicats d'analyses dédupliqués entre cibles
+        predicates = []
+        predicate_index = {}
+        for rule in targets:
+            for predicate in rule.get("analyses", []):
+                key = self._predicate_key(predicate)
+                if key not in predicate_index:
+                    predicate_index[key] = len(predicates)
+                    predicates.append(predicate)
+        self.predicates = predicates
+
+        # Prédicats à égalité de nom : index par identifiant d'analyse ; prédicats
+        # "contains" : fragment et identifiants dont un alias contient ce fragment
+        self.exact_predicates = {}
+        self.contains_predicates = []
+        for i, predicate in enumerate(predicates):
+            if predicate.get("match", "equals") == "contains":
+                fragment = alias_key(predicate["name"])
+                self.contains_predicates.append((fragment, analysis_aliases.ids_containing(fragment), i))
+            else:
+                self.exact_predicates.setdefault(analysis_aliases.register(predicate["name"]), []).append(i)
+
+        n_targets = len(targets)
+        self.symptom_matrix = np.zeros((n_targets, len(self.symptom_index)))
+        self.analysis_matrix = np.zeros((n_targets, len(predicates)))
+        self.symptom_weights = np.zeros(n_targets)
+        self.analysis_weights = np.zeros(n_targets)
+        for row, rule in enumerate(targets):
+            total_weight = sum(rule["symptoms"].values())
+            if total_weight > 0:
+                for name, weight in rule["symptoms"].items():
+                    column = self.symptom_index[symptom_aliases.register(name)]
+                    self.symptom_matrix[row, column] += weight / total_weight * 100
+            for predicate in rule.get("analyses", []):
+                column = predicate_index[self._predicate_key(predicate)]
+                self.analysis_matrix[row, column] += predicate.get("points", 50)
+            self.symptom_weights[row] = rule["symptom_weight"]
+            self.analysis_weights[row] = rule["analysis_weight"]
+
+        # Les pondérations sont repliées dans les matrices : un seul produit par patient
+        self.weight_matrix = np.hstack([
+            self.symptom_matrix * self.symptom_weights[:, None],
+            self.analysis_matrix * self.analysis_weights[:, None],
+        ])
+
+    @staticmethod
+    def _predicate_key(predicate):
+        return (
+            alias_key(predicate["name"]),
+            predicate.get("match", "equals"),
+            predicate.get("resultType"),
+            predicate.get("positive"),
+            predicate.get("below"),
+            predicate.get("above"),
+        )
+
+    @staticmethod
+    def _predicate_matches(predicate, analysis):
+        if analysis.resultType != predicate.get("resultType"):
+            return False
+        if predicate.get("positive"):
+            return str(analysis.result).lower() == "positif"
+        try:
+            value = float(analysis.result)
+        except (TypeError, ValueError):
+            return False
+        below = predicate.get("below")
+        above = predicate.get("above")
+        return (below is not None and value < below) or (above is not None and value > above)
+
+    def features(self, symptoms, analyses):
+        """
+        Vecteur de caractéristiques d'un patient : occurrences des symptômes du
+        vocabulaire, puis nombre d'analyses satisfaisant chaque prédicat.
+        """
+        vector = np.zeros(len(self.symptom_index) + len(self.predicates))
+        for symptom_id in symptom_aliases.resolve_all(symptoms):
+            column = self.symptom_index.get(symptom_id)
+            if column is not None:
+                vector[column] += 1
+
+        offset = len(self.symptom_index)
+        for analysis, analysis_id in zip(analyses, analysis_aliases.resolve_all(analyses)):
+            candidates = list(self.exact_predicates.get(analysis_id, ()))
+            if self.contains_predicates:
+                # Fragment présent dans un alias de l'analyse ou dans le nom reçu lui-même
+                # ("Test hémoglobine" satisfait "test" bien que résolu en hémoglobine)
+                key = alias_key(analysis.name)
+                candidates.extend(
+                    i for fragment, ids, i in self.contains_predicates if analysis_id in ids or fragment in key
+                )
+            for i in candidates:
+                if self._predicate_matches(self.predicates[i], analysis):
+                    vector[offset + i] += 1
+        return vector
+
+    def score(self, symptoms, analyses):
+        """
+        Scores (0-100) de toutes les cibles, dans l'ordre de compilation.
+        """
+        features = self.features(symptoms, analyses)
+        combined = self.weight_matrix @ features
+        variance = self.jitter.sample(features[None, :], len(self.targets))[0]
+        return np.clip(combined + variance, 0, 100)
+
+    def score_batch(self, patients):
+        """
+        Scores de plusieurs patients à la fois : matrice patients × caractéristiques
+        multipliée par la matrice des poids. `patients` : liste de (symptômes, analyses).
+        Retourne une matrice patients × cibles.
+        """
+        if not patients:
+            return np.zeros((0, len(self.targets)))
+        features = np.vstack([self.features(symptoms, analyses) for symptoms, analyses in patients])
+        combined = features @ self.weight_matrix.T
+        variance = self.jitter.sample(features, len(self.targets))
+        return np.clip(combined + variance, 0, 100)
+
+    def results(self, scores):
+        """
+        Pour chaque catégorie dont le score dépasse le seuil, retourne les scores des
+        maladies de cette catégorie.
+        """
+        return [
+            disease_result(rule, scores[disease_row])
+            for category_row, disease_row, rule in self.disease_rows
+            if scores[category_row] > self.category_threshold
+        ]
+
+    def predict(self, symptoms, analyses, history, recent_diseases):
+        return self.results(self.score(symptoms, analyses))
+
+    def predict_batch(self, patients):
+        """
+        Variante de predict pour une liste de (symptômes, analyses, antécédents, maladies récentes).
+        """
+        scores = self.score_batch([(symptoms, analyses) for symptoms, analyses, _, _ in patients])
+        return [self.results(row) for row in scores]
+
+def disease_result(rule, score):
+    return {
+        "id": rule["id"],
+        "disease": rule["name"],
+        "probability": round(float(score), 2)
+    }
+
+class TieredScoringEngine:
+    """
+    Scoring en deux temps : les catégories, toujours chargées, sont évaluées pour chaque
+    patient ; les maladies d'une catégorie ne le sont que si celle-ci dépasse le seuil.
+    Les règles des maladies d'une catégorie sont chargées (`load_diseases(nom)`) et
+    compilées dans leur propre ScoringEngine la première fois que la catégorie passe
+    le seuil.
+
+    Si la variation est déterministe, les résultats sont mémorisés par entrées (noms des
+    symptômes, analyses et résultats), au plus `memo_size` entrées.
+    """
+
+    def __init__(self, category_rules, load_diseases, category_threshold=30, jitter=None, memo_size=4096):
+        self.category_rules = category_rules
+        self.load_diseases = load_diseases
+        self.category_threshold = category_threshold
+        self.jitter = jitter or ScoringJitter()
+        self.memo_size = memo_size if self.jitter.deterministic else 0
+        self.category_engine = ScoringEngine([(rule, []) for rule in category_rules], category_threshold, self.jitter)
+        self._disease_engines = {}  # indice de catégorie -> ScoringEngine
+        self._memo = OrderedDict()  # clé des entrées -> résultats
+        self.memo_hits = 0
+        self.memo_misses = 0
+        self._lock = threading.Lock()
+
+    def disease_engine(self, index):
+        engine = self._disease_engines.get(index)
+        if engine is None:
+            with self._lock:
+                engine = self._disease_engines.get(index)
+                if engine is None:
+                    rule = self.category_rules[index]
+                    engine = ScoringEngine([(rule, self.load_diseases(rule["name"]))], self.category_threshold, self.jitter)
+                    self._disease_engines[index] = engine
+        return engine
+
+    @staticmethod
+    def input_key(symptoms, analyses):
+        """
+        Clé de mémoïsation : seules les entrées lues par le scoring, indépendamment de l'ordre.
+        """
+        return (
+            tuple(sorted(symptom.name for symptom in symptoms)),
+            tuple(sorted((analysis.name, str(analysis.result), analysis.resultType) for analysis in analyses)),
+        )
+
+    def predict(self, symptoms, analyses, history, recent_diseases):
+        if not self.memo_size:
+            return self._predict(symptoms, analyses)
+        key = self.input_key(symptoms, analyses)
+        with self._lock:
+            results = self._memo.get(key)
+            if results is not None:
+                self._memo.move_to_end(key)
+                self.memo_hits += 1
+        if results is None:
+            results = self._predict(symptoms, analyses)
+            with self._lock:
+                self.memo_misses += 1
+                self._memo[key] = results
+                while len(self._memo) > self.memo_size:
+                    self._memo.popitem(last=False)
+        return [dict(result) for result in results]
+
+    def memo_stats(self):
+        return {"size": len(self._memo), "hits": self.memo_hits, "misses": self.memo_misses}
+
+    def _predict(self, symptoms, analyses):
+        category_scores = self.category_engine.score(symptoms, analyses)
+        results = []
+        for index, row in enumerate(self.category_engine.category_rows):
+            if category_scores[row] > self.category_threshold:
+                engine = self.disease_engine(index)
+                scores = engine.score(symptoms, analyses)
+                results.extend(disease_result(rule, scores[disease_row]) for _, disease_row, rule in engine.disease_rows)
+        return results
+
+    def predict_batch(self, patients):
+        """
+        Variante de predict pour une liste de (symptômes, analyses, antécédents, maladies
+        récentes) : une multiplication pour les catégories, puis une par catégorie
+        retenue, limitée aux patients qui la dépassent.
+        """
+        pairs = [(symptoms, analyses) for symptoms, analyses, _, _ in patients]
+        category_scores = self.category_engine.score_batch(pairs)
+        results = [[] for _ in pairs]
+        for index, row in enumerate(self.category_engine.category_rows):
+            selected = np.nonzero(category_scores[:, row] > self.category_threshold)[0]
+            if len(selected) == 0:
+                continue
+            engine = self.disease_engine(index)
+            scores = engine.score_batch([pairs[i] for i in selected])
+            for patient, patient_scores in zip(selected, scores):
+                results[patient].extend(
+                    disease_result(rule, patient_scores[disease_row]) for _, disease_row, rule in engine.disease_rows
+                )
+        return results
@@ -0,0 +1,97 @@
+# File: prediction/single_flight.py
+import asyncio
+from prediction.metrics import registry
+
+SINGLE_FLIGHT_REQUESTS = registry.counter(
+    "esante_single_flight_requests_total",
+    "Requêtes passées par la déduplication (leader : appel effectué, shared : résultat partagé, "
+    "superseded : remplacée par une requête plus récente de la session, abandoned : appel annulé)",
+    ("flight", "outcome")
+)
+
+class SupersededError(Exception):
+    """
+    Levée pour une requête remplacée par une requête plus récente de la même session
+    (ex. une case recochée avant la fin de la vérification précédente).
+    """
+
+class _Flight:
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task):
+        self.task = task
+        self.waiters = 0
+
+class SingleFlight:
+    """
+    Déduplication des appels concurrents identiques : tant qu'un appel pour une clé est
+    en cours, les requêtes de même clé attendent son résultat (ou son exception) au lieu
+    de relancer l'appel. Rien n'est conservé une fois l'appel terminé : le cache de
+    réponses reste le seul cache.
+
+    Avec un identifiant de session, une nouvelle requête de clé différente remplace la
+    précédente de la même session, qui reçoit SupersededError. Un appel dont plus
+    aucune requête n'attend le résultat est annulé.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self._flights = {}   # clé -> _Flight
+        self._sessions = {}  # session -> (clé, futur signalant le remplacement)
+
+    def _forget(self, key, flight):
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+
+    async def do(self, key, factory, session=None):
+        """
+        Retourne le résultat de `factory()` (coroutine) pour `key`, en partageant l'appel
+        en cours s'il existe.
+        """
+        superseded = None
+        if session is not None:
+            previous = self._sessions.get(session)
+            if previous is not None and previous[0] != key and not previous[1].done():
+                previous[1].set_result(None)
+            superseded = asyncio.get_running_loop().create_future()
+            self._sessions[session] = (key, superseded)
+
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = _Flight(asyncio.ensure_future(factory()))
+            self._flights[key] = flight
+            flight.task.add_done_callback(lambda _, key=key, flight=flight: self._forget(key, flight))
+            SINGLE_FLIGHT_REQUESTS.inc(flight=self.name, outcome="leader")
+        else:
+            SINGLE_FLIGHT_REQUESTS.inc(flight=self.name, outcome="shared")
+
+        flight.waiters += 1
+        try:
+            if superseded is None:
+                return await asyncio.shield(flight.task)
+            await asyncio.wait((flight.task, superseded), return_when=asyncio.FIRST_COMPLETED)
+            if not flight.task.done():
+                SINGLE_FLIGHT_REQUESTS.inc(flight=self.name, outcome="superseded")
+                raise SupersededError(f"Requête remplacée par une requête plus récente de la session {session}")
+            return flight.task.result()
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                flight.task.cancel()
+                self._forget(key, flight)
+                SINGLE_FLIGHT_REQUESTS.inc(flight=self.name, outcome="abandoned")
+            if session is not None and self._sessions.get(session, (None, None))[1] is superseded:
+                del self._sessions[session]
+
+    def in_flight(self):
+        return len(self._flights)
+
+compatibility_flights = SingleFlight("compatibility")
+analysis_flights = SingleFlight("analyses")
+
+registry.collector(
+    "esante_single_flight_in_flight",
+    "Appels en cours par couche de déduplication",
+    ("flight",),
+    lambda: {(flights.name,): flights.in_flight() for flights in (compatibility_flights, analysis_flights)}
+)
@@ -0,0 +1,8 @@
+# File: prediction/treatments/infectious/__init__.py
+from prediction.plugins import plugins
+
+# Traitements des maladies infectieuses, retrouvés par le nom (ou un alias) du diagnostic.
+plugins.declare("treatment", "Malaria", "prediction.treatments.infectious.malaria_treatment:calculate_malaria_treatment",
+                category="Infectious", aliases=["paludisme", "palu"])
+plugins.declare("treatment", "Dengue", "prediction.treatments.infectious.dengue_treatment:calculate_dengue_treatment",
+                category="Infectious")
@@ -0,0 +1,15 @@
+# File: tests/conftest.py
+import os
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+# Fichiers persistants des tests dans un dossier temporaire ; pas de pool de processus ni de Gemini
+_DATA_DIR = tempfile.mkdtemp(prefix="esante-tests-")
+os.environ.setdefault("GEMINI_CACHE_PATH", os.path.join(_DATA_DIR, "gemini_cache.sqlite3"))
+os.environ.setdefault("CONSULTATION_DB_PATH", os.path.join(_DATA_DIR, "consultations.sqlite3"))
+os.environ.setdefault("AUDIT_LOG_DIR", os.path.join(_DATA_DIR, "audit"))
+os.environ.setdefault("EXECUTOR_PROCESSES", "0")
+os.environ["GEMINI_API_KEY"] = ""
@@ -0,0 +1,120 @@
+# File: tests/test_audit_log.py
+import asyncio
+import os
+import pytest
+from prediction.audit_log import AuditLog, AuditRejected, MAGIC, encode_record, read_records, read_segment, segment_name
+
+DAY = 86400
+
+def record(log, endpoint="diagnostic", output=None, photo=None):
+    inputs = {"symptoms": [{"name": "fièvre"}], "analyses": [{"name": "TDR", "photo": photo}]}
+    return log.record(endpoint, inputs, output or {"diagnostics": []}, "gemini")
+
+def test_records_are_replayed_in_order(tmp_path):
+    async def scenario():
+        log = AuditLog(str(tmp_path), fsync_interval=0)
+        for i in range(5):
+            await record(log, output={"index": i}, photo="aGVsbG8=")
+        await log.close()
+
+    asyncio.run(scenario())
+    records = list(read_records(str(tmp_path)))
+    assert [r["output"]["index"] for r in records] == list(range(5))
+    assert records[0]["endpoint"] == "diagnostic"
+    # La photo base64 est remplacée par son empreinte
+    assert records[0]["inputs"]["analyses"][0]["photo"].startswith("src-")
+
+def test_segments_rotate_daily(tmp_path):
+    log = AuditLog(str(tmp_path))
+    base = 1_700_000_000
+    log._write([{"id": "a", "ts": base, "endpoint": "diagnostic"}, {"id": "b", "ts": base + DAY, "endpoint": "diagnostic"}])
+    log._close_file()
+    assert sorted(os.listdir(tmp_path)) == [segment_name(base), segment_name(base + DAY)]
+    assert [r["id"] for r in read_records(str(tmp_path))] == ["a", "b"]
+    assert [r["id"] for r in read_records(str(tmp_path), start=segment_name(base + DAY)[6:-4])] == ["b"]
+
+def test_truncated_tail_is_skipped(tmp_path):
+    path = tmp_path / "audit-20250101.log"
+    frames = encode_record({"id": "a"}) + encode_record({"id": "b"})
+    path.write_bytes(MAGIC + frames[:-3])
+    assert [r["id"] for r in read_segment(str(path))] == ["a"]
+
+def test_corrupted_record_raises(tmp_path):
+    path = tmp_path / "audit-20250101.log"
+    frame = bytearray(encode_record({"id": "a"}))
+    frame[-1] ^= 0xFF
+    path.write_bytes(MAGIC + bytes(frame))
+    with pytest.raises(ValueError):
+        list(read_segment(str(path)))
+
+def test_full_queue_policies(tmp_path):
+    async def scenario(policy):
+        log = AuditLog(str(tmp_path / policy), max_queue=1, policy=policy, wait_timeout=1.0)
+        # Tâche d'écriture suspendue : la file remplie le reste
+        paused = log._writer = asyncio.get_running_loop().create_future()
+        log._queue = asyncio.Queue(1)
+        await record(log)
+        if policy == "wait":
+            # Tâche d'écriture relancée pendant l'attente : une place se libère
+            asyncio.get_running_loop().call_later(0.01, lambda: (paused.cancel(), log.start()))
+        if policy == "reject":
+            with pytest.raises(AuditRejected):
+                await record(log)
+        else:
+            await record(log)
+        paused.cancel()
+        await log.close()
+        return sum(1 for _ in read_records(log.directory))
+
+    assert asyncio.run(scenario("drop")) == 1
+    # En attente, la tâche d'écriture libère une place : rien n'est perdu
+    assert asyncio.run(scenario("wait")) == 2
+    assert asyncio.run(scenario("reject")) == 1
+
+def test_queued_records_hold_no_base64(tmp_path):
+    photo = "data:image/jpeg;base64," + "QUFB" * 100_000
+
+    async def scenario():
+        log = AuditLog(str(tmp_path))
+        log._writer = asyncio.get_running_loop().create_future()
+        log._queue = asyncio.Queue()
+        await record(log, photo=photo)
+        return log._queue.get_nowait()
+
+    queued = asyncio.run(scenario())
+    assert queued["inputs"]["analyses"][0]["photo"].startswith("src-")
+    assert "QUFB" not in repr(queued)
+
+def test_writer_survives_fsync_failure(tmp_path):
+    async def scenario():
+        log = AuditLog(str(tmp_path), fsync_interval=0.01)
+        failures = []
+
+        def failing_sync():
+            failures.append(True)
+            raise OSError("disk unavailable")
+
+        log._sync = failing_sync
+        # Pas de fsync dans _write : seule la synchronisation de la file au repos échoue
+        log._synced_at = float("inf")
+        await record(log)
+        await asyncio.sleep(0.05)
+        assert failures and not log._writer.done()
+        del log._sync
+        await record(log)
+        await log.close()
+
+    asyncio.run(scenario())
+    assert sum(1 for _ in read_records(str(tmp_path))) == 2
+
+def test_stopped_writer_is_restarted(tmp_path):
+    async def scenario():
+        log = AuditLog(str(tmp_path))
+        log.start()
+        log._writer.cancel()
+        await asyncio.sleep(0)
+        await record(log)
+        await log.close()
+
+    asyncio.run(scenario())
+    assert sum(1 for _ in read_records(str(tmp_path))) == 1
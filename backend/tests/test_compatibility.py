@@ -0,0 +1,34 @@
+# File: tests/test_compatibility.py
+import asyncio
+from fastapi.testclient import TestClient
+import app
+from prediction.gemini_compatibility import compatibility_checker
+
+def med(med_id, name, category=""):
+    return {"id": med_id, "name": name, "category": category, "indication": "", "dosage": ""}
+
+def test_unknown_pairs_are_not_declared_compatible_when_gemini_fails():
+    # Pas de clé API dans les tests : Gemini échoue, les paires avec "Zzz" restent non vérifiées
+    medications = [med(1, "Fer"), med(2, "Warfarine"), med(3, "Zzz")]
+    result = asyncio.run(compatibility_checker.check_compatibility_async(medications))
+    assert not result.compatible
+    assert result.warnings == []
+    assert result.unverified_pairs == [[1, 3], [2, 3]]
+    assert result.source == "rules"
+    assert compatibility_checker.check_compatibility(medications) == result
+
+def test_pairs_known_to_the_rules_need_no_gemini():
+    result = asyncio.run(compatibility_checker.check_compatibility_async([med(1, "Fer"), med(2, "Ciprofloxacine")]))
+    assert not result.compatible
+    assert result.unverified_pairs == []
+    assert [sorted(w.medication_ids) for w in result.warnings] == [[1, 2]]
+
+def test_endpoint_reports_unverified_pairs():
+    client = TestClient(app.app)
+    response = client.post("/check-medication-compatibility", json={"medications": [
+        {**med(1, "Fer"), "category": "Supplément"}, {**med(2, "Zzz"), "category": "Autre"}
+    ]})
+    assert response.status_code == 200
+    body = response.json()
+    assert body["compatible"] is False
+    assert body["unverified_pairs"] == [[1, 2]]
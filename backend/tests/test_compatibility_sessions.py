@@ -0,0 +1,38 @@
+# File: tests/test_compatibility_sessions.py
+import asyncio
+from prediction.compatibility_sessions import CompatibilitySessionStore
+
+def med(med_id, name, category=""):
+    return {"id": med_id, "name": name, "category": category, "indication": "", "dosage": ""}
+
+def apply(store, session_id, added=(), removed=(), patient_info=None):
+    return asyncio.run(store.apply_delta(session_id, list(added), list(removed), patient_info))
+
+def test_delta_without_patient_info_keeps_the_selection():
+    store = CompatibilitySessionStore()
+    apply(store, "s", [med(1, "Fer")], patient_info={"age": 40})
+    result = apply(store, "s", [med(2, "Ciprofloxacine")])
+    assert not result.compatible
+    assert [sorted(w.medication_ids) for w in result.warnings] == [[1, 2]]
+    assert store.get("s").patient_info == {"age": 40}
+
+def test_patient_change_rechecks_existing_medications():
+    store = CompatibilitySessionStore()
+    assert apply(store, "s", [med(1, "Aspirine")], patient_info={"age": 40}).compatible
+    result = apply(store, "s", patient_info={"age": 10})
+    assert not result.compatible
+    assert result.warnings[0].medication_ids == [1]
+    assert apply(store, "s", patient_info={"age": 40}).compatible
+
+def test_removing_a_medication_drops_its_warnings():
+    store = CompatibilitySessionStore()
+    apply(store, "s", [med(1, "Fer"), med(2, "Ciprofloxacine")])
+    assert apply(store, "s", removed=[2]).compatible
+
+def test_pairs_unknown_to_the_rules_stay_unverified_without_gemini():
+    store = CompatibilitySessionStore()
+    result = apply(store, "s", [med(1, "Fer"), med(2, "Warfarine"), med(3, "Zzz")])
+    assert not result.compatible
+    assert result.unverified_pairs == [[1, 3], [2, 3]]
+    assert result.source == "rules"
+    assert apply(store, "s", removed=[3]).unverified_pairs == []
@@ -0,0 +1,119 @@
+# File: tests/test_consultation_store.py
+import datetime
+import threading
+import pytest
+from fastapi.testclient import TestClient
+import app
+from prediction.consultation_store import ConnectionPool, ConsultationStore, normalize_date
+
+PATIENT = {"cmuNumber": "CI-0012345", "firstName": "Aya", "lastName": "Kouassi", "age": 34}
+
+def days_ago(days):
+    return (datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(days=days)).isoformat()
+
+def consultation(date, symptoms=("Fièvre",), history=()):
+    return {
+        "consultationDate": date,
+        "medicalHistory": [{"name": name, "details": []} for name in history],
+        "symptoms": [{"name": name, "details": []} for name in symptoms],
+        "analyses": [{"name": "TDR", "result": "positif", "resultType": "boolean", "photo": "sha256:abc"}],
+        "patientInfo": {"age": 34},
+    }
+
+@pytest.fixture
+def store(tmp_path):
+    store = ConsultationStore(str(tmp_path / "consultations.sqlite3"), pool_size=2)
+    yield store
+    store.close()
+
+def test_normalize_date_converts_to_utc():
+    assert normalize_date("2025-01-15T10:30:00+02:00") == "2025-01-15T08:30:00"
+    assert normalize_date("2025-01-15T10:30:00Z") == "2025-01-15T10:30:00"
+
+def test_history_and_day_listing(store):
+    first = store.save(PATIENT, consultation("2025-01-15T08:00:00Z"))
+    second = store.save({**PATIENT, "age": 35}, consultation("2025-02-01T09:00:00Z"))
+    store.save({**PATIENT, "cmuNumber": "CI-999"}, consultation("2025-01-15T12:00:00Z"))
+    assert store.set_diagnostic(first, "Paludisme")
+    assert not store.set_diagnostic(9999, "Paludisme")
+
+    assert [c["id"] for c in store.history(PATIENT["cmuNumber"])] == [second, first]
+    assert store.history(PATIENT["cmuNumber"], limit=1)[0]["id"] == second
+    assert [c["patientRef"] for c in store.on_date("2025-01-15")] == ["CI-0012345", "CI-999"]
+    assert store.on_date("2025-01-16") == []
+    saved = store.consultation(first)
+    assert saved["diagnostic"] == "Paludisme"
+    assert saved["analyses"][0]["photo"] == "sha256:abc"
+    assert store.consultation(9999) is None
+
+def test_patient_context(store):
+    old = store.save(PATIENT, consultation(days_ago(30), history=["Asthme"]))
+    store.set_diagnostic(old, "Paludisme")
+    current = store.save(PATIENT, consultation(days_ago(0), symptoms=("Toux",)))
+
+    context = store.patient_context(PATIENT["cmuNumber"])
+    # Antécédents de la dernière consultation qui en renseigne
+    assert context["medicalHistory"][0]["name"] == "Asthme"
+    assert context["recentDiseases"] == [{"name": "Paludisme", "date": 30}]
+
+    context = store.patient_context(consultation_id=current)
+    assert context["symptoms"][0]["name"] == "Toux"
+    assert context["medicalHistory"][0]["name"] == "Asthme"
+    assert context["recentDiseases"] == [{"name": "Paludisme", "date": 30}]
+
+    assert store.patient_context("CI-inconnu") is None
+    assert store.patient_context("CI-999", consultation_id=current) is None
+
+def test_images_are_stored_once(store):
+    image = ("abc", "image/jpeg", b"\xff\xd8\xff", 10, 20)
+    store.save(PATIENT, consultation("2025-01-15T08:00:00Z"), [image])
+    store.save(PATIENT, consultation("2025-01-16T08:00:00Z"), [image])
+    assert store.images(["abc", "inconnue"]) == [image]
+    assert store.images([]) == []
+
+def test_pool_reuses_connections_and_bounds_them(tmp_path):
+    pool = ConnectionPool(str(tmp_path / "pool.sqlite3"), size=2, timeout=0.05)
+    with pool.connection() as first:
+        pass
+    with pool.connection() as again:
+        assert again is first
+    with pool.connection(), pool.connection():
+        assert pool.stats() == {"size": 2, "open": 2, "idle": 0}
+        with pytest.raises(TimeoutError):
+            with pool.connection():
+                pass
+    assert pool.stats()["idle"] == 2
+    pool.close()
+    assert pool.stats()["open"] == 0
+
+def test_concurrent_saves(store):
+    ids = []
+
+    def save(i):
+        ids.append(store.save({**PATIENT, "cmuNumber": f"CI-{i}"}, consultation("2025-01-15T08:00:00Z")))
+
+    threads = [threading.Thread(target=save, args=(i,)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(set(ids)) == 8
+    assert len(store.on_date("2025-01-15")) == 8
+
+def test_consultation_endpoints():
+    client = TestClient(app.app)
+    response = client.post("/consultations", json={
+        "patient": {**PATIENT, "cmuNumber": "CI-API-1"},
+        "consultationDate": "2025-03-10T09:00:00Z",
+        "symptoms": [{"name": "Fièvre", "details": []}, {"name": "Frissons", "details": []}],
+    })
+    assert response.status_code == 200
+    consultation_id = response.json()["consultationId"]
+    history = client.get("/patients/CI-API-1/consultations").json()["consultations"]
+    assert [c["id"] for c in history] == [consultation_id]
+    assert consultation_id in [c["id"] for c in client.get("/consultations", params={"date": "2025-03-10"}).json()["consultations"]]
+    assert client.get("/consultations", params={"date": "hier"}).status_code == 400
+    # Diagnostic par référence ; une consultation inconnue donne 404
+    response = client.post("/diagnostic", json={"consultationId": consultation_id})
+    assert response.status_code == 200 and response.json()["diagnostics"]
+    assert client.post("/diagnostic", json={"consultationId": 999999}).status_code == 404
@@ -0,0 +1,24 @@
+# File: tests/test_diagnostic.py
+import pytest
+from fastapi.testclient import TestClient
+from pydantic import ValidationError
+import app
+
+SCORE = {"id": 1, "disease": "Paludisme", "probability": 72.5}
+
+def test_outputs_validate_a_single_diagnostic_type():
+    assert app.FallbackDiagnosticOutput(diagnostics=[SCORE], source="fallback").diagnostics[0].disease == "Paludisme"
+    with pytest.raises(ValidationError):
+        app.DiagnosticOutput(diagnostics=[SCORE], source="gemini")
+
+def test_fallback_diagnostic_has_no_explanation():
+    # Pas de clé API dans les tests : le calcul manuel répond
+    client = TestClient(app.app)
+    response = client.post("/diagnostic", json={
+        "symptoms": [{"name": "Fièvre", "details": []}, {"name": "Frissons", "details": []}]
+    })
+    assert response.status_code == 200
+    body = response.json()
+    assert body["source"] == "fallback"
+    assert body["diagnostics"]
+    assert set(body["diagnostics"][0]) == {"id", "disease", "probability"}
@@ -0,0 +1,109 @@
+# File: tests/test_image_pipeline.py
+import asyncio
+import base64
+import io
+import threading
+from types import SimpleNamespace
+import pytest
+from PIL import Image
+from prediction.executors import executors
+from prediction.gemini_predictor import gemini_predictor
+from prediction.image_pipeline import ImagePipeline, image_pipeline
+
+def photo(size=(64, 48), color=(200, 30, 30)):
+    output = io.BytesIO()
+    Image.new("RGB", size, color).save(output, format="JPEG")
+    return "data:image/jpeg;base64," + base64.b64encode(output.getvalue()).decode("ascii")
+
+def test_process_async_sends_decoded_bytes_to_the_pool(monkeypatch):
+    pipeline = ImagePipeline(max_dimension=32)
+    payloads = []
+    run_cpu = executors.run_cpu
+
+    async def recording_run_cpu(fn, payload, *args, task=None):
+        payloads.append(payload)
+        return await run_cpu(fn, payload, *args, task=task)
+
+    monkeypatch.setattr(executors, "run_cpu", recording_run_cpu)
+    source = photo()
+    image = asyncio.run(pipeline.process_async(source))
+    assert isinstance(payloads[0], (bytes, bytearray))
+    assert (image.width, image.height) == (32, 24)
+    assert image.digest == ImagePipeline(max_dimension=32).process(source).digest
+    # Deuxième envoi de la même photo : servi par le cache, sans passer par le pool
+    assert asyncio.run(pipeline.process_async(source)) is image
+    assert len(payloads) == 1
+
+def test_build_contents_uses_prepared_images(monkeypatch):
+    analyses = [SimpleNamespace(name="Frottis", result="", unit=None, photo=photo(color=(10, 90, 160))),
+                SimpleNamespace(name="Radio", result="", unit=None, photo="sha256:inconnue")]
+    images = asyncio.run(gemini_predictor.prepare_images(analyses))
+
+    def no_sync_processing(photo):
+        raise AssertionError("image traitée sur la boucle d'événements")
+
+    monkeypatch.setattr(image_pipeline, "process", no_sync_processing)
+    contents = gemini_predictor.build_contents("prompt", analyses, images)
+    # Le prompt, puis l'image valide et son libellé ; la référence inconnue est ignorée
+    assert len(contents) == 3
+    assert contents[1].inline_data.data == images[analyses[0].photo].data
+    assert gemini_predictor._photo_digest(analyses[0].photo, images) == images[analyses[0].photo].digest
+    gemini_predictor.cache_key([], analyses, [], [], None, images)
+
+def test_concurrent_requests_for_the_same_photo_share_the_work(monkeypatch):
+    pipeline = ImagePipeline(max_dimension=32)
+    calls = []
+    run_cpu = executors.run_cpu
+
+    async def counting_run_cpu(fn, *args, task=None):
+        calls.append(task)
+        return await run_cpu(fn, *args, task=task)
+
+    monkeypatch.setattr(executors, "run_cpu", counting_run_cpu)
+    source = photo()
+    # Même contenu sous deux formes (data URL et base64 seul) : un seul passage dans le pool
+    bare = source.split(",", 1)[1]
+
+    async def scenario():
+        return await asyncio.gather(*(pipeline.process_async(p) for p in (source, source, bare, bare)))
+
+    images = asyncio.run(scenario())
+    assert len(calls) == 1
+    assert len({image.digest for image in images}) == 1
+
+def test_eviction_forgets_only_the_evicted_sources():
+    pipeline = ImagePipeline(max_dimension=64, max_cache_bytes=1)
+    first, second = photo(color=(1, 2, 3)), photo(color=(200, 100, 50))
+    evicted = pipeline.process(first)
+    kept = pipeline.process(second)
+    assert pipeline.get(evicted.digest) is None
+    assert list(pipeline._sources.values()) == [kept.digest]
+    assert pipeline._aliases == {kept.digest: set(pipeline._sources)}
+    assert pipeline.process(second) is kept
+
+def test_diagnostic_hashes_each_photo_once_off_the_loop(monkeypatch):
+    import app
+    import prediction.image_pipeline as pipeline_module
+    threads = []
+    digest = pipeline_module.source_digest
+
+    def recording_digest(photo):
+        threads.append(threading.get_ident())
+        return digest(photo)
+
+    monkeypatch.setattr(app, "source_digest", recording_digest)
+    monkeypatch.setattr(pipeline_module, "source_digest", recording_digest)
+    input_data = app.DiagnosticInput.model_validate({
+        "symptoms": [{"name": "Fièvre", "details": []}],
+        "analyses": [{"name": "Frottis", "result": "", "resultType": "text", "photo": photo(color=(5, 6, 7))}],
+    })
+
+    async def scenario():
+        # Sans client Gemini l'appel échoue, après le calcul de la clé et des images
+        with pytest.raises(Exception):
+            await app.get_gemini_diagnostic(input_data)
+        return threading.get_ident()
+
+    loop_thread = asyncio.run(scenario())
+    assert len(threads) == 1
+    assert loop_thread not in threads
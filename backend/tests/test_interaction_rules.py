@@ -0,0 +1,46 @@
+# File: tests/test_interaction_rules.py
+from prediction.interaction_rules import InteractionEngine
+
+engine = InteractionEngine()
+
+def med(med_id, name, category=""):
+    return {"id": med_id, "name": name, "category": category}
+
+def test_known_rule_is_decided_locally():
+    warnings, unknown = engine.evaluate([med(1, "Ibuprofène 400mg", "AINS"), med(2, "Warfarine")])
+    assert unknown == []
+    assert [w["severity"] for w in warnings] == ["high"]
+
+def test_english_inn_names_resolve_to_the_iron_quinolone_rule():
+    warnings, unknown = engine.evaluate([med(1, "Fer"), med(2, "Ciprofloxacin 500mg", "Antibiotique")])
+    assert unknown == []
+    assert warnings[0]["medication_ids"] == [1, 2]
+    assert "quinolones" in warnings[0]["reason"]
+
+def test_antacid_brand_and_english_quinolone():
+    warnings, unknown = engine.evaluate([med(1, "Levofloxacin"), med(2, "Maalox")])
+    assert unknown == []
+    assert len(warnings) == 1
+
+def test_category_only_pair_without_rule_goes_to_gemini():
+    # Nom inconnu : la catégorie seule ne permet pas de conclure à l'absence d'interaction
+    warnings, unknown = engine.evaluate([med(1, "Fer"), med(2, "Zyntroflox 500mg", "Antibiotique")])
+    assert warnings == []
+    assert unknown == [(1, 2)]
+
+def test_category_only_pair_with_matching_rule_is_reported():
+    warnings, unknown = engine.evaluate([med(1, "Anticoagulix", "Anticoagulant"), med(2, "Ibuprofène")])
+    assert unknown == []
+    assert warnings[0]["severity"] == "high"
+
+def test_unknown_drug_goes_to_gemini():
+    warnings, unknown = engine.evaluate([med(1, "Paracétamol"), med(2, "Zzz")])
+    assert (warnings, unknown) == ([], [(1, 2)])
+
+def test_both_named_without_rule_are_compatible_locally():
+    assert engine.evaluate([med(1, "Paracétamol"), med(2, "Amoxicilline")]) == ([], [])
+
+def test_patient_rules():
+    warnings = engine.evaluate_patient([med(1, "Aspirine")], {"age": 10})
+    assert warnings and warnings[0]["severity"] == "high"
+    assert engine.evaluate_patient([med(1, "Aspirine")], {"age": 40}) == []
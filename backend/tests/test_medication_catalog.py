@@ -0,0 +1,29 @@
+# File: tests/test_medication_catalog.py
+from fastapi.testclient import TestClient
+import app
+from prediction.medication_catalog import medication_catalog
+from prediction.medication_predictor import suggest_medications
+
+SYMPTOMS = ["Fièvre", "Toux", "Maux de tête", "Diarrhée", "Douleurs abdominales", "Vomissements", "Frissons", "Fatigue"]
+
+def symptoms():
+    return [app.Symptom(name=name, details=[]) for name in SYMPTOMS]
+
+def analyses():
+    return [app.Analysis(name="TDR Paludisme", result="positif", resultType="boolean")]
+
+def test_suggestions_are_not_truncated_by_default():
+    suggestions = suggest_medications(symptoms(), analyses())
+    assert len(suggestions) > 10
+    assert len({item["id"] for item in suggestions}) == len(suggestions)
+    assert suggest_medications(symptoms(), analyses(), limit=3) == suggestions[:3]
+
+def test_fallback_endpoint_returns_every_suggestion():
+    # Pas de clé API dans les tests : le système manuel répond
+    client = TestClient(app.app)
+    response = client.post("/suggest-medications", json={
+        "symptoms": [{"name": name, "details": []} for name in SYMPTOMS],
+        "analyses": [{"name": "TDR Paludisme", "result": "positif", "resultType": "boolean"}],
+    })
+    assert response.status_code == 200
+    assert len(response.json()["medications"]) == len(medication_catalog.suggest(symptoms(), analyses()))
@@ -0,0 +1,11 @@
+# File: tests/test_metrics.py
+from fastapi.testclient import TestClient
+import app
+from prediction.gemini_predictor import GeminiDiagnosticResponse
+from prediction.response_cache import response_cache
+
+def test_response_cache_lookups_are_exported():
+    response_cache.get("diagnostic", "absent", GeminiDiagnosticResponse)
+    body = TestClient(app.app).get("/metrics").text
+    assert 'esante_response_cache_lookups_total{kind="diagnostic",result="miss"}' in body
+    assert 'esante_response_cache_lookups_total{kind="diagnostic",result="hit"}' in body
@@ -0,0 +1,52 @@
+# File: tests/test_normalization.py
+from types import SimpleNamespace
+import pytest
+from prediction.normalization import analysis_aliases, symptom_aliases
+from prediction.scoring_engine import ScoringEngine, ScoringJitter
+from prediction.categories.infectious import INFECTIOUS_RULE
+
+def symptom(name):
+    return SimpleNamespace(name=name, details=[])
+
+def analysis(name, result="positif", result_type="boolean"):
+    return SimpleNamespace(name=name, result=result, resultType=result_type, unit=None)
+
+@pytest.mark.parametrize("name, canonical", [
+    ("Fièvre", "fièvre"),
+    ("fever", "fièvre"),
+    ("Température élevée", "fièvre"),
+    ("Maux de tête depuis 3 jours", "maux de tête"),
+    ("Douleurs abdominales sans fièvre", "douleurs abdominales"),
+])
+def test_symptoms_resolve(name, canonical):
+    assert symptom_aliases.canonical(symptom_aliases.resolve(name)) == canonical
+
+@pytest.mark.parametrize("name", [
+    "température normale",
+    "absence de fièvre",
+    "pas de toux",
+    "sans frissons",
+    "absence de douleurs abdominales",
+    "toux absente",
+])
+def test_negated_or_generic_phrases_are_not_symptoms(name):
+    assert symptom_aliases.resolve(name) is None
+
+def test_analyses_keep_single_word_aliases():
+    assert analysis_aliases.canonical(analysis_aliases.resolve("Hb (g/dL)")) == "hémoglobine"
+    assert analysis_aliases.canonical(analysis_aliases.resolve("Taux d'hémoglobine (g/dL)")) == "hémoglobine"
+    assert analysis_aliases.canonical(analysis_aliases.resolve("TDR dengue")) == "test de diagnostic rapide de la dengue"
+
+def baseline_contains(predicates, name):
+    # Règle d'origine : le fragment du prédicat est une sous-chaîne du nom reçu
+    return [i for i, predicate in enumerate(predicates)
+            if predicate.get("match") == "contains" and predicate["name"].lower() in name.lower()]
+
+@pytest.mark.parametrize("name", ["Test hémoglobine", "TEST de grossesse", "Test TDR", "Hb", "Glycémie"])
+def test_contains_predicates_match_the_baseline(name):
+    engine = ScoringEngine([(INFECTIOUS_RULE, [])], jitter=ScoringJitter("off"))
+    offset = len(engine.symptom_index)
+    features = engine.features([], [analysis(name)])
+    fired = [i for i in range(len(engine.predicates)) if features[offset + i]]
+    for i in baseline_contains(engine.predicates, name):
+        assert i in fired
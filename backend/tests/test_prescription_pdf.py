@@ -0,0 +1,67 @@
+# File: tests/test_prescription_pdf.py
+import io
+import re
+import zipfile
+import zlib
+from fastapi.testclient import TestClient
+import app
+from prediction.prescription_pdf import build_archive, format_date, prescription_filename, prescription_renderer
+
+def prescription(cmu="CI-0012345", medications=3):
+    return {
+        "patient": {"firstName": "Aya", "lastName": "Kouassi", "age": 34, "cmuNumber": cmu},
+        "consultationDate": "2025-01-15T10:30:00Z",
+        "diagnostic": "Paludisme simple",
+        "treatment": "Artéméther-luméfantrine",
+        "posology": "4 comprimés deux fois par jour pendant 3 jours",
+        "medications": [
+            {"id": i, "name": f"Médicament {i}", "indication": "Paludisme", "dosage": "1 cp x 2/j",
+             "category": "Antipaludique", "cost": 1500, "selected": True}
+            for i in range(1, medications + 1)
+        ],
+        "instructions": "Prendre les médicaments au cours des repas.",
+    }
+
+def objects(pdf):
+    return {int(match.group(1)): match.start() for match in re.finditer(rb"(?m)^(\d+) 0 obj", pdf)}
+
+def test_render_produces_a_well_formed_pdf():
+    pdf = prescription_renderer.render(prescription())
+    assert pdf.startswith(b"%PDF-1.4")
+    assert pdf.rstrip().endswith(b"%%EOF")
+    # startxref pointe sur la table xref, dont chaque entrée pointe sur son objet
+    xref = int(re.search(rb"startxref\n(\d+)", pdf).group(1))
+    assert pdf[xref:xref + 4] == b"xref"
+    offsets = [int(entry) for entry in re.findall(rb"(\d{10}) 00000 n ", pdf[xref:])]
+    assert offsets == [objects(pdf)[number] for number in range(1, len(offsets) + 1)]
+
+def test_long_prescriptions_span_several_pages():
+    pdf = prescription_renderer.render(prescription(medications=60))
+    count = int(re.search(rb"/Type /Pages /Kids \[[^\]]*\] /Count (\d+)", pdf).group(1))
+    assert count > 1
+    # Le contenu des pages est compressé et contient les textes de l'ordonnance
+    streams = re.findall(rb"stream\n(.*?)\nendstream", pdf, re.S)
+    text = b"".join(zlib.decompress(stream) for stream in streams)
+    assert b"Paludisme simple" in text and b"M\xe9dicament 60" in text
+
+def test_filenames_and_dates():
+    assert prescription_filename(prescription()) == "ordonnance-ci-0012345-20250115.pdf"
+    assert format_date("2025-01-15T10:30:00Z") == "15 janvier 2025"
+    assert format_date("demain") == "demain"
+
+def test_archive_numbers_duplicate_names():
+    archive = build_archive([("a.pdf", b"1"), ("a.pdf", b"2"), ("b.pdf", b"3")])
+    with zipfile.ZipFile(io.BytesIO(archive)) as files:
+        assert files.namelist() == ["a.pdf", "a-2.pdf", "b.pdf"]
+        assert files.read("a-2.pdf") == b"2"
+
+def test_export_endpoint_returns_a_zip():
+    client = TestClient(app.app)
+    inputs = [{key: value for key, value in prescription(cmu=f"CI-{i}").items() if key != "instructions"} for i in range(3)]
+    response = client.post("/prescriptions/export", json=inputs)
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/zip"
+    with zipfile.ZipFile(io.BytesIO(response.content)) as files:
+        assert sorted(files.namelist()) == [f"ordonnance-ci-{i}-20250115.pdf" for i in range(3)]
+        assert all(files.read(name).startswith(b"%PDF") for name in files.namelist())
+    assert client.post("/prescriptions/export", json=[]).status_code == 400
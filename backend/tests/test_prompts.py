@@ -0,0 +1,47 @@
+# File: tests/test_prompts.py
+import time
+from types import SimpleNamespace
+from prediction.prompts import ContextCache, PromptTemplate
+
+TEMPLATE = PromptTemplate("test", "Préfixe statique du prompt de test.")
+
+class FakeClient:
+    def __init__(self):
+        self.created = 0
+        self.caches = SimpleNamespace(create=self.create)
+
+    def create(self, model, config):
+        self.created += 1
+        return SimpleNamespace(name=f"cachedContents/{self.created}")
+
+def wait_for_renewal(cache):
+    for future in list(cache._refreshing.values()):
+        future.result(timeout=5)
+
+def test_context_cache_is_renewed_after_the_ttl(monkeypatch):
+    client = FakeClient()
+    cache = ContextCache(enabled=True, ttl=3600, client_factory=lambda: client)
+    assert cache.ensure(client, TEMPLATE, "model") == "cachedContents/1"
+    assert cache.lookup(TEMPLATE, "model") == "cachedContents/1"
+
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now + 3601)
+    # Cache expiré : instruction système pour cet appel, renouvellement en arrière-plan
+    assert cache.lookup(TEMPLATE, "model") is None
+    wait_for_renewal(cache)
+    assert cache.lookup(TEMPLATE, "model") == "cachedContents/2"
+    assert client.created == 2
+
+def test_renewal_starts_within_the_margin(monkeypatch):
+    client = FakeClient()
+    cache = ContextCache(enabled=True, ttl=3600, client_factory=lambda: client)
+    cache.ensure(client, TEMPLATE, "model")
+
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now + 3600 - ContextCache.RENEW_MARGIN + 1)
+    # Dans la marge : le cache courant reste utilisé, un seul renouvellement est lancé
+    assert cache.lookup(TEMPLATE, "model") == "cachedContents/1"
+    assert cache.lookup(TEMPLATE, "model") in ("cachedContents/1", "cachedContents/2")
+    wait_for_renewal(cache)
+    assert cache.lookup(TEMPLATE, "model") == "cachedContents/2"
+    assert client.created == 2
@@ -0,0 +1,39 @@
+# File: tests/test_resilience.py
+import asyncio
+import pytest
+from prediction.gemini_client import call_with_resilience, get_breaker
+from prediction.resilience import CircuitBreaker
+
+def half_open(breaker):
+    for _ in range(breaker.failure_threshold):
+        breaker.record_failure(RuntimeError("upstream"))
+    breaker.opened_at -= breaker.reset_timeout
+    return breaker
+
+def test_breaker_opens_then_allows_a_single_probe():
+    breaker = half_open(CircuitBreaker("test", failure_threshold=2, reset_timeout=30))
+    assert breaker.allow()
+    assert not breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+def test_cancelled_probe_releases_the_breaker():
+    breaker = half_open(get_breaker("test-cancelled-probe"))
+
+    async def scenario():
+        started = asyncio.Event()
+
+        async def call():
+            started.set()
+            await asyncio.sleep(60)
+
+        task = asyncio.ensure_future(call_with_resilience("test-cancelled-probe", "diagnostic", call))
+        await started.wait()
+        assert breaker.probe_in_flight
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(scenario())
+    assert not breaker.probe_in_flight
+    assert breaker.allow()
@@ -0,0 +1,20 @@
+# File: tests/test_scoring_engine.py
+import numpy as np
+from prediction.scoring_engine import ScoringJitter
+
+FEATURES = np.array([[1.0, 0.0, 1.0], [0.0, 1.0, 0.0]])
+
+def test_seeded_hashed_jitter_is_reproducible():
+    first, second = ScoringJitter("hashed", seed=42), ScoringJitter("hashed", seed=42)
+    assert np.array_equal(first.sample(FEATURES, 4), second.sample(FEATURES, 4))
+    assert np.array_equal(first.sample(FEATURES, 4), first.sample(FEATURES, 4))
+    assert np.abs(first.sample(FEATURES, 4)).max() <= first.amplitude
+
+def test_unseeded_hashed_jitter_uses_a_per_process_salt(capsys):
+    first, second = ScoringJitter("hashed"), ScoringJitter("hashed")
+    # Plus de sel constant par défaut : deux instances sans graine divergent
+    assert first.seed != second.seed and first.salt != b"0"
+    assert not np.array_equal(first.sample(FEATURES, 4), second.sample(FEATURES, 4))
+    # Stable pour une même instance, et le sel tiré est journalisé
+    assert np.array_equal(first.sample(FEATURES, 4), first.sample(FEATURES, 4))
+    assert str(first.seed) in capsys.readouterr().out
@@ -0,0 +1,72 @@
+# File: tests/test_single_flight.py
+import asyncio
+import pytest
+from prediction.single_flight import SingleFlight, SupersededError
+
+def test_concurrent_identical_calls_share_one_execution():
+    flights = SingleFlight("test")
+    calls = []
+
+    async def compute():
+        calls.append(True)
+        await asyncio.sleep(0.01)
+        return "résultat"
+
+    async def scenario():
+        return await asyncio.gather(*(flights.do("clé", compute) for _ in range(5)))
+
+    assert asyncio.run(scenario()) == ["résultat"] * 5
+    assert len(calls) == 1
+    assert flights.in_flight() == 0
+
+def test_exceptions_are_shared():
+    flights = SingleFlight("test")
+
+    async def failing():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("upstream")
+
+    async def scenario():
+        return await asyncio.gather(flights.do("clé", failing), flights.do("clé", failing), return_exceptions=True)
+
+    assert [type(result) for result in asyncio.run(scenario())] == [RuntimeError, RuntimeError]
+
+def test_newer_session_request_supersedes_and_cancels_the_previous_call():
+    flights = SingleFlight("test")
+    cancelled = []
+
+    async def slow():
+        try:
+            await asyncio.sleep(60)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+
+    async def fast():
+        return "nouvelle sélection"
+
+    async def scenario():
+        previous = asyncio.ensure_future(flights.do("a", slow, session="s"))
+        await asyncio.sleep(0)
+        latest = await flights.do("b", fast, session="s")
+        with pytest.raises(SupersededError):
+            await previous
+        await asyncio.sleep(0)
+        return latest
+
+    assert asyncio.run(scenario()) == "nouvelle sélection"
+    # Plus personne n'attendait l'appel remplacé : il a été annulé
+    assert cancelled == [True]
+    assert flights.in_flight() == 0
+
+def test_same_key_in_a_session_is_not_superseded():
+    flights = SingleFlight("test")
+
+    async def compute():
+        await asyncio.sleep(0.01)
+        return 1
+
+    async def scenario():
+        return await asyncio.gather(flights.do("a", compute, session="s"), flights.do("a", compute, session="s"))
+
+    assert asyncio.run(scenario()) == [1, 1]